@@ -2,16 +2,48 @@
 Module de gestion de la base de données MariaDB.
 """
 
+import bisect
+import heapq
+import json
+import math
 import os
+from typing import Any, cast
 
 import mysql.connector
+from mysql.connector import errorcode
 
+from mesures_sql import instrumenter_connexion
 from notifications import envoyer_notif_teams
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Nombre de plus grands changements conservés dans scan_summary.top_movers
+NB_TOP_MOUVEMENTS = 10
+
+# Recherche d'un dossier par son chemin : path_hash (BINARY(16), indexé)
+# réduit la recherche à quelques lignes, path lève toute ambiguïté
+CONDITION_CHEMIN = "path_hash = UNHEX(MD5(%s)) AND path = %s"
+
+# Nombre maximal de chemins distincts partageant un même path_hash
+MAX_COLLISIONS_CHEMIN = 255
+
+# Nombre de dossiers indexés par requête dans folder_trigrams
+TAILLE_LOT_TRIGRAMMES = 1000
+
+# Poids d'une nouvelle variation dans la moyenne / variance exponentielles
+# (EWMA) des variations d'un dossier : 0.1 ≈ mémoire d'une vingtaine de scans
+ALPHA_EWMA = 0.1
+
+# Nombre de scans observés avant de juger un dossier sur son z-score
+# (les seuils fixes en Mo s'appliquent jusque-là)
+NB_SCANS_APPRENTISSAGE = 5
+
+# Écart-type minimal (Ko) du z-score : un dossier resté immobile (variance
+# nulle) n'est pas signalé à sa première variation de quelques Mo
+ECART_TYPE_MIN_KB = 10 * 1024
+
 
 def parser_seuils_personnalises() -> dict[str, int]:
     """
@@ -71,9 +103,10 @@ def obtenir_seuil_pour_chemin(
 def connecter_base_de_donnees() -> mysql.connector.MySQLConnection | None:
     """
     Connecte à la base de données MariaDB.
+    Les curseurs de la connexion sont chronométrés (voir mesures_sql).
     """
     try:
-        return mysql.connector.connect(  # type: ignore[return-value]
+        connexion = mysql.connector.connect(
             host=os.getenv("DB_HOST"),
             port=int(os.getenv("DB_PORT", "3306")),
             user=os.getenv("DB_USER"),
@@ -81,6 +114,7 @@ def connecter_base_de_donnees() -> mysql.connector.MySQLConnection | None:
             database=os.getenv("DB_NAME"),
             connect_timeout=5,  # Timeout 5s pour éviter de bloquer le démarrage
         )
+        return instrumenter_connexion(connexion)  # type: ignore[return-value]
     except mysql.connector.Error as err:
         envoyer_notif_teams(f"Erreur de connexion à la base de données : {err}")
         return None
@@ -191,7 +225,8 @@ def marquer_dossiers_comme_racines(
             if racine:
                 racine_norm = os.path.normpath(racine)
                 curseur.execute(
-                    "UPDATE folders SET is_root = 1 WHERE path = %s", (racine_norm,)
+                    f"UPDATE folders SET is_root = 1 WHERE {CONDITION_CHEMIN}",
+                    (racine_norm, racine_norm),
                 )
         connexion_mysql.commit()
         curseur.close()
@@ -209,7 +244,7 @@ def detecter_dossiers_supprimes(
     Détecte les dossiers supprimés du disque entre deux scans.
     Compare les dossiers en base (pour la racine donnée) avec ceux trouvés sur le disque.
     Pour chaque dossier absent du disque :
-      - Met is_deleted = 1 dans folders
+      - Met is_deleted = 1 et size_kb = 0 dans folders
       - Insère une entrée size_kb = 0 dans sizes
     Retourne la liste des dossiers supprimés (chemin + dernière taille connue en Mo).
     """
@@ -222,48 +257,33 @@ def detecter_dossiers_supprimes(
         curseur = connexion_mysql.cursor()
 
         # Itère sur les dossiers en base sans tout charger en mémoire
-        # Compare chaque chemin avec le set de chemins disque (déjà en mémoire)
+        # Compare chaque chemin avec le set de chemins disque (déjà en mémoire) ;
+        # folders.size_kb donne directement la dernière taille connue
         curseur.execute(
-            "SELECT id_folder, path FROM folders "
+            "SELECT id_folder, path, size_kb FROM folders "
             "WHERE is_deleted = 0 AND (path = %s OR path LIKE %s)",
             (chemin_racine_norm, prefix + "%"),
         )
 
-        supprimes_ids: list[int] = []
-        supprimes_tuples: list[tuple[int, str]] = []
+        supprimes_tuples: list[tuple[int, str, int]] = []
         for row in curseur:
             id_dossier = int(str(row[0])) # safe fallback if it's somehow not int
             chemin = str(row[1])
             if chemin not in chemins_disque:
-                supprimes_ids.append(id_dossier)
-                supprimes_tuples.append((id_dossier, chemin))
+                supprimes_tuples.append((id_dossier, chemin, int(str(row[2]))))
 
         if not supprimes_tuples:
             curseur.close()
             return []
 
-        # Récupérer les dernières tailles connues pour les dossiers supprimés
-        placeholders = ",".join(["%s"] * len(supprimes_ids))
-        curseur.execute(
-            f"SELECT s.id_folder, s.size_kb FROM sizes s "
-            f"INNER JOIN ("
-            f"  SELECT id_folder, MAX(id_scan) AS max_scan "
-            f"  FROM sizes WHERE id_folder IN ({placeholders}) "
-            f"  GROUP BY id_folder"
-            f") latest ON s.id_folder = latest.id_folder AND s.id_scan = latest.max_scan",
-            supprimes_ids,
-        )
-        dernieres_tailles: dict[int, int] = {int(str(row[0])): int(str(row[1])) for row in curseur.fetchall()}
-
         dossiers_supprimes = []
         compteur = 0
-        for id_dossier, chemin in supprimes_tuples:
-            derniere_taille_kb = dernieres_tailles.get(id_dossier, 0)
-
+        for id_dossier, chemin, derniere_taille_kb in supprimes_tuples:
             # Marquer comme supprimé
             curseur.execute(
-                "UPDATE folders SET is_deleted = 1 WHERE id_folder = %s",
-                (id_dossier,),
+                "UPDATE folders SET is_deleted = 1, size_kb = 0, delta_kb = %s "
+                "WHERE id_folder = %s",
+                (-derniere_taille_kb, id_dossier),
             )
             # Enregistrer taille 0 pour ce scan (crée le point zéro dans l'historique)
             curseur.execute(
@@ -278,6 +298,8 @@ def detecter_dossiers_supprimes(
                     "type": "suppression",
                     "chemin": chemin,
                     "taille": derniere_taille_mo,
+                    "id_folder": id_dossier,
+                    "taille_kb": derniere_taille_kb,
                 }
             )
 
@@ -323,50 +345,477 @@ def enregistrer_totaux_scan(
         envoyer_notif_teams(f"Erreur lors de l'enregistrement des totaux : {err}")
 
 
+def _evenement_scan(dossier: dict) -> tuple[int, int]:
+    """
+    Retourne (taille_avant_kb, taille_apres_kb) d'un dossier signalé
+    par traiter_dossiers_en_lot ou detecter_dossiers_supprimes.
+    """
+    if dossier["type"] == "nouveau":
+        return 0, int(dossier.get("taille_kb", 0))
+    if dossier["type"] == "suppression":
+        return int(dossier.get("taille_kb", 0)), 0
+    return int(dossier.get("avant_kb", 0)), int(dossier.get("apres_kb", 0))
+
+
+def retenir_mouvement(mouvements: list, evenement: tuple) -> None:
+    """
+    Ajoute une variation (id_folder, type, chemin, avant_kb, apres_kb) au tas
+    `mouvements`, qui ne garde que les NB_TOP_MOUVEMENTS plus fortes.
+    """
+    entree = (abs(evenement[4] - evenement[3]), evenement[0], evenement)
+    if len(mouvements) < NB_TOP_MOUVEMENTS:
+        heapq.heappush(mouvements, entree)
+    elif entree[:2] > mouvements[0][:2]:
+        heapq.heapreplace(mouvements, entree)
+
+
+def enregistrer_resume_scan(
+    connexion_mysql: mysql.connector.MySQLConnection,
+    id_scan: int,
+    nouveaux_dossiers: list[dict],
+    dossiers_modifies: list[dict],
+    dossiers_supprimes: list[dict],
+    variation_kb: int,
+    mouvements: list | None = None,
+) -> None:
+    """
+    Enregistre le résumé du scan (scan_summary) et ses événements (scan_events)
+    à partir des listes encore en mémoire à la fin du scan, pour que l'Intranet
+    n'ait plus à les recalculer à partir de sizes.
+    Les listes sont celles des dossiers signalés (au-delà des seuils), passées
+    AVANT filtrer_dossiers_redondants. top_movers est tiré de `mouvements`
+    (voir retenir_mouvement), qui couvre toutes les variations de taille même
+    sous les seuils, et des suppressions ; à défaut, des seuls signalés.
+    """
+    evenements = []
+    for dossier in nouveaux_dossiers + dossiers_modifies + dossiers_supprimes:
+        if dossier.get("id_folder") is None:
+            continue
+        avant_kb, apres_kb = _evenement_scan(dossier)
+        # Une suppression sans taille connue n'a rien à signaler
+        if dossier["type"] == "suppression" and avant_kb == 0:
+            continue
+        evenements.append(
+            (dossier["id_folder"], dossier["type"], dossier["chemin"], avant_kb, apres_kb)
+        )
+
+    if mouvements is None:
+        candidats = evenements
+    else:
+        candidats = [e for _, _, e in mouvements]
+        candidats += [e for e in evenements if e[1] == "suppression"]
+    candidats = sorted(candidats, key=lambda e: abs(e[4] - e[3]), reverse=True)
+    top_mouvements = [
+        {
+            "id_folder": id_dossier,
+            "path": chemin,
+            "is_deleted": type_ == "suppression",
+            "size_actuel_kb": apres_kb,
+            "size_precedent_kb": avant_kb,
+            "diff_kb": apres_kb - avant_kb,
+        }
+        for id_dossier, type_, chemin, avant_kb, apres_kb in candidats[:NB_TOP_MOUVEMENTS]
+    ]
+
+    try:
+        curseur = connexion_mysql.cursor()
+        for debut in range(0, len(evenements), 5000):
+            curseur.executemany(
+                "INSERT INTO scan_events "
+                "(id_scan, id_folder, event_type, size_before_kb, size_after_kb) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [
+                    (id_scan, id_dossier, type_, avant_kb, apres_kb)
+                    for id_dossier, type_, _, avant_kb, apres_kb in evenements[debut:debut + 5000]
+                ],
+            )
+            connexion_mysql.commit()
+
+        curseur.execute(
+            "INSERT INTO scan_summary "
+            "(id_scan, nb_new, nb_modified, nb_deleted, variation_kb, top_movers) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            (
+                id_scan,
+                sum(1 for e in evenements if e[1] == "nouveau"),
+                sum(1 for e in evenements if e[1] == "modification"),
+                sum(1 for e in evenements if e[1] == "suppression"),
+                variation_kb,
+                json.dumps(top_mouvements),
+            ),
+        )
+        connexion_mysql.commit()
+        curseur.close()
+    except mysql.connector.Error as err:
+        envoyer_notif_teams(f"Erreur lors de l'enregistrement du résumé du scan : {err}")
+
+
+def mettre_a_jour_stats_tableau_de_bord(
+    connexion_mysql: mysql.connector.MySQLConnection, id_scan: int
+) -> None:
+    """
+    Recalcule la ligne unique de dashboard_stats à la fin d'un scan complété :
+    compteurs de dossiers et de scans, top des variations du scan (repris de
+    scan_summary). Le tableau de bord la lit en une requête au lieu de compter
+    les tables à chaque affichage.
+    """
+    try:
+        curseur = connexion_mysql.cursor()
+        curseur.execute(
+            "INSERT INTO dashboard_stats "
+            "(id_stats, total_folders, total_scans, last_scan, top_movers) "
+            "SELECT 1, "
+            "(SELECT COUNT(*) FROM folders), "
+            "(SELECT COUNT(*) FROM scans WHERE status = 'completed'), "
+            "%s, "
+            "(SELECT top_movers FROM scan_summary WHERE id_scan = %s) "
+            "ON DUPLICATE KEY UPDATE "
+            "total_folders = VALUES(total_folders), total_scans = VALUES(total_scans), "
+            "last_scan = VALUES(last_scan), top_movers = VALUES(top_movers)",
+            (id_scan, id_scan),
+        )
+        connexion_mysql.commit()
+        curseur.close()
+    except mysql.connector.Error as err:
+        envoyer_notif_teams(f"Erreur lors de la mise à jour des statistiques : {err}")
+
+
+def enregistrer_point_de_controle(
+    connexion_mysql: mysql.connector.MySQLConnection, id_scan: int
+) -> bool:
+    """
+    Copie la taille courante de chaque dossier existant (folders.size_kb) dans
+    size_checkpoints, tous les INTERVALLE_POINTS_CONTROLE scans complétés
+    (30 par défaut, 0 pour désactiver).
+    La taille d'un dossier à un scan X se lit alors dans le dernier point de
+    contrôle <= X, complété par les seules lignes sizes écrites depuis, au lieu
+    de remonter tout l'historique de chaque dossier.
+    Retourne True si un point de contrôle a été écrit.
+    """
+    try:
+        intervalle = int(os.getenv("INTERVALLE_POINTS_CONTROLE", "30"))
+    except ValueError:
+        intervalle = 30
+    if intervalle <= 0:
+        return False
+
+    try:
+        curseur = connexion_mysql.cursor()
+        curseur.execute(
+            "SELECT COUNT(*) FROM scans WHERE status = 'completed' AND id_scan > "
+            "COALESCE((SELECT MAX(id_scan) FROM size_checkpoints), 0)"
+        )
+        row = cast(tuple[int] | None, curseur.fetchone())
+        if not row or int(row[0]) < intervalle:
+            curseur.close()
+            return False
+
+        curseur.execute(
+            "INSERT INTO size_checkpoints (id_scan, id_folder, size_kb) "
+            "SELECT %s, id_folder, size_kb FROM folders WHERE is_deleted = 0",
+            (id_scan,),
+        )
+        connexion_mysql.commit()
+        logger.info(
+            "Point de contrôle des tailles écrit au scan %s (%d dossier(s))",
+            id_scan,
+            curseur.rowcount,
+        )
+        curseur.close()
+        return True
+    except mysql.connector.Error as err:
+        envoyer_notif_teams(f"Erreur lors de l'écriture du point de contrôle : {err}")
+        return False
+
+
+def scans_approximatifs(
+    connexion_mysql: mysql.connector.MySQLConnection, ids_scans: list[int]
+) -> list[int]:
+    """
+    Parmi `ids_scans`, retourne ceux dont les tailles ne sont plus exactes
+    depuis la rétention (voir retention.compacter_historique_tailles) : un
+    scan d'une période compactée, autre que le dernier de la période, a perdu
+    les lignes sizes remplacées ensuite dans la période. Sa taille « à la
+    date du scan » et les dossiers comparés à partir de lui (calculer_diff_scans)
+    sont alors approximatifs. Les erreurs SQL sont propagées à l'appelant.
+    """
+    if not ids_scans:
+        return []
+    curseur = connexion_mysql.cursor()
+    try:
+        curseur.execute(
+            "SELECT first_scan, last_scan FROM size_compactions "
+            "WHERE first_scan <= %s AND last_scan > %s",
+            (max(ids_scans), min(ids_scans)),
+        )
+        periodes = [
+            (int(str(row[0])), int(str(row[1]))) for row in curseur.fetchall()
+        ]
+    finally:
+        curseur.close()
+    return [
+        id_scan
+        for id_scan in ids_scans
+        if any(premier <= id_scan < dernier for premier, dernier in periodes)
+    ]
+
+
+def calculer_diff_scans(
+    connexion_mysql: mysql.connector.MySQLConnection,
+    id_scan_a: int,
+    id_scan_b: int,
+    limite: int = 100,
+    chemin: str | None = None,
+) -> list[dict]:
+    """
+    Compare deux scans quelconques : taille de chaque dossier à la date du
+    scan A puis du scan B (dernière ligne sizes <= scan, 0 si absente),
+    classé par variation absolue décroissante.
+    sizes ne stockant que les changements, seuls les dossiers ayant une ligne
+    entre A (exclu) et B (inclus) peuvent différer : ils sont pris par plage
+    sur la clé primaire (id_scan, id_folder) au lieu de tout sizes.
+    `chemin` restreint la comparaison à un dossier et ses descendants.
+    Pour un scan sous-échantillonné par la rétention, le résultat est
+    approximatif (voir scans_approximatifs).
+    Les erreurs SQL sont propagées à l'appelant (Intranet ou ligne de commande).
+    """
+    if id_scan_a > id_scan_b:
+        id_scan_a, id_scan_b = id_scan_b, id_scan_a
+
+    filtre_chemin = ""
+    params: list = [id_scan_a, id_scan_b, id_scan_a, id_scan_b]
+    if chemin:
+        chemin = os.path.normpath(chemin)
+        prefixe = chemin if chemin.endswith(os.sep) else chemin + os.sep
+        # Le backslash est le caractère d'échappement de LIKE : échappé en premier
+        motif = prefixe.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        filtre_chemin = "AND (f.path = %s OR f.path LIKE %s)"
+        params += [chemin, motif]
+    params.append(limite)
+
+    curseur = connexion_mysql.cursor(dictionary=True)
+    try:
+        curseur.execute(
+            f"""
+            SELECT id_folder, path, avant_kb, apres_kb, apres_kb - avant_kb AS diff_kb
+            FROM (
+                SELECT
+                    f.id_folder, f.path,
+                    COALESCE((
+                        SELECT s.size_kb FROM sizes s
+                        WHERE s.id_folder = c.id_folder AND s.id_scan <= %s
+                        ORDER BY s.id_scan DESC LIMIT 1
+                    ), 0) AS avant_kb,
+                    (
+                        SELECT s.size_kb FROM sizes s
+                        WHERE s.id_folder = c.id_folder AND s.id_scan <= %s
+                        ORDER BY s.id_scan DESC LIMIT 1
+                    ) AS apres_kb
+                FROM (
+                    SELECT DISTINCT id_folder FROM sizes
+                    WHERE id_scan > %s AND id_scan <= %s
+                ) c
+                JOIN folders f ON f.id_folder = c.id_folder
+                WHERE 1 = 1 {filtre_chemin}
+            ) d
+            WHERE avant_kb <> apres_kb
+            ORDER BY ABS(apres_kb - avant_kb) DESC
+            LIMIT %s
+            """,
+            params,
+        )
+        return cast(list[dict[str, Any]], curseur.fetchall())
+    finally:
+        curseur.close()
+
+
+def _inserer_dossier(
+    curseur, chemin: str, id_parent: int | None, nom: str
+) -> int:
+    """
+    Insère un dossier dans folders et retourne son id.
+    path_hash est calculé par MariaDB (UNHEX(MD5(path))) ; si deux chemins
+    différents ont le même hash, la clé unique (path_hash, path_collision)
+    rejette l'insertion et on réessaie avec le rang de collision suivant
+    (sauf si c'est le même chemin, dont on retourne alors l'id).
+    """
+    for collision in range(MAX_COLLISIONS_CHEMIN + 1):
+        try:
+            curseur.execute(
+                "INSERT INTO folders (path, path_hash, path_collision, parent_id, name, is_new) "
+                "VALUES (%s, UNHEX(MD5(%s)), %s, %s, %s, 1)",
+                (chemin, chemin, collision, id_parent, nom),
+            )
+        except mysql.connector.Error as err:
+            if err.errno != errorcode.ER_DUP_ENTRY:
+                raise
+            # Même chemin déjà présent (inséré entre-temps) : pas une collision
+            curseur.execute(
+                f"SELECT id_folder FROM folders WHERE {CONDITION_CHEMIN}",
+                (chemin, chemin),
+            )
+            existant = curseur.fetchone()
+            if existant:
+                return int(str(existant[0]))
+            logger.warning("Collision de path_hash pour %s (rang %d)", chemin, collision)
+            continue
+        return int(curseur.lastrowid) if curseur.lastrowid is not None else 0
+    raise mysql.connector.Error(
+        msg=f"Trop de collisions de path_hash pour {chemin}",
+        errno=errorcode.ER_DUP_ENTRY,
+    )
+
+
+def _indexer_trigrammes_dossiers(curseur, ids_dossiers: list[int]) -> None:
+    """
+    Ajoute à folder_trigrams les trigrammes du nom des dossiers donnés
+    (index de recherche de l'Intranet). Les trigrammes sont découpés par
+    MariaDB (table seq_1_to_255 du moteur Sequence, name faisant au plus
+    255 caractères) ; INSERT IGNORE absorbe les doublons.
+    """
+    for debut in range(0, len(ids_dossiers), TAILLE_LOT_TRIGRAMMES):
+        lot = ids_dossiers[debut:debut + TAILLE_LOT_TRIGRAMMES]
+        placeholders = ",".join(["%s"] * len(lot))
+        curseur.execute(
+            "INSERT IGNORE INTO folder_trigrams (trigram, id_folder) "
+            "SELECT LOWER(SUBSTRING(f.name, s.seq, 3)), f.id_folder "
+            "FROM folders f JOIN seq_1_to_255 s ON s.seq <= CHAR_LENGTH(f.name) - 2 "
+            f"WHERE f.id_folder IN ({placeholders})",
+            lot,
+        )
+
+
+def mettre_a_jour_statistiques_variation(
+    statistiques: tuple[float, float, int, int | None],
+    diff_ko: int,
+    id_scan: int,
+    alpha: float = ALPHA_EWMA,
+    scans_sans_changement: int | None = None,
+) -> tuple[tuple[float, float, int, int], float | None]:
+    """
+    Intègre la variation `diff_ko` du scan `id_scan` dans les statistiques
+    (moyenne EWMA, variance EWMA, nb de scans observés, dernier scan intégré)
+    d'un dossier et retourne (nouvelles statistiques, z-score de la variation).
+    Seuls les scans où le dossier change sont écrits : les j scans sans
+    changement depuis le dernier intégré (variations nulles) sont appliqués en
+    une fois, moyenne × (1-α)^j et variance (1-α)^j × (v + m² × (1 - (1-α)^j)).
+    j vaut `scans_sans_changement` (scans complétés entre les deux, voir
+    traiter_dossiers_en_lot) ou, à défaut, l'écart entre les id de scan.
+    Le z-score est calculé par rapport aux statistiques d'avant ce scan, avec
+    un écart-type d'au moins ECART_TYPE_MIN_KB ; None pendant les
+    NB_SCANS_APPRENTISSAGE premiers scans.
+    """
+    moyenne, variance, nb_scans, dernier_scan = statistiques
+    j = 0
+    if scans_sans_changement is not None:
+        j = scans_sans_changement
+    elif dernier_scan is not None:
+        j = max(id_scan - dernier_scan - 1, 0)
+    if j > 0:
+        r = (1 - alpha) ** j
+        variance = r * (variance + moyenne * moyenne * (1 - r))
+        moyenne = r * moyenne
+        nb_scans += j
+
+    ecart = diff_ko - moyenne
+    zscore = None
+    if nb_scans >= NB_SCANS_APPRENTISSAGE:
+        zscore = ecart / max(math.sqrt(variance), ECART_TYPE_MIN_KB)
+
+    increment = alpha * ecart
+    moyenne += increment
+    variance = (1 - alpha) * (variance + ecart * increment)
+    return (moyenne, variance, nb_scans + 1, id_scan), zscore
+
+
+def _enregistrer_tailles_courantes(curseur, tailles_courantes: list[tuple]) -> None:
+    """
+    Recopie dans folders les tailles et statistiques de variation accumulées
+    (size_kb, delta_kb, ewma_delta_kb, ewmvar_delta_kb, nb_deltas, stats_scan, id_folder).
+    """
+    if tailles_courantes:
+        curseur.executemany(
+            "UPDATE folders SET size_kb = %s, delta_kb = %s, ewma_delta_kb = %s, "
+            "ewmvar_delta_kb = %s, nb_deltas = %s, stats_scan = %s WHERE id_folder = %s",
+            tailles_courantes,
+        )
+
+
 def traiter_dossiers_en_lot(
     connexion_mysql: mysql.connector.MySQLConnection,
     dossiers_avec_tailles: dict[str, int],
     chemin_racine: str = "",
     id_scan: int = 0,
+    mouvements: list | None = None,
 ) -> tuple[list, list, int, int]:
     """
     Traite tous les dossiers en lot pour optimiser les accès BDD.
     Charge tous les dossiers existants en mémoire (1 seul SELECT),
     puis fait les INSERT/UPDATE avec un commit tous les 5000 dossiers.
 
-    Les tailles sont stockées en Ko dans la table sizes.
-    Pour déterminer les changements, on compare avec le dernier scan enregistré.
+    Les tailles sont stockées en Ko dans la table sizes (uniquement quand
+    elles changent) et recopiées dans folders.size_kb / delta_kb.
+    Pour déterminer les changements, on compare avec folders.size_kb, la
+    dernière taille connue de chaque dossier quel que soit le scan qui l'a
+    enregistrée.
+
+    Une variation est signalée selon son z-score par rapport à la moyenne et
+    à la variance exponentielles des variations passées du dossier, tenues à
+    jour dans folders à chaque écriture (voir
+    mettre_a_jour_statistiques_variation) : |z| > SEUIL_ZSCORE (3 par défaut)
+    et au moins SEUIL_MIN_ANOMALIE Mo (10 par défaut). Les scans sans
+    changement pris en compte sont les scans complétés depuis le dernier
+    changement (les scans échoués ou interrompus ne comptent pas).
+    Un dossier couvert par SEUILS_PERSONNALISES garde toujours son seuil fixe ;
+    pendant l'apprentissage d'un dossier, ou avec SEUIL_ZSCORE=0, SEUIL_DEFAUT
+    s'applique.
+
+    Si `mouvements` est fourni, chaque variation de taille (signalée ou non)
+    y est retenue par retenir_mouvement, pour le résumé du scan.
 
     Retourne (nouveaux_dossiers, dossiers_modifies, taille_totale_scan_ko, changement_racine_ko).
     """
     seuil_defaut = int(os.getenv("SEUIL_DEFAUT", "100"))
     seuils_personnalises = parser_seuils_personnalises()
+    seuil_zscore = float(os.getenv("SEUIL_ZSCORE", "3"))
+    seuil_min_anomalie = int(os.getenv("SEUIL_MIN_ANOMALIE", "10"))
     try:
         curseur = connexion_mysql.cursor()
 
         # Normalisation du chemin racine pour comparaison
         chemin_racine_norm = os.path.normpath(chemin_racine) if chemin_racine else None
 
-        # Récupère l'id du dernier scan terminé pour comparer les tailles
+        # Charge TOUS les dossiers existants en mémoire (1 seule requête)
+        # avec leur taille courante ; a_completer signale les lignes
+        # antérieures à parent_id / name
         curseur.execute(
-            "SELECT id_scan FROM scans WHERE status = 'completed' "
-            "ORDER BY date_ DESC LIMIT 1"
+            "SELECT id_folder, path, (parent_id IS NULL OR name = '') AS a_completer, "
+            "size_kb, delta_kb, ewma_delta_kb, ewmvar_delta_kb, nb_deltas, stats_scan "
+            "FROM folders"
         )
-        dernier_scan = curseur.fetchone()
-        id_dernier_scan = dernier_scan[0] if dernier_scan else None
-
-        # Charge TOUS les dossiers existants en mémoire (1 seule requête)
-        curseur.execute("SELECT id_folder, path FROM folders")
-        dossiers_existants: dict[str, int] = {str(row[1]): int(str(row[0])) for row in curseur.fetchall()}
-
-        # Si un scan précédent existe, charger les tailles correspondantes
+        dossiers_existants: dict[str, int] = {}
+        ids_a_completer: set[int] = set()
         tailles_precedentes: dict[int, int] = {}
-        if id_dernier_scan:
-            curseur.execute(
-                "SELECT id_folder, size_kb FROM sizes WHERE id_scan = %s",
-                (int(str(id_dernier_scan)),),
+        deltas_precedents: dict[int, int] = {}
+        statistiques: dict[int, tuple] = {}
+        for row in curseur.fetchall():
+            id_dossier = int(str(row[0]))
+            dossiers_existants[str(row[1])] = id_dossier
+            if row[2]:
+                ids_a_completer.add(id_dossier)
+            tailles_precedentes[id_dossier] = int(str(row[3]))
+            deltas_precedents[id_dossier] = int(str(row[4]))
+            statistiques[id_dossier] = (
+                float(str(row[5])),
+                float(str(row[6])),
+                int(str(row[7])),
+                int(str(row[8])) if row[8] is not None else None,
             )
-            tailles_precedentes = {int(str(row[0])): int(str(row[1])) for row in curseur.fetchall()}
+
+        # Scans complétés : nombre de scans sans changement d'un dossier entre
+        # deux écritures de ses statistiques (les id de scan ont des trous)
+        curseur.execute("SELECT id_scan FROM scans WHERE status = 'completed' ORDER BY id_scan")
+        scans_termines = [int(str(row[0])) for row in curseur.fetchall()]
 
         nouveaux_dossiers = []
         dossiers_modifies = []
@@ -374,12 +823,25 @@ def traiter_dossiers_en_lot(
         changement_racine = 0
         compteur = 0
         ids_a_resurrecter = []  # IDs à réactiver (batch UPDATE)
+        parents_a_completer = []  # (parent_id, name, id_folder) des anciennes lignes
+        ids_a_indexer = []  # Dossiers dont le nom entre dans folder_trigrams
+        tailles_courantes = []  # (size_kb, delta_kb, statistiques..., id_folder) à recopier dans folders
 
         for chemin, taille_octets in dossiers_avec_tailles.items():
             taille_en_ko = round(taille_octets / 1024)
             taille_totale_scan += taille_en_ko
             chemin_norm = os.path.normpath(chemin)
 
+            # Position dans l'arbre : le parent précède toujours l'enfant dans
+            # dossiers_avec_tailles, son id est donc déjà connu
+            chemin_parent = os.path.dirname(chemin)
+            id_parent = (
+                dossiers_existants.get(chemin_parent)
+                if chemin_parent != chemin
+                else None
+            )
+            nom = os.path.basename(chemin) or chemin
+
             if chemin in dossiers_existants:
                 # Dossier existant → récupérer l'id et la taille précédente
                 id_dossier = dossiers_existants[chemin]
@@ -387,43 +849,87 @@ def traiter_dossiers_en_lot(
                 # Collecter l'ID pour résurrection batchée
                 ids_a_resurrecter.append(id_dossier)
 
+                if id_dossier in ids_a_completer:
+                    parents_a_completer.append((id_parent, nom, id_dossier))
+
                 taille_precedente = tailles_precedentes.get(id_dossier, 0)
                 diff_ko = taille_en_ko - int(taille_precedente)
 
                 if chemin_racine_norm and chemin_norm == chemin_racine_norm:
                     changement_racine = diff_ko
 
-                # N'insérer dans sizes que si la taille a changé
+                # N'insérer dans sizes que si la taille a changé ; la variation
+                # du scan précédent est remise à zéro si elle ne se répète pas.
+                # Les statistiques ne sont mises à jour qu'aux changements : les
+                # scans sans changement y sont intégrés au suivant
+                stats_dossier = statistiques.get(id_dossier, (0.0, 0.0, 0, None))
+                zscore = None
                 if taille_en_ko != int(taille_precedente):
                     curseur.execute(
                         "INSERT INTO sizes (id_scan, id_folder, size_kb) VALUES (%s, %s, %s)",
                         (id_scan, id_dossier, taille_en_ko),
                     )
+                    dernier_scan = stats_dossier[3]
+                    sans_changement = (
+                        bisect.bisect_left(scans_termines, id_scan)
+                        - bisect.bisect_right(scans_termines, dernier_scan)
+                        if dernier_scan is not None
+                        else 0
+                    )
+                    stats_dossier, zscore = mettre_a_jour_statistiques_variation(
+                        stats_dossier, diff_ko, id_scan,
+                        scans_sans_changement=max(sans_changement, 0),
+                    )
+                    tailles_courantes.append(
+                        (taille_en_ko, diff_ko, *stats_dossier, id_dossier)
+                    )
+                    if mouvements is not None:
+                        retenir_mouvement(mouvements, (
+                            id_dossier, "modification", chemin,
+                            int(taille_precedente), taille_en_ko,
+                        ))
+                elif deltas_precedents.get(id_dossier, 0) != 0:
+                    tailles_courantes.append((taille_en_ko, 0, *stats_dossier, id_dossier))
 
                 # Convertir en Mo pour la comparaison avec le seuil (qui est en Mo)
                 diff_mo = round(diff_ko / 1024)
-                seuil = obtenir_seuil_pour_chemin(
-                    chemin, seuils_personnalises, seuil_defaut
-                )
-                if abs(diff_mo) > seuil:
+                # -1 : aucun seuil personnalisé ne couvre ce chemin
+                seuil_personnalise = obtenir_seuil_pour_chemin(chemin, seuils_personnalises, -1)
+                if seuil_personnalise >= 0:
+                    anomalie = abs(diff_mo) > seuil_personnalise
+                elif seuil_zscore > 0 and zscore is not None:
+                    anomalie = abs(zscore) > seuil_zscore and abs(diff_mo) >= seuil_min_anomalie
+                else:
+                    anomalie = abs(diff_mo) > seuil_defaut
+                if anomalie:
                     dossiers_modifies.append(
                         {
                             "type": "modification",
                             "chemin": chemin,
                             "difference": diff_mo,
+                            "id_folder": id_dossier,
+                            "avant_kb": int(taille_precedente),
+                            "apres_kb": taille_en_ko,
+                            "zscore": round(zscore, 1) if zscore is not None else None,
                         }
                     )
             else:
                 # Nouveau dossier → INSERT dans folders + sizes
-                curseur.execute(
-                    "INSERT INTO folders (path, is_new) VALUES (%s, 1)",
-                    (chemin,),
-                )
-                id_dossier = int(curseur.lastrowid) if curseur.lastrowid is not None else 0
+                id_dossier = _inserer_dossier(curseur, chemin, id_parent, nom)
+                dossiers_existants[chemin] = id_dossier
+                ids_a_indexer.append(id_dossier)
                 curseur.execute(
                     "INSERT INTO sizes (id_scan, id_folder, size_kb) VALUES (%s, %s, %s)",
                     (id_scan, id_dossier, taille_en_ko),
                 )
+                # Statistiques de variation : apprentissage à partir de ce scan
+                tailles_courantes.append(
+                    (taille_en_ko, taille_en_ko, 0.0, 0.0, 0, id_scan, id_dossier)
+                )
+                if mouvements is not None:
+                    retenir_mouvement(
+                        mouvements, (id_dossier, "nouveau", chemin, 0, taille_en_ko)
+                    )
 
                 if chemin_racine_norm and chemin_norm == chemin_racine_norm:
                     changement_racine = taille_en_ko
@@ -439,13 +945,18 @@ def traiter_dossiers_en_lot(
                             "type": "nouveau",
                             "chemin": chemin,
                             "taille": taille_en_mo,
+                            "id_folder": id_dossier,
+                            "taille_kb": taille_en_ko,
                         }
                     )
 
             compteur += 1
             if compteur % 5000 == 0:
+                _enregistrer_tailles_courantes(curseur, tailles_courantes)
+                tailles_courantes = []
                 connexion_mysql.commit()
 
+        _enregistrer_tailles_courantes(curseur, tailles_courantes)
         # Résurrection batchée : réactiver les dossiers supprimés en une seule requête
         if ids_a_resurrecter:
             placeholders = ",".join(["%s"] * len(ids_a_resurrecter))
@@ -453,6 +964,15 @@ def traiter_dossiers_en_lot(
                 f"UPDATE folders SET is_deleted = 0 WHERE id_folder IN ({placeholders}) AND is_deleted = 1",
                 ids_a_resurrecter,
             )
+        # Complète parent_id / name des lignes créées avant leur introduction
+        if parents_a_completer:
+            curseur.executemany(
+                "UPDATE folders SET parent_id = %s, name = %s WHERE id_folder = %s",
+                parents_a_completer,
+            )
+            ids_a_indexer.extend(id_dossier for _, _, id_dossier in parents_a_completer)
+        # Index de recherche : noms des dossiers nouveaux ou tout juste nommés
+        _indexer_trigrammes_dossiers(curseur, ids_a_indexer)
         connexion_mysql.commit()
         return nouveaux_dossiers, dossiers_modifies, taille_totale_scan, changement_racine
 
@@ -5,8 +5,12 @@ Calcul de tailles, listing de dossiers, exclusions.
 
 import logging
 import os
+import time
+from collections.abc import Sequence
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import progression
+
 logger = logging.getLogger(__name__)
 
 # Nombre de threads pour le calcul parallèle des tailles (configurable via .env)
@@ -70,7 +74,7 @@ def lister_tous_les_dossier(
 
 
 def _calculer_taille_fichiers_dossier(
-    dossier: str, fichiers: list[str]
+    dossier: str, fichiers: Sequence[str]
 ) -> tuple[str, int]:
     """
     Calcule la taille totale des fichiers directs d'un seul dossier.
@@ -85,23 +89,59 @@ def _calculer_taille_fichiers_dossier(
     return dossier, total
 
 
+def _visiter_dossier(
+    visiteurs: dict[str, dict],
+    dossier: str,
+    sous_dossiers: tuple[str, ...],
+    fichiers: tuple[str, ...],
+) -> None:
+    """
+    Appelle le visiteur de chaque plugin pour un dossier et cumule le temps
+    passé dans chacun. Un visiteur qui lève une exception est écarté pour le
+    reste du scan.
+    """
+    for nom, visiteur in visiteurs.items():
+        if visiteur["erreur"]:
+            continue
+        debut = time.perf_counter()
+        try:
+            visiteur["fonction"](dossier, sous_dossiers, fichiers)
+        except Exception as e:
+            visiteur["erreur"] = f"{dossier} : {type(e).__name__}: {e}"
+            logger.exception(
+                "Visiteur du plugin '%s' désactivé pour ce scan (%s)", nom, visiteur["erreur"]
+            )
+        finally:
+            visiteur["duree_s"] += time.perf_counter() - debut
+            visiteur["nb_dossiers"] += 1
+
+
 def scanner_arborescence(
-    chemin_racine: str, chemins_exclus: list[str] | None = None
+    chemin_racine: str,
+    chemins_exclus: list[str] | None = None,
+    visiteurs: dict[str, dict] | None = None,
 ) -> dict[str, int]:
     """
     Parcourt l'arborescence en 3 phases et retourne un dictionnaire
     {chemin_dossier: taille_en_octets} incluant les sous-dossiers.
+    Les clés sont ordonnées de haut en bas (un parent précède ses enfants).
 
     Optimisé pour les volumes Docker (latence I/O élevée par stat()) :
       Phase 1 — Collecte rapide de la structure (topdown=True, prune les exclusions)
       Phase 2 — Calcul parallèle des tailles fichiers (ThreadPoolExecutor)
       Phase 3 — Agrégation bottom-up des tailles (parents = somme enfants)
+
+    visiteurs ({nom: {fonction, duree_s, nb_dossiers, erreur}}, voir
+    plugin_loader.preparer_visiteurs) : pendant la phase 1, chaque fonction
+    reçoit (dossier, sous_dossiers, fichiers) en tuples, sans accès disque
+    supplémentaire ; le temps passé est cumulé dans duree_s.
     """
     # ── Phase 1 : Collecter la structure de l'arborescence ──────────
     # topdown=True permet de couper (prune) les dossiers exclus AVANT
     # de descendre dedans, contrairement à topdown=False qui les parcourt
     # inutilement puis les ignore.
-    structure: dict[str, tuple[list[str], list[str]]] = {}
+    structure: dict[str, tuple[tuple[str, ...], tuple[str, ...]]] = {}
+    progression.definir_phase("structure", chemin_racine)
 
     for dossier, sous_dossiers, fichiers in os.walk(
         chemin_racine, topdown=True, followlinks=False
@@ -118,7 +158,12 @@ def scanner_arborescence(
                 if not est_chemin_exclu(os.path.join(dossier, sd), chemins_exclus)
             ]
 
-        structure[dossier] = (list(fichiers), list(sous_dossiers))
+        # Tuples : partagés tels quels avec les visiteurs des plugins
+        entrees = (tuple(fichiers), tuple(sous_dossiers))
+        structure[dossier] = entrees
+        progression.compter(dossiers=1, fichiers=len(fichiers))
+        if visiteurs:
+            _visiter_dossier(visiteurs, dossier, entrees[1], entrees[0])
 
     logger.info(
         "Phase 1 terminée : %d dossiers collectés pour %s",
@@ -131,6 +176,7 @@ def scanner_arborescence(
     # Les appels stat() à travers les volumes Docker ont une latence élevée,
     # le multithreading permet de les exécuter simultanément.
     tailles_directes: dict[str, int] = {}
+    progression.definir_phase("tailles")
 
     with ThreadPoolExecutor(max_workers=NB_THREADS_SCAN) as executor:
         futures = {
@@ -139,27 +185,35 @@ def scanner_arborescence(
             ): dossier
             for dossier, (fichiers, _) in structure.items()
         }
+        restants = len(futures)
+        progression.definir_file_attente(restants)
         for future in as_completed(futures):
             dossier, taille = future.result()
             tailles_directes[dossier] = taille
+            restants -= 1
+            progression.definir_file_attente(restants)
+            progression.compter(octets=taille)
 
     logger.info("Phase 2 terminée : tailles fichiers calculées en parallèle")
 
     # ── Phase 3 : Agréger bottom-up (dossiers les plus profonds d'abord) ──
     tailles: dict[str, int] = {}
+    progression.definir_phase("agregation")
 
     for dossier in sorted(
         structure.keys(), key=lambda d: d.count(os.sep), reverse=True
     ):
-        _, sous_dossiers = structure[dossier]
+        _, enfants = structure[dossier]
         taille_sous_dossiers = sum(
-            tailles.get(os.path.join(dossier, sd), 0) for sd in sous_dossiers
+            tailles.get(os.path.join(dossier, sd), 0) for sd in enfants
         )
         tailles[dossier] = tailles_directes.get(dossier, 0) + taille_sous_dossiers
 
     logger.info("Phase 3 terminée : agrégation bottom-up complète")
 
-    return tailles
+    # Restitue l'ordre topdown de la phase 1 (parents avant enfants) pour que
+    # l'insertion en BDD connaisse toujours l'id du parent d'un dossier
+    return {dossier: tailles[dossier] for dossier in structure}
 
 
 def filtrer_dossiers_redondants(dossiers: list[dict]) -> list[dict]:
@@ -4,6 +4,8 @@ Fournit un dashboard, l'historique des dossiers et la configuration.
 """
 
 import os
+import threading
+
 import dotenv
 
 from version import __version__
@@ -17,6 +19,26 @@ from flask_login import (  # type: ignore[import-untyped]
     current_user,
 )
 
+# Durée de vie d'une connexion /api/scan-progress (secondes) et délai de
+# reconnexion conseillé au navigateur (millisecondes)
+DUREE_FLUX_PROGRESSION = 60
+DELAI_RECONNEXION_PROGRESSION_MS = 2000
+
+
+def _max_flux_progression() -> int:
+    """
+    Nombre maximal de flux /api/scan-progress ouverts en même temps
+    (INTRA_FLUX_PROGRESSION, par défaut le quart de INTRA_THREADS) : chaque
+    flux occupe un thread de waitress, le reste doit servir les autres pages.
+    """
+    try:
+        valeur = os.getenv("INTRA_FLUX_PROGRESSION")
+        if valeur is not None:
+            return max(0, int(valeur))
+        return max(1, int(os.getenv("INTRA_THREADS", "8")) // 4)
+    except ValueError:
+        return 2
+
 
 class Admin(UserMixin):
     """
@@ -47,7 +69,12 @@ def creer_app() -> Flask:
     app.jinja_env.globals["DS_VERSION"] = __version__
 
     app.config["SECRET_KEY"] = os.getenv("INTRA_SECRET_KEY", "change-me-in-production")
-    app.config["TEMPLATES_AUTO_RELOAD"] = True
+    # Templates relus à chaque requête uniquement en mode debug ;
+    # en production, Jinja garde les templates compilés en cache
+    app.config["TEMPLATES_AUTO_RELOAD"] = os.getenv("FLASK_DEBUG", "0") == "1"
+
+    # Places des flux de progression, rendues à la fermeture de la réponse
+    places_flux = threading.BoundedSemaphore(_max_flux_progression())
 
     @app.template_filter("format_size")
     def format_size(kb: float | int | None) -> str:
@@ -123,18 +150,21 @@ def creer_app() -> Flask:
     @app.route("/")
     @login_required
     def dashboard():
-        from intranet.queries import get_stats_dashboard
+        from intranet.queries import get_croissances_rapides, get_stats_dashboard
 
         stats = get_stats_dashboard()
-        return render_template("dashboard.html", stats=stats)
+        croissances = get_croissances_rapides(10) if stats else []
+        return render_template("dashboard.html", stats=stats, croissances=croissances)
 
     @app.route("/history")
     @login_required
     def history():
-        from intranet.queries import get_dossiers_racines
+        from intranet.queries import get_dossiers_racines, get_scans_history
 
         racines = get_dossiers_racines()
-        return render_template("history.html", racines=racines)
+        # Scans proposés pour afficher l'arborescence à une date passée
+        scans = [s for s in get_scans_history(limit=50) if s.get("status") == "completed"]
+        return render_template("history.html", racines=racines, scans=scans)
 
     @app.route("/scans")
     @login_required
@@ -156,6 +186,37 @@ def creer_app() -> Flask:
             return jsonify([])
         return jsonify(get_enfants_dossier(parent_path))
 
+    @app.route("/api/enfants-pagines")
+    @login_required
+    def api_enfants_pagines():
+        from flask import jsonify
+        from flask import request as req
+
+        from intranet.queries import get_enfants_page
+
+        parent_path = req.args.get("path", "")
+        if not parent_path:
+            return jsonify({})
+        tri = req.args.get("tri", "taille")
+        apres = req.args.get("apres") or None
+        limite = min(max(req.args.get("limite", 200, type=int), 1), 1000)
+        return jsonify(get_enfants_page(parent_path, tri, apres, limite))
+
+    @app.route("/api/sous-arbre")
+    @login_required
+    def api_sous_arbre():
+        from flask import jsonify
+        from flask import request as req
+
+        from intranet.queries import get_sous_arbre
+
+        parent_path = req.args.get("path", "")
+        if not parent_path:
+            return jsonify({})
+        profondeur = req.args.get("profondeur", 2, type=int)
+        id_scan = req.args.get("scan", None, type=int)
+        return jsonify(get_sous_arbre(parent_path, profondeur, id_scan))
+
     @app.route("/api/historique/<int:id_folder>")
     @login_required
     def api_historique(id_folder: int):
@@ -163,9 +224,10 @@ def creer_app() -> Flask:
         from intranet.queries import get_historique_dossier
 
         periode = req.args.get("periode", "30")
-        page = req.args.get("page", 1, type=int)
-        per_page = req.args.get("per_page", 15, type=int)
-        data = get_historique_dossier(id_folder, periode, page, per_page)
+        avant = req.args.get("avant", None, type=int)
+        per_page = min(max(req.args.get("per_page", 15, type=int), 1), 200)
+        points = min(max(req.args.get("points", 200, type=int), 3), 2000)
+        data = get_historique_dossier(id_folder, periode, avant, per_page, points)
         return jsonify(data)
 
     @app.route("/api/recherche")
@@ -179,6 +241,25 @@ def creer_app() -> Flask:
             return jsonify([])
         return jsonify(rechercher_dossiers(q))
 
+    @app.route("/api/diff")
+    @login_required
+    def api_diff():
+        from flask import jsonify
+        from flask import request as req
+
+        from intranet.queries import get_diff_scans
+
+        id_scan_a = req.args.get("a", type=int)
+        id_scan_b = req.args.get("b", type=int)
+        if id_scan_a is None or id_scan_b is None:
+            return jsonify({"error": "Paramètres a et b (id de scan) requis"}), 400
+        limite = min(max(req.args.get("limite", 100, type=int), 1), 5000)
+        chemin = req.args.get("path") or None
+        data = get_diff_scans(id_scan_a, id_scan_b, limite, chemin)
+        if not data:
+            return jsonify({"error": "Scan introuvable"}), 404
+        return jsonify(data)
+
     @app.route("/api/scan-details/<int:id_scan>")
     @login_required
     def api_scan_details(id_scan: int):
@@ -190,6 +271,154 @@ def creer_app() -> Flask:
             return jsonify({"error": "Scan introuvable"}), 404
         return jsonify(data)
 
+    def _reponse_export(format_: str, prefixe: str, entetes: list[str], lignes):
+        """Réponse HTTP envoyant l'export au fil de l'eau (CSV ou XLSX)."""
+        from flask import Response, abort, stream_with_context
+
+        from intranet.export import FORMATS_EXPORT, generer_export, nom_fichier_export
+
+        if format_ not in FORMATS_EXPORT:
+            abort(404)
+        return Response(
+            stream_with_context(generer_export(format_, prefixe, entetes, lignes)),
+            mimetype=FORMATS_EXPORT[format_],
+            headers={
+                "Content-Disposition": f'attachment; filename="{nom_fichier_export(prefixe, format_)}"'
+            },
+        )
+
+    @app.route("/export/scan/<int:id_scan>.<format_>")
+    @login_required
+    def export_scan(id_scan: int, format_: str):
+        from intranet.queries import ENTETES_EXPORT_SCAN, iterer_changements_scan
+
+        return _reponse_export(
+            format_, f"scan_{id_scan}", ENTETES_EXPORT_SCAN, iterer_changements_scan(id_scan)
+        )
+
+    @app.route("/export/sous-arbre.<format_>")
+    @login_required
+    def export_sous_arbre(format_: str):
+        from flask import abort
+        from flask import request as req
+
+        from intranet.queries import ENTETES_EXPORT_SOUS_ARBRE, iterer_sous_arbre
+
+        parent_path = req.args.get("path", "")
+        if not parent_path:
+            abort(400)
+        return _reponse_export(
+            format_, "sous_arbre", ENTETES_EXPORT_SOUS_ARBRE, iterer_sous_arbre(parent_path)
+        )
+
+    @app.route("/export/historique/<int:id_folder>.<format_>")
+    @login_required
+    def export_historique(id_folder: int, format_: str):
+        from intranet.queries import (
+            ENTETES_EXPORT_HISTORIQUE,
+            iterer_historique_dossier,
+        )
+
+        return _reponse_export(
+            format_,
+            f"historique_{id_folder}",
+            ENTETES_EXPORT_HISTORIQUE,
+            iterer_historique_dossier(id_folder),
+        )
+
+    @app.route("/api/cache-stats")
+    @login_required
+    def api_cache_stats():
+        from flask import jsonify
+
+        from intranet.queries import get_stats_cache
+
+        return jsonify(get_stats_cache())
+
+    @app.route("/requetes")
+    @login_required
+    def requetes():
+        from mesures_sql import NB_REQUETES_LENTES, get_agregats, get_requetes_lentes
+        from processus import get_statuts, processus_separes_actifs
+
+        # En mode supervision, les requêtes du scanner sont mesurées dans son
+        # propre processus : on affiche celles publiées à la fin du dernier scan
+        scanner = get_statuts().get("requetes_sql") if processus_separes_actifs() else None
+        return render_template(
+            "requetes.html",
+            lentes=get_requetes_lentes(),
+            agregats=get_agregats(50),
+            scanner=scanner,
+            nb_lentes=NB_REQUETES_LENTES,
+            seuil_ms=os.getenv("SEUIL_REQUETE_LENTE_MS", "500"),
+        )
+
+    @app.route("/api/requetes-sql")
+    @login_required
+    def api_requetes_sql():
+        from flask import jsonify
+
+        from mesures_sql import get_agregats, get_requetes_lentes
+
+        return jsonify({"lentes": get_requetes_lentes(), "agregats": get_agregats(50)})
+
+    @app.route("/api/processus")
+    @login_required
+    def api_processus():
+        from flask import jsonify
+
+        from processus import get_statuts
+
+        return jsonify(get_statuts())
+
+    @app.route("/api/scan-progress")
+    @login_required
+    def api_scan_progress():
+        """
+        Flux Server-Sent Events de la progression du scan en cours.
+        Le flux est fermé dès qu'aucun scan n'est en cours (après un dernier
+        état), et au plus tard après DUREE_FLUX_PROGRESSION secondes, pour ne
+        pas monopoliser un thread du serveur ; EventSource se reconnecte seul.
+        Au-delà de INTRA_FLUX_PROGRESSION flux ouverts, répond 503 : la page
+        relève alors la progression sur /api/processus.
+        """
+        import json
+        import time
+
+        from flask import Response, stream_with_context
+
+        from processus import get_statuts
+
+        if not places_flux.acquire(blocking=False):
+            return Response(
+                "Trop de flux de progression ouverts", status=503, headers={"Retry-After": "5"}
+            )
+
+        def generer():
+            yield f"retry: {DELAI_RECONNEXION_PROGRESSION_MS}\n\n"
+            dernier = None
+            fin = time.monotonic() + DUREE_FLUX_PROGRESSION
+            while time.monotonic() < fin:
+                statut = get_statuts().get("progression")
+                if statut != dernier:
+                    dernier = statut
+                    yield f"data: {json.dumps(statut or {})}\n\n"
+                    if not statut or statut.get("etat") != "en_cours":
+                        return
+                else:
+                    # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                    yield ": ping\n\n"
+                time.sleep(1)
+
+        reponse = Response(
+            stream_with_context(generer()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        # Appelé par le serveur à la fin du flux ou à la déconnexion du client
+        reponse.call_on_close(places_flux.release)
+        return reponse
+
     @app.route("/plugins")
     @login_required
     def plugins():
@@ -457,3 +686,37 @@ def creer_app() -> Flask:
             return jsonify({"ok": False, "msg": f"Échec : {str(e)}"})
 
     return app
+
+
+def description_serveur() -> str:
+    """Décrit le serveur utilisé par servir_intranet (pour les messages de démarrage)."""
+    try:
+        import waitress  # type: ignore[import-untyped]  # noqa: F401
+    except ImportError:
+        return "serveur de développement Flask"
+    return f"waitress, {int(os.getenv('INTRA_THREADS', '8'))} threads"
+
+
+def servir_intranet(app: Flask, port: int) -> None:
+    """
+    Sert l'application (bloquant) avec waitress : serveur WSGI pur Python,
+    utilisable dans l'exe, avec un pool de INTRA_THREADS threads et un délai
+    INTRA_TIMEOUT sur les connexions inactives.
+    Repli sur le serveur de développement Flask si waitress n'est pas installé.
+    """
+    intra_threads = int(os.getenv("INTRA_THREADS", "8"))
+    intra_timeout = int(os.getenv("INTRA_TIMEOUT", "30"))
+    try:
+        from waitress import serve  # type: ignore[import-untyped]
+    except ImportError:
+        app.run(host="0.0.0.0", port=port, debug=False)
+        return
+    serve(
+        app,
+        host="0.0.0.0",
+        port=port,
+        threads=intra_threads,
+        channel_timeout=intra_timeout,
+        connection_limit=intra_threads * 25,
+        ident="SuperviseurDossiers",
+    )
@@ -0,0 +1,89 @@
+"""
+Module d'export de l'Intranet.
+Transforme un générateur de lignes (voir les fonctions iterer_* de
+intranet/queries.py) en fichier CSV ou XLSX envoyé au fil de l'eau.
+"""
+
+import csv
+import io
+import tempfile
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+
+# Nombre de lignes CSV regroupées par morceau envoyé au navigateur
+LIGNES_PAR_MORCEAU_CSV = 1000
+
+# Taille des morceaux lus dans le fichier XLSX temporaire (octets)
+TAILLE_MORCEAU_XLSX = 64 * 1024
+
+FORMATS_EXPORT = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _valeur_cellule(valeur):
+    """Convertit les types renvoyés par MariaDB (bytes, bool…) pour l'export."""
+    if isinstance(valeur, (bytes, bytearray)):
+        return valeur.decode("utf-8", errors="replace")
+    return valeur
+
+
+def generer_csv(entetes: list[str], lignes: Iterable[tuple]) -> Iterator[bytes]:
+    """
+    Produit le CSV par morceaux de LIGNES_PAR_MORCEAU_CSV lignes.
+    Séparateur « ; » et BOM UTF-8 pour une ouverture directe dans Excel (fr).
+    """
+    tampon = io.StringIO()
+    writer = csv.writer(tampon, delimiter=";")
+    writer.writerow(entetes)
+    yield "\ufeff".encode("utf-8") + tampon.getvalue().encode("utf-8")
+    tampon.seek(0)
+    tampon.truncate()
+
+    for compteur, ligne in enumerate(lignes, start=1):
+        writer.writerow([_valeur_cellule(v) for v in ligne])
+        if compteur % LIGNES_PAR_MORCEAU_CSV == 0:
+            yield tampon.getvalue().encode("utf-8")
+            tampon.seek(0)
+            tampon.truncate()
+    if tampon.tell():
+        yield tampon.getvalue().encode("utf-8")
+
+
+def generer_xlsx(titre: str, entetes: list[str], lignes: Iterable[tuple]) -> Iterator[bytes]:
+    """
+    Produit le classeur XLSX avec openpyxl en mode write_only : chaque ligne
+    est écrite dans un fichier temporaire au lieu d'être gardée en mémoire.
+    Un XLSX étant une archive zip, il n'est envoyé qu'une fois complet.
+    """
+    from openpyxl import Workbook  # type: ignore[import-untyped]
+
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet(title=titre[:31])
+    feuille.append(entetes)
+    for ligne in lignes:
+        feuille.append([_valeur_cellule(v) for v in ligne])
+
+    with tempfile.TemporaryFile() as fichier:
+        classeur.save(fichier)
+        fichier.seek(0)
+        while True:
+            morceau = fichier.read(TAILLE_MORCEAU_XLSX)
+            if not morceau:
+                break
+            yield morceau
+
+
+def generer_export(
+    format_: str, titre: str, entetes: list[str], lignes: Iterable[tuple]
+) -> Iterator[bytes]:
+    """Aiguille vers generer_csv ou generer_xlsx selon le format demandé."""
+    if format_ == "xlsx":
+        return generer_xlsx(titre, entetes, lignes)
+    return generer_csv(entetes, lignes)
+
+
+def nom_fichier_export(prefixe: str, format_: str) -> str:
+    """Nom du fichier proposé au téléchargement, horodaté."""
+    return f"{prefixe}_{datetime.now().strftime('%Y%m%d_%H%M')}.{format_}"
@@ -3,16 +3,67 @@ Requêtes SQL dédiées à l'interface Intranet.
 Séparées de db.py pour ne pas alourdir le cœur du scanner.
 """
 
+import functools
+import json
+import logging
 import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
 
 import mysql.connector
 from typing import cast, Any
 
+from mesures_sql import instrumenter_connexion
 
-def get_connexion() -> mysql.connector.MySQLConnection | None:
-    """Ouvre une connexion à la BDD MariaDB."""
+logger = logging.getLogger(__name__)
+
+# --- Cache des réponses ---
+# Les résultats ne changent qu'à la fin d'un scan : ils sont mis en cache par
+# id du dernier scan complété (et du dernier lancé). Ces ids sont relus au
+# plus toutes les CACHE_TTL_VERSION secondes, ou dès l'appel suivant après
+# invalider_cache().
+CACHE_TTL_VERSION = 5
+
+# Sous-arbre de l'explorateur : profondeur maximale et nombre maximal de
+# dossiers renvoyés en une réponse
+PROFONDEUR_SOUS_ARBRE_MAX = 4
+MAX_NOEUDS_SOUS_ARBRE = 5000
+
+# Nombre de lignes lues par aller-retour lors d'un export
+TAILLE_LOT_EXPORT = 1000
+
+# Tris proposés pour les enfants paginés : colonne de folders et sens
+TRIS_ENFANTS = {
+    "taille": ("f.size_kb", "DESC"),
+    "variation": ("f.delta_kb", "DESC"),
+    "nom": ("f.name", "ASC"),
+}
+
+_cache: OrderedDict[tuple, tuple[Any, int]] = OrderedDict()
+_cache_verrou = threading.Lock()
+_cache_etat: dict[str, Any] = {
+    "version": None,
+    "verifie_le": 0.0,
+    "octets": 0,
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+}
+
+
+def get_connexion(borner_duree: bool = True) -> mysql.connector.MySQLConnection | None:
+    """
+    Ouvre une connexion à la BDD MariaDB.
+    Chaque requête SQL est bornée à INTRA_TIMEOUT secondes (max_statement_time)
+    pour qu'une requête lente n'occupe pas indéfiniment un thread du serveur,
+    sauf borner_duree=False (exports, lus au rythme du navigateur), et
+    chronométrée (voir mesures_sql).
+    """
     try:
-        return mysql.connector.connect(  # type: ignore[return-value]
+        conn = mysql.connector.connect(
             host=os.getenv("DB_HOST"),
             port=int(os.getenv("DB_PORT", "3306")),
             user=os.getenv("DB_USER"),
@@ -21,6 +72,142 @@ def get_connexion() -> mysql.connector.MySQLConnection | None:
         )
     except mysql.connector.Error:
         return None
+    try:
+        instrumenter_connexion(conn)
+        timeout = int(os.getenv("INTRA_TIMEOUT", "30"))
+        if borner_duree and timeout > 0:
+            cur = conn.cursor()
+            cur.execute("SET SESSION max_statement_time = %s", (timeout,))
+            cur.close()
+    except mysql.connector.Error:
+        # Connexion ouverte mais inutilisable : fermée pour ne pas la laisser fuir
+        conn.close()
+        return None
+    return conn  # type: ignore[return-value]
+
+
+def _cache_max_octets() -> int:
+    """Taille maximale du cache en octets (INTRA_CACHE_MO, 0 = désactivé)."""
+    try:
+        return max(0, int(os.getenv("INTRA_CACHE_MO", "50"))) * 1024 * 1024
+    except ValueError:
+        return 50 * 1024 * 1024
+
+
+def _version_scan_courante() -> tuple | None:
+    """
+    Retourne (dernier scan complété, dernier scan lancé, statut de ce dernier),
+    relu en base au plus toutes les CACHE_TTL_VERSION secondes. Vide le cache
+    si un nouveau scan est apparu ou si le scan en cours a changé de statut
+    (terminé, échoué ou marqué planté).
+    None si la base est injoignable (le cache est alors contourné).
+    """
+    maintenant = time.monotonic()
+    with _cache_verrou:
+        if (
+            _cache_etat["version"] is not None
+            and maintenant - _cache_etat["verifie_le"] < CACHE_TTL_VERSION
+        ):
+            return _cache_etat["version"]
+
+    conn = get_connexion()
+    if not conn:
+        return None
+    try:
+        cur = conn.cursor()
+        # Le dernier scan lancé compte aussi, avec son statut : le tableau de
+        # bord affiche le scan en cours, dont la vue périme à sa fin
+        cur.execute(
+            "SELECT MAX(CASE WHEN status = 'completed' THEN id_scan END), MAX(id_scan), "
+            "(SELECT status FROM scans ORDER BY id_scan DESC LIMIT 1) FROM scans"
+        )
+        row = cur.fetchone()
+        version = (row[0] or 0, row[1] or 0, row[2]) if row else (0, 0, None)
+    except mysql.connector.Error:
+        return None
+    finally:
+        conn.close()
+
+    with _cache_verrou:
+        if version != _cache_etat["version"]:
+            _cache.clear()
+            _cache_etat["octets"] = 0
+            _cache_etat["version"] = version
+        _cache_etat["verifie_le"] = maintenant
+    return version
+
+
+def invalider_cache() -> None:
+    """
+    Vide le cache des réponses. Appelé par le scanner quand un scan se
+    termine, qu'il soit completed ou failed ; la version est relue en base
+    à la requête suivante.
+    """
+    with _cache_verrou:
+        _cache.clear()
+        _cache_etat["octets"] = 0
+        _cache_etat["version"] = None
+
+
+def get_stats_cache() -> dict:
+    """Retourne les compteurs du cache (hits, misses, taux, taille)."""
+    with _cache_verrou:
+        total = _cache_etat["hits"] + _cache_etat["misses"]
+        return {
+            "version_scan": _cache_etat["version"],
+            "entrees": len(_cache),
+            "octets": _cache_etat["octets"],
+            "max_octets": _cache_max_octets(),
+            "hits": _cache_etat["hits"],
+            "misses": _cache_etat["misses"],
+            "evictions": _cache_etat["evictions"],
+            "taux_hit": round(_cache_etat["hits"] / total, 3) if total else 0.0,
+        }
+
+
+def _cache_par_scan(fonction: Callable) -> Callable:
+    """
+    Met en cache le résultat de la fonction, par (dernier scan complété,
+    arguments), avec éviction LRU au-delà de INTRA_CACHE_MO.
+    Les résultats vides (aucune donnée ou erreur SQL) ne sont pas conservés.
+    """
+
+    @functools.wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        max_octets = _cache_max_octets()
+        version = _version_scan_courante() if max_octets else None
+        if version is None:
+            return fonction(*args, **kwargs)
+
+        cle = (version, fonction.__name__, args, tuple(sorted(kwargs.items())))
+        with _cache_verrou:
+            entree = _cache.get(cle)
+            if entree is not None:
+                _cache.move_to_end(cle)
+                _cache_etat["hits"] += 1
+                return entree[0]
+            _cache_etat["misses"] += 1
+
+        resultat = fonction(*args, **kwargs)
+        if not resultat:
+            return resultat
+
+        taille = len(json.dumps(resultat, default=str))
+        if taille > max_octets:
+            return resultat
+        with _cache_verrou:
+            ancienne = _cache.pop(cle, None)
+            if ancienne is not None:
+                _cache_etat["octets"] -= ancienne[1]
+            _cache[cle] = (resultat, taille)
+            _cache_etat["octets"] += taille
+            while _cache_etat["octets"] > max_octets:
+                _, (_, taille_evincee) = _cache.popitem(last=False)
+                _cache_etat["octets"] -= taille_evincee
+                _cache_etat["evictions"] += 1
+        return resultat
+
+    return enveloppe
 
 
 def get_derniers_scans(limit: int = 10) -> list[dict]:
@@ -73,6 +260,170 @@ def get_scans_history(limit: int = 50) -> list[dict]:
         conn.close()
 
 
+def _calculer_alertes_scan(cur, id_scan: int, total_kb: int) -> tuple[int | None, list[dict]]:
+    """
+    Recalcule la variation et les alertes d'un scan à partir de sizes.
+    Utilisé pour les scans antérieurs à scan_summary / scan_events.
+    """
+    # 3. Scan précédent immédiat (pour calcul de variation totale)
+    cur.execute(
+        """
+        SELECT id_scan FROM scans
+        WHERE status = 'completed' AND id_scan < %s
+        ORDER BY id_scan DESC LIMIT 1
+        """,
+        (id_scan,),
+    )
+    row_prev = cast(dict[str, Any] | None, cur.fetchone())
+    id_scan_prev = row_prev["id_scan"] if row_prev else None
+
+    variation_kb = None
+    if id_scan_prev:
+        cur.execute(
+            "SELECT total_size_kb FROM scans WHERE id_scan = %s",
+            (id_scan_prev,),
+        )
+        prev_row = cast(dict[str, Any] | None, cur.fetchone())
+        prev_kb = (prev_row["total_size_kb"] if prev_row else 0) or 0
+        variation_kb = total_kb - prev_kb
+
+    # 4. Nouveaux dossiers (première apparition dans sizes à cet id_scan)
+    #    Filtrés : uniquement ceux dont la taille dépasse le seuil configuré
+    seuil_mo = int(os.getenv("SEUIL_DEFAUT", "100"))
+    seuil_kb = seuil_mo * 1024
+    cur.execute(
+        """
+        SELECT f.id_folder, f.path, sz.size_kb
+        FROM sizes sz
+        JOIN folders f ON sz.id_folder = f.id_folder
+        WHERE sz.id_scan = %s
+          AND sz.size_kb > %s
+          AND NOT EXISTS (
+              SELECT 1 FROM sizes sz2
+              WHERE sz2.id_folder = sz.id_folder AND sz2.id_scan < %s
+          )
+        ORDER BY sz.size_kb DESC
+        LIMIT 100
+        """,
+        (id_scan, seuil_kb, id_scan),
+    )
+    nouveaux = [
+        {
+            "type": "nouveau",
+            "id_folder": r["id_folder"],
+            "chemin": r["path"],
+            "taille_kb": r["size_kb"],
+        }
+        for r in cast(list[dict[str, Any]], cur.fetchall())
+    ]
+
+    # 5. Dossiers modifiés (variation > SEUIL_DEFAUT) par rapport au scan précédent
+    alertes_modifs = []
+    if id_scan_prev:
+        cur.execute(
+            """
+            SELECT f.id_folder, f.path,
+                   sz_cur.size_kb AS size_kb_cur,
+                   sz_prev.size_kb AS size_kb_prev,
+                   (sz_cur.size_kb - sz_prev.size_kb) AS diff_kb
+            FROM sizes sz_cur
+            JOIN sizes sz_prev ON sz_cur.id_folder = sz_prev.id_folder
+            JOIN folders f ON sz_cur.id_folder = f.id_folder
+            WHERE sz_cur.id_scan = %s
+              AND sz_prev.id_scan = %s
+              AND ABS(sz_cur.size_kb - sz_prev.size_kb) > %s
+            ORDER BY ABS(sz_cur.size_kb - sz_prev.size_kb) DESC
+            LIMIT 100
+            """,
+            (id_scan, id_scan_prev, seuil_kb),
+        )
+        alertes_modifs = [
+            {
+                "type": "modification",
+                "id_folder": r["id_folder"],
+                "chemin": r["path"],
+                "diff_kb": r["diff_kb"],
+                "taille_kb": r["size_kb_cur"],
+            }
+            for r in cast(list[dict[str, Any]], cur.fetchall())
+        ]
+
+    # 6. Dossiers supprimés (size_kb = 0 pour ce scan, avec une taille précédente > 0)
+    alertes_suppr = []
+    if id_scan_prev:
+        cur.execute(
+            """
+            SELECT f.id_folder, f.path,
+                   sz_prev.size_kb AS size_kb_prev
+            FROM sizes sz_cur
+            JOIN sizes sz_prev ON sz_cur.id_folder = sz_prev.id_folder
+            JOIN folders f ON sz_cur.id_folder = f.id_folder
+            WHERE sz_cur.id_scan = %s
+              AND sz_prev.id_scan = %s
+              AND sz_cur.size_kb = 0
+              AND sz_prev.size_kb > 0
+              AND f.is_deleted = 1
+            ORDER BY sz_prev.size_kb DESC
+            LIMIT 100
+            """,
+            (id_scan, id_scan_prev),
+        )
+        alertes_suppr = [
+            {
+                "type": "suppression",
+                "id_folder": r["id_folder"],
+                "chemin": r["path"],
+                "taille_kb": r["size_kb_prev"],
+            }
+            for r in cast(list[dict[str, Any]], cur.fetchall())
+        ]
+
+    return variation_kb, nouveaux + alertes_modifs + alertes_suppr
+
+
+def _lire_evenements_scan(cur, id_scan: int) -> list[dict]:
+    """
+    Lit les alertes d'un scan dans scan_events (écrites par le scanner) :
+    les 100 plus fortes variations de chaque type.
+    """
+    cur.execute(
+        """
+        SELECT event_type, id_folder, path, size_before_kb, size_after_kb
+        FROM (
+            SELECT e.event_type, e.id_folder, f.path,
+                   e.size_before_kb, e.size_after_kb,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY e.event_type
+                       ORDER BY ABS(e.size_after_kb - e.size_before_kb) DESC
+                   ) AS rang
+            FROM scan_events e
+            JOIN folders f ON e.id_folder = f.id_folder
+            WHERE e.id_scan = %s
+        ) ev
+        WHERE rang <= 100
+        ORDER BY FIELD(event_type, 'nouveau', 'modification', 'suppression'), rang
+        """,
+        (id_scan,),
+    )
+    alertes = []
+    for r in cast(list[dict[str, Any]], cur.fetchall()):
+        alerte = {
+            "type": r["event_type"],
+            "id_folder": r["id_folder"],
+            "chemin": r["path"],
+        }
+        if r["event_type"] == "modification":
+            alerte["diff_kb"] = r["size_after_kb"] - r["size_before_kb"]
+            alerte["taille_kb"] = r["size_after_kb"]
+        elif r["event_type"] == "suppression":
+            alerte["taille_kb"] = r["size_before_kb"]
+        else:
+            alerte["taille_kb"] = r["size_after_kb"]
+        alertes.append(alerte)
+    return alertes
+
+
+@_cache_par_scan
 def get_scan_details(id_scan: int) -> dict:
     """
     Retourne les détails complets d'un scan :
@@ -103,118 +454,18 @@ def get_scan_details(id_scan: int) -> dict:
         nb_dossiers = scan.get("total_folders") or 0
         total_kb = scan.get("total_size_kb") or 0
 
-        # 3. Scan précédent immédiat (pour calcul de variation totale)
+        # 3. Variation et alertes : lues dans scan_summary / scan_events si le
+        #    scanner les a écrites, recalculées depuis sizes sinon
         cur.execute(
-            """
-            SELECT id_scan FROM scans
-            WHERE status = 'completed' AND id_scan < %s
-            ORDER BY id_scan DESC LIMIT 1
-            """,
+            "SELECT variation_kb FROM scan_summary WHERE id_scan = %s",
             (id_scan,),
         )
-        row_prev = cast(dict[str, Any] | None, cur.fetchone())
-        id_scan_prev = row_prev["id_scan"] if row_prev else None
-
-        variation_kb = None
-        if id_scan_prev:
-            cur.execute(
-                "SELECT total_size_kb FROM scans WHERE id_scan = %s",
-                (id_scan_prev,),
-            )
-            prev_row = cast(dict[str, Any] | None, cur.fetchone())
-            prev_kb = (prev_row["total_size_kb"] if prev_row else 0) or 0
-            variation_kb = total_kb - prev_kb
-
-        # 4. Nouveaux dossiers (première apparition dans sizes à cet id_scan)
-        #    Filtrés : uniquement ceux dont la taille dépasse le seuil configuré
-        seuil_mo = int(os.getenv("SEUIL_DEFAUT", 100))
-        seuil_kb = seuil_mo * 1024
-        cur.execute(
-            """
-            SELECT f.id_folder, f.path, sz.size_kb
-            FROM sizes sz
-            JOIN folders f ON sz.id_folder = f.id_folder
-            WHERE sz.id_scan = %s
-              AND sz.size_kb > %s
-              AND NOT EXISTS (
-                  SELECT 1 FROM sizes sz2
-                  WHERE sz2.id_folder = sz.id_folder AND sz2.id_scan < %s
-              )
-            ORDER BY sz.size_kb DESC
-            LIMIT 100
-            """,
-            (id_scan, seuil_kb, id_scan),
-        )
-        nouveaux = [
-            {
-                "type": "nouveau",
-                "id_folder": r["id_folder"],
-                "chemin": r["path"],
-                "taille_kb": r["size_kb"],
-            }
-            for r in cast(list[dict[str, Any]], cur.fetchall())
-        ]
-
-        # 5. Dossiers modifiés (variation > SEUIL_DEFAUT) par rapport au scan précédent
-        alertes_modifs = []
-        if id_scan_prev:
-            cur.execute(
-                """
-                SELECT f.id_folder, f.path,
-                       sz_cur.size_kb AS size_kb_cur,
-                       sz_prev.size_kb AS size_kb_prev,
-                       (sz_cur.size_kb - sz_prev.size_kb) AS diff_kb
-                FROM sizes sz_cur
-                JOIN sizes sz_prev ON sz_cur.id_folder = sz_prev.id_folder
-                JOIN folders f ON sz_cur.id_folder = f.id_folder
-                WHERE sz_cur.id_scan = %s
-                  AND sz_prev.id_scan = %s
-                  AND ABS(sz_cur.size_kb - sz_prev.size_kb) > %s
-                ORDER BY ABS(sz_cur.size_kb - sz_prev.size_kb) DESC
-                LIMIT 100
-                """,
-                (id_scan, id_scan_prev, seuil_kb),
-            )
-            alertes_modifs = [
-                {
-                    "type": "modification",
-                    "id_folder": r["id_folder"],
-                    "chemin": r["path"],
-                    "diff_kb": r["diff_kb"],
-                    "taille_kb": r["size_kb_cur"],
-                }
-                for r in cast(list[dict[str, Any]], cur.fetchall())
-            ]
-
-        # 6. Dossiers supprimés (size_kb = 0 pour ce scan, avec une taille précédente > 0)
-        alertes_suppr = []
-        if id_scan_prev:
-            cur.execute(
-                """
-                SELECT f.id_folder, f.path,
-                       sz_prev.size_kb AS size_kb_prev
-                FROM sizes sz_cur
-                JOIN sizes sz_prev ON sz_cur.id_folder = sz_prev.id_folder
-                JOIN folders f ON sz_cur.id_folder = f.id_folder
-                WHERE sz_cur.id_scan = %s
-                  AND sz_prev.id_scan = %s
-                  AND sz_cur.size_kb = 0
-                  AND sz_prev.size_kb > 0
-                  AND f.is_deleted = 1
-                ORDER BY sz_prev.size_kb DESC
-                LIMIT 100
-                """,
-                (id_scan, id_scan_prev),
-            )
-            alertes_suppr = [
-                {
-                    "type": "suppression",
-                    "id_folder": r["id_folder"],
-                    "chemin": r["path"],
-                    "taille_kb": r["size_kb_prev"],
-                }
-                for r in cast(list[dict[str, Any]], cur.fetchall())
-            ]
+        resume_scan = cast(dict[str, Any] | None, cur.fetchone())
+        if resume_scan:
+            variation_kb = resume_scan["variation_kb"]
+            alertes = _lire_evenements_scan(cur, id_scan)
+        else:
+            variation_kb, alertes = _calculer_alertes_scan(cur, id_scan, total_kb)
 
         # Convertit la date pour la sérialisation JSON
         if scan.get("date_"):
@@ -229,7 +480,7 @@ def get_scan_details(id_scan: int) -> dict:
                 "total_kb": total_kb,
                 "variation_kb": variation_kb,
             },
-            "alertes": nouveaux + alertes_modifs + alertes_suppr,
+            "alertes": alertes,
         }
 
     except mysql.connector.Error:
@@ -238,6 +489,7 @@ def get_scan_details(id_scan: int) -> dict:
         conn.close()
 
 
+@_cache_par_scan
 def get_stats_dashboard() -> dict:
     """
     Retourne les statistiques pour le tableau de bord :
@@ -245,6 +497,8 @@ def get_stats_dashboard() -> dict:
     - Nombre total de dossiers surveillés
     - Nombre total de scans effectués
     - Top 5 dossiers avec le plus grand changement entre les 2 derniers scans
+    Lues en une requête dans dashboard_stats (tenue à jour par le scanner) ;
+    recalculées depuis les tables tant que cette ligne n'existe pas.
     """
     conn = get_connexion()
     if not conn:
@@ -252,33 +506,114 @@ def get_stats_dashboard() -> dict:
 
     try:
         cur = conn.cursor(dictionary=True)
+        cur.execute(
+            """
+            SELECT
+                sc.id_scan, sc.date_, sc.status,
+                st.total_folders, st.total_scans, st.top_movers
+            FROM dashboard_stats st
+            LEFT JOIN scans sc ON sc.id_scan = (SELECT MAX(id_scan) FROM scans)
+            WHERE st.id_stats = 1
+            """
+        )
+        stats = cast(dict[str, Any] | None, cur.fetchone())
+        if not stats:
+            return _calculer_stats_dashboard(cur)
+
+        dernier_scan = None
+        if stats["id_scan"] is not None:
+            dernier_scan = {
+                "id_scan": stats["id_scan"],
+                "date_": stats["date_"],
+                "status": stats["status"],
+            }
+        top_changements = []
+        if stats["total_scans"] >= 2 and stats["top_movers"]:
+            top_changements = json.loads(stats["top_movers"])[:5]
+        return {
+            "dernier_scan": dernier_scan,
+            "total_dossiers": stats["total_folders"],
+            "total_scans": stats["total_scans"],
+            "top_changements": top_changements,
+        }
+
+    except mysql.connector.Error:
+        return {}
+    finally:
+        conn.close()
 
-        # --- Dernier scan ---
+
+@_cache_par_scan
+def get_croissances_rapides(limite: int = 10) -> list[dict]:
+    """
+    Retourne les dossiers qui grossissent le plus vite d'après folder_forecasts
+    (calculée par le scanner, voir previsions.py) : chemin, taille courante,
+    croissance en Ko/jour et jours avant saturation du volume.
+    Lu sur l'index growth_kb_day, sans parcourir l'historique.
+    """
+    conn = get_connexion()
+    if not conn:
+        return []
+    try:
+        cur = conn.cursor(dictionary=True)
         cur.execute(
-            "SELECT id_scan, date_, status FROM scans ORDER BY date_ DESC LIMIT 1"
+            """
+            SELECT
+                ff.id_folder, f.path, f.size_kb,
+                ff.growth_kb_day, ff.days_to_full, ff.nb_points
+            FROM folder_forecasts ff
+            JOIN folders f ON f.id_folder = ff.id_folder
+            WHERE ff.growth_kb_day > 0 AND f.is_deleted = 0
+            ORDER BY ff.growth_kb_day DESC
+            LIMIT %s
+            """,
+            (limite,),
         )
-        dernier_scan = cur.fetchone()
+        return cast(list[dict[str, Any]], cur.fetchall())
+    except mysql.connector.Error:
+        return []
+    finally:
+        conn.close()
 
-        # --- Nombre total de dossiers ---
-        cur.execute("SELECT COUNT(*) as total FROM folders")
-        total_dossiers = cast(dict[str, Any], cur.fetchone())["total"]
 
-        # --- Nombre total de scans ---
-        cur.execute("SELECT COUNT(*) as total FROM scans WHERE status = 'completed'")
-        total_scans = cast(dict[str, Any], cur.fetchone())["total"]
+def _calculer_stats_dashboard(cur) -> dict:
+    """Calcule les statistiques du tableau de bord depuis les tables (sans dashboard_stats)."""
+    # --- Dernier scan ---
+    cur.execute(
+        "SELECT id_scan, date_, status FROM scans ORDER BY date_ DESC LIMIT 1"
+    )
+    dernier_scan = cur.fetchone()
 
-        # --- Top 5 changements ---
-        top_changements = []
-        if total_scans >= 2:
-            # Récupère les 2 derniers scans complétés
-            cur.execute(
-                "SELECT id_scan FROM scans WHERE status = 'completed' "
-                "ORDER BY date_ DESC LIMIT 2"
-            )
-            deux_derniers = cast(list[dict[str, Any]], cur.fetchall())
-            id_scan_actuel = deux_derniers[0]["id_scan"]
-            id_scan_precedent = deux_derniers[1]["id_scan"]
+    # --- Nombre total de dossiers ---
+    cur.execute("SELECT COUNT(*) as total FROM folders")
+    total_dossiers = cast(dict[str, Any], cur.fetchone())["total"]
+
+    # --- Nombre total de scans ---
+    cur.execute("SELECT COUNT(*) as total FROM scans WHERE status = 'completed'")
+    total_scans = cast(dict[str, Any], cur.fetchone())["total"]
+
+    # --- Top 5 changements ---
+    #    Lu dans le résumé précalculé du dernier scan (scan_summary),
+    #    recalculé depuis sizes pour les scans qui n'en ont pas
+    top_changements = []
+    if total_scans >= 2:
+        # Récupère les 2 derniers scans complétés
+        cur.execute(
+            "SELECT id_scan FROM scans WHERE status = 'completed' "
+            "ORDER BY date_ DESC LIMIT 2"
+        )
+        deux_derniers = cast(list[dict[str, Any]], cur.fetchall())
+        id_scan_actuel = deux_derniers[0]["id_scan"]
+        id_scan_precedent = deux_derniers[1]["id_scan"]
 
+        cur.execute(
+            "SELECT top_movers FROM scan_summary WHERE id_scan = %s",
+            (id_scan_actuel,),
+        )
+        resume_scan = cast(dict[str, Any] | None, cur.fetchone())
+        if resume_scan and resume_scan["top_movers"]:
+            top_changements = json.loads(resume_scan["top_movers"])[:5]
+        elif not resume_scan:
             cur.execute(
                 """
                 SELECT
@@ -297,17 +632,12 @@ def get_stats_dashboard() -> dict:
             )
             top_changements = cast(list[dict[str, Any]], cur.fetchall())
 
-        return {
-            "dernier_scan": dernier_scan,
-            "total_dossiers": total_dossiers,
-            "total_scans": total_scans,
-            "top_changements": top_changements,
-        }
-
-    except mysql.connector.Error:
-        return {}
-    finally:
-        conn.close()
+    return {
+        "dernier_scan": dernier_scan,
+        "total_dossiers": total_dossiers,
+        "total_scans": total_scans,
+        "top_changements": top_changements,
+    }
 
 
 def _get_id_dernier_scan(cur) -> int | None:
@@ -321,35 +651,39 @@ def _get_id_dernier_scan(cur) -> int | None:
 
 def _enrichir_avec_taille(cur, rows: list[dict], id_scan: int | None) -> list[dict]:
     """
-    Ajoute has_children à chaque ligne en vérifiant si des enfants existent en BDD.
+    Ajoute has_children à chaque ligne en une seule requête pour tout le lot
+    (via l'index (parent_id, name)), au lieu d'une recherche par ligne.
     is_new est converti en bool Python.
     """
-    sep = "\\"
-    result = []
-    for row in rows:
-        path = row["path"]
-        # Vérifie si ce dossier a des enfants via LEFT() — LIKE avec \ pose problème dans MariaDB
-        prefix = path.rstrip(sep) + sep
+    avec_enfants: set[int] = set()
+    if rows:
+        ids = [row["id_folder"] for row in rows]
+        placeholders = ",".join(["%s"] * len(ids))
         cur.execute(
-            "SELECT 1 FROM folders WHERE LEFT(path, %s) = %s LIMIT 1",
-            (len(prefix), prefix),
+            f"SELECT DISTINCT parent_id FROM folders WHERE parent_id IN ({placeholders})",
+            ids,
         )
-        has_children = cur.fetchone() is not None
-        result.append({
+        avec_enfants = {
+            r["parent_id"] for r in cast(list[dict[str, Any]], cur.fetchall())
+        }
+
+    return [
+        {
             "id_folder": row["id_folder"],
-            "path": path,
+            "path": row["path"],
             "is_new": bool(row.get("is_new", 0)),
             "is_deleted": bool(row.get("is_deleted", 0)),
             "size_kb": row.get("size_kb", 0),
-            "has_children": has_children,
-        })
-    return result
+            "has_children": row["id_folder"] in avec_enfants,
+        }
+        for row in rows
+    ]
 
 
 def get_dossiers_racines() -> list[dict]:
     """
     Retourne uniquement les dossiers racines (is_root = 1)
-    avec leur taille lors du dernier scan complété.
+    avec leur taille courante (folders.size_kb).
     Charge UNIQUEMENT ces N chemins — jamais les 200k dossiers.
     """
     chemins_racines = [
@@ -366,12 +700,7 @@ def get_dossiers_racines() -> list[dict]:
         cur.execute(
             """
             SELECT
-                f.id_folder, f.path, f.is_new, f.is_deleted,
-                COALESCE((
-                    SELECT sz.size_kb FROM sizes sz
-                    WHERE sz.id_folder = f.id_folder
-                    ORDER BY sz.id_scan DESC LIMIT 1
-                ), 0) AS size_kb
+                f.id_folder, f.path, f.is_new, f.is_deleted, f.size_kb
             FROM folders f
             WHERE f.is_root = 1
             ORDER BY f.path
@@ -392,44 +721,28 @@ def get_dossiers_racines() -> list[dict]:
         conn.close()
 
 
+@_cache_par_scan
 def get_enfants_dossier(parent_path: str) -> list[dict]:
     """
     Retourne les enfants DIRECTS d'un dossier donné, sans charger les petits-enfants.
-    Utilise LEFT() + comptage de séparateurs pour garantir un seul niveau de profondeur.
+    Résolu par index : le parent est retrouvé par path_hash, puis ses enfants
+    par (parent_id, name).
     """
-    original_parent_path = parent_path
-    sep = "\\"
-    parent_path = parent_path.rstrip(sep)
-    # Nombre de séparateurs dans le parent → les enfants en ont exactement un de plus
-    sep_count_parent = parent_path.count(sep)
-    sep_count_children = sep_count_parent + 1
-    # Préfixe avec le séparateur final (ex: 'D:\\Foo\\')
-    prefix = parent_path + sep
-
     conn = get_connexion()
     if not conn:
         return []
     try:
         cur = conn.cursor(dictionary=True)
-
-        # LEFT(path, n) = prefix évite les problèmes d'échappement du backslash dans LIKE MariaDB
-        # f.path != original_parent_path empêche le dossier racine (ex: D:\) d'apparaître comme son propre enfant
         cur.execute(
             """
             SELECT
-                f.id_folder, f.path, f.is_new, f.is_deleted,
-                COALESCE((
-                    SELECT sz.size_kb FROM sizes sz
-                    WHERE sz.id_folder = f.id_folder
-                    ORDER BY sz.id_scan DESC LIMIT 1
-                ), 0) AS size_kb
-            FROM folders f
-            WHERE LEFT(f.path, %s) = %s
-              AND (LENGTH(f.path) - LENGTH(REPLACE(f.path, %s, ''))) = %s
-              AND f.path != %s
-            ORDER BY f.path
+                f.id_folder, f.path, f.is_new, f.is_deleted, f.size_kb
+            FROM folders p
+            JOIN folders f ON f.parent_id = p.id_folder
+            WHERE p.path_hash = UNHEX(MD5(%s)) AND p.path = %s
+            ORDER BY f.name
             """,
-            (len(prefix), prefix, sep, sep_count_children, original_parent_path),
+            (parent_path, parent_path),
         )
         rows = cast(list[dict[str, Any]], cur.fetchall())
         return _enrichir_avec_taille(cur, rows, None)
@@ -439,12 +752,377 @@ def get_enfants_dossier(parent_path: str) -> list[dict]:
         conn.close()
 
 
-def get_historique_dossier(id_folder: int, periode: str = "30", page: int = 1, per_page: int = 15) -> dict:
+def _lire_curseur_enfants(apres: str | None, tri: str) -> tuple | None:
+    """Décode le curseur de get_enfants_page ([valeur, id_folder] en JSON) ; None si absent ou invalide."""
+    if not apres:
+        return None
+    try:
+        valeur, id_folder = json.loads(apres)
+    except (ValueError, TypeError):
+        return None
+    type_attendu = str if tri == "nom" else int
+    if not isinstance(valeur, type_attendu) or not isinstance(id_folder, int):
+        return None
+    return valeur, id_folder
+
+
+@_cache_par_scan
+def get_enfants_page(
+    parent_path: str, tri: str = "taille", apres: str | None = None, limite: int = 200
+) -> dict:
+    """
+    Retourne une page des enfants directs d'un dossier, triés côté serveur par
+    taille, variation (décroissantes) ou nom, paginés par curseur (keyset) sur
+    les index (parent_id, size_kb | delta_kb | name).
+    - items    : les `limite` enfants suivants
+    - suivant  : curseur de la page suivante (None en fin de liste)
+    - autres   : nombre et taille cumulée des enfants restant après cette page
+    - total    : nombre total d'enfants (première page uniquement)
+    """
+    if tri not in TRIS_ENFANTS:
+        tri = "taille"
+    colonne, sens = TRIS_ENFANTS[tri]
+    comparaison = "<" if sens == "DESC" else ">"
+    condition_apres = (
+        f"({colonne} {comparaison} %s OR ({colonne} = %s AND f.id_folder {comparaison} %s))"
+    )
+    curseur = _lire_curseur_enfants(apres, tri)
+
+    conn = get_connexion()
+    if not conn:
+        return {}
+    try:
+        cur = conn.cursor(dictionary=True)
+        cur.execute(
+            "SELECT id_folder FROM folders WHERE path_hash = UNHEX(MD5(%s)) AND path = %s",
+            (parent_path, parent_path),
+        )
+        parent = cast(dict[str, Any] | None, cur.fetchone())
+        if not parent:
+            return {}
+        id_parent = parent["id_folder"]
+
+        params: list[Any] = [id_parent]
+        condition = ""
+        if curseur:
+            condition = f"AND {condition_apres}"
+            params += [curseur[0], curseur[0], curseur[1]]
+        cur.execute(
+            f"""
+            SELECT f.id_folder, f.path, f.name, f.is_new, f.is_deleted, f.size_kb, f.delta_kb
+            FROM folders f
+            WHERE f.parent_id = %s {condition}
+            ORDER BY {colonne} {sens}, f.id_folder {sens}
+            LIMIT %s
+            """,
+            (*params, limite + 1),
+        )
+        rows = cast(list[dict[str, Any]], cur.fetchall())
+        suite = len(rows) > limite
+        rows = rows[:limite]
+
+        suivant = None
+        autres = {"nb": 0, "size_kb": 0}
+        if suite:
+            dernier = rows[-1]
+            cle = {"taille": "size_kb", "variation": "delta_kb", "nom": "name"}[tri]
+            suivant = json.dumps([dernier[cle], dernier["id_folder"]])
+            cur.execute(
+                f"""
+                SELECT COUNT(*) AS nb, COALESCE(SUM(f.size_kb), 0) AS size_kb
+                FROM folders f
+                WHERE f.parent_id = %s AND {condition_apres}
+                """,
+                (id_parent, dernier[cle], dernier[cle], dernier["id_folder"]),
+            )
+            ligne = cast(dict[str, Any], cur.fetchone())
+            autres = {"nb": int(ligne["nb"]), "size_kb": int(ligne["size_kb"])}
+
+        total = None
+        if curseur is None:
+            if suite:
+                cur.execute(
+                    "SELECT COUNT(*) AS nb FROM folders WHERE parent_id = %s", (id_parent,)
+                )
+                total = int(cast(dict[str, Any], cur.fetchone())["nb"])
+            else:
+                total = len(rows)
+
+        items = _enrichir_avec_taille(cur, rows, None)
+        for item, row in zip(items, rows):
+            item["delta_kb"] = row["delta_kb"]
+        return {"items": items, "suivant": suivant, "autres": autres, "total": total}
+    except mysql.connector.Error:
+        return {}
+    finally:
+        conn.close()
+
+
+def get_sous_arbre(parent_path: str, profondeur: int = 2, id_scan: int | None = None) -> dict:
+    """
+    Retourne le sous-arbre d'un dossier jusqu'à `profondeur` niveaux, en une
+    seule requête (CTE récursive sur parent_id) : taille, has_children et
+    variation au dernier scan (delta_kb) de chaque dossier.
+    Au-delà de MAX_NOEUDS_SOUS_ARBRE dossiers, le niveau le plus profond est
+    retiré en entier (tronque=True) : la liste `children` d'un nœud est
+    toujours complète, ou None si ce niveau n'a pas été chargé.
+    Avec `id_scan`, l'arbre est reconstitué tel qu'il était à ce scan
+    (voir _tailles_au_scan) : seuls les dossiers existant alors sont listés,
+    avec leur taille, leur variation et leur statut NEW / SUPPRIMÉ à cette date.
+    `approximatif` signale un scan sous-échantillonné par la rétention
+    (voir db.scans_approximatifs).
+    """
+    return _get_sous_arbre(
+        parent_path, min(max(profondeur, 1), PROFONDEUR_SOUS_ARBRE_MAX), id_scan
+    )
+
+
+def _tailles_au_scan(cur, ids: list[int], id_scan: int) -> dict[int, int]:
+    """
+    Taille de chaque dossier de `ids` au scan `id_scan` (dernière valeur
+    connue <= id_scan) ; un dossier sans taille connue à cette date est absent.
+    Part du dernier point de contrôle <= id_scan (size_checkpoints) et ne
+    rejoue que les lignes sizes écrites depuis, soit au plus
+    INTERVALLE_POINTS_CONTROLE scans par dossier. Sans point de contrôle,
+    la dernière ligne sizes de chaque dossier est lue sur l'index
+    (id_folder, id_scan, size_kb).
+    """
+    if not ids:
+        return {}
+    placeholders = ",".join(["%s"] * len(ids))
+    cur.execute(
+        "SELECT MAX(id_scan) AS id_scan FROM size_checkpoints WHERE id_scan <= %s",
+        (id_scan,),
+    )
+    row = cast(dict[str, Any] | None, cur.fetchone())
+    point = row["id_scan"] if row else None
+
+    if point is None:
+        cur.execute(
+            f"""
+            SELECT s.id_folder, s.size_kb
+            FROM sizes s
+            JOIN (
+                SELECT id_folder, MAX(id_scan) AS id_scan FROM sizes
+                WHERE id_folder IN ({placeholders}) AND id_scan <= %s
+                GROUP BY id_folder
+            ) d ON d.id_folder = s.id_folder AND d.id_scan = s.id_scan
+            """,
+            (*ids, id_scan),
+        )
+        return {
+            r["id_folder"]: int(r["size_kb"])
+            for r in cast(list[dict[str, Any]], cur.fetchall())
+        }
+
+    cur.execute(
+        f"SELECT id_folder, size_kb FROM size_checkpoints "
+        f"WHERE id_scan = %s AND id_folder IN ({placeholders})",
+        (point, *ids),
+    )
+    tailles = {
+        r["id_folder"]: int(r["size_kb"])
+        for r in cast(list[dict[str, Any]], cur.fetchall())
+    }
+    # Changements postérieurs au point de contrôle, du plus ancien au plus récent
+    cur.execute(
+        f"""
+        SELECT id_folder, size_kb FROM sizes
+        WHERE id_folder IN ({placeholders}) AND id_scan > %s AND id_scan <= %s
+        ORDER BY id_scan
+        """,
+        (*ids, point, id_scan),
+    )
+    for r in cast(list[dict[str, Any]], cur.fetchall()):
+        tailles[r["id_folder"]] = int(r["size_kb"])
+    return tailles
+
+
+@_cache_par_scan
+def _get_sous_arbre(parent_path: str, profondeur: int, id_scan: int | None = None) -> dict:
+    from db import scans_approximatifs
+
+    conn = get_connexion()
+    if not conn:
+        return {}
+    approximatif = False
+    try:
+        cur = conn.cursor(dictionary=True)
+        cur.execute(
+            """
+            WITH RECURSIVE arbre (id_folder, profondeur) AS (
+                SELECT id_folder, 0 FROM folders
+                WHERE path_hash = UNHEX(MD5(%s)) AND path = %s
+                UNION ALL
+                SELECT f.id_folder, a.profondeur + 1
+                FROM arbre a
+                JOIN folders f ON f.parent_id = a.id_folder
+                WHERE a.profondeur < %s
+            )
+            SELECT
+                f.id_folder, f.parent_id, f.path, f.is_new, f.is_deleted,
+                a.profondeur,
+                f.size_kb, f.delta_kb,
+                EXISTS (
+                    SELECT 1 FROM folders c WHERE c.parent_id = f.id_folder
+                ) AS has_children
+            FROM arbre a
+            JOIN folders f ON f.id_folder = a.id_folder
+            WHERE a.profondeur > 0
+            ORDER BY a.profondeur, f.name
+            LIMIT %s
+            """,
+            (parent_path, parent_path, profondeur, MAX_NOEUDS_SOUS_ARBRE + 1),
+        )
+        rows = cast(list[dict[str, Any]], cur.fetchall())
+
+        if id_scan is not None:
+            ids = [r["id_folder"] for r in rows]
+            tailles = _tailles_au_scan(cur, ids, id_scan)
+            # Variations relatives au scan complété précédent, comme le diff
+            # entre scans (un scan échoué ou interrompu n'est pas une référence)
+            cur.execute(
+                "SELECT MAX(id_scan) AS id_scan FROM scans "
+                "WHERE status = 'completed' AND id_scan < %s",
+                (id_scan,),
+            )
+            row_prev = cast(dict[str, Any] | None, cur.fetchone())
+            id_scan_prev = row_prev["id_scan"] if row_prev else None
+            precedentes = (
+                _tailles_au_scan(cur, ids, id_scan_prev) if id_scan_prev is not None else {}
+            )
+            approximatif = bool(scans_approximatifs(conn, [id_scan]))
+    except mysql.connector.Error:
+        return {}
+    finally:
+        conn.close()
+
+    tronque = len(rows) > MAX_NOEUDS_SOUS_ARBRE
+    profondeur_complete = profondeur
+    if tronque:
+        # Le dernier niveau atteint est incomplet : on le retire en entier
+        profondeur_complete = rows[-1]["profondeur"] - 1
+        rows = [r for r in rows if r["profondeur"] <= profondeur_complete]
+
+    if id_scan is not None:
+        # État à la date du scan : un dossier supprimé (taille 0) n'est gardé
+        # que s'il l'a été à ce scan précis ; ses descendants absents à cette
+        # date disparaissent avec lui lors de l'assemblage ci-dessous
+        a_la_date = []
+        for row in rows:
+            taille = tailles.get(row["id_folder"])
+            precedente = precedentes.get(row["id_folder"])
+            if taille is None:
+                continue
+            supprime = bool(row["is_deleted"]) and taille == 0
+            if supprime and not precedente:
+                continue
+            a_la_date.append(
+                {
+                    **row,
+                    "size_kb": taille,
+                    "delta_kb": taille - (precedente or 0),
+                    "is_new": precedente is None,
+                    "is_deleted": supprime,
+                }
+            )
+        rows = a_la_date
+
+    racine: dict[str, Any] = {
+        "path": parent_path,
+        "profondeur": profondeur_complete,
+        "tronque": tronque,
+        "id_scan": id_scan,
+        "approximatif": approximatif,
+        "children": [] if profondeur_complete > 0 else None,
+    }
+    noeuds: dict[int, dict] = {}
+    for row in rows:
+        noeud = {
+            "id_folder": row["id_folder"],
+            "path": row["path"],
+            "is_new": bool(row["is_new"]),
+            "is_deleted": bool(row["is_deleted"]),
+            "size_kb": row["size_kb"],
+            "delta_kb": row["delta_kb"],
+            "has_children": bool(row["has_children"]),
+            "children": [] if row["profondeur"] < profondeur_complete else None,
+        }
+        noeuds[row["id_folder"]] = noeud
+        parent = racine if row["profondeur"] == 1 else noeuds.get(row["parent_id"])
+        if parent is not None:
+            parent["children"].append(noeud)
+    return racine
+
+
+def _lttb(points: list[tuple[float, float]], seuil: int) -> list[int]:
+    """
+    Sous-échantillonnage Largest-Triangle-Three-Buckets : retourne les indices
+    des `seuil` points qui préservent au mieux la forme de la courbe
+    (premier et dernier points toujours conservés).
+    """
+    n = len(points)
+    if seuil >= n or seuil < 3:
+        return list(range(n))
+
+    indices = [0]
+    taille_seau = (n - 2) / (seuil - 2)
+    a = 0
+    for i in range(seuil - 2):
+        # Moyenne du seau suivant : sommet « cible » du triangle
+        debut_suivant = int((i + 1) * taille_seau) + 1
+        fin_suivant = min(int((i + 2) * taille_seau) + 1, n)
+        suivant = points[debut_suivant:fin_suivant]
+        x_moy = sum(p[0] for p in suivant) / len(suivant)
+        y_moy = sum(p[1] for p in suivant) / len(suivant)
+
+        # Point du seau courant formant le plus grand triangle
+        debut = int(i * taille_seau) + 1
+        fin = int((i + 1) * taille_seau) + 1
+        xa, ya = points[a]
+        meilleur, aire_max = debut, -1.0
+        for j in range(debut, fin):
+            aire = abs(
+                (xa - x_moy) * (points[j][1] - ya)
+                - (xa - points[j][0]) * (y_moy - ya)
+            )
+            if aire > aire_max:
+                meilleur, aire_max = j, aire
+        indices.append(meilleur)
+        a = meilleur
+    indices.append(n - 1)
+    return indices
+
+
+def _condition_periode(periode: str) -> str:
+    """
+    Condition SQL (sur sc.date_) de la période sélectionnée.
+    Whitelist des périodes autorisées pour éviter l'injection SQL ;
+    30 jours par défaut si la période n'est pas reconnue.
+    """
+    if periode in {"7", "30", "365"}:
+        return f"sc.date_ >= DATE_SUB(NOW(), INTERVAL {int(periode)} DAY)"
+    if periode == "ytd":
+        return "YEAR(sc.date_) = YEAR(NOW())"
+    return "sc.date_ >= DATE_SUB(NOW(), INTERVAL 30 DAY)"
+
+
+@_cache_par_scan
+def get_historique_dossier(
+    id_folder: int,
+    periode: str = "30",
+    avant: int | None = None,
+    per_page: int = 15,
+    points: int = 200,
+) -> dict:
     """
     Retourne les données nécessaires au graphique Chart.js pour un dossier donné :
     - Les informations du dossier (chemin, is_new)
-    - L'historique des tailles [{date, size_mb}] sur la période sélectionnée
-    - Pagination appliquée sur history_table
+    - La courbe des tailles sur la période, ramenée à `points` points (LTTB)
+    - Une page de history_table, du plus récent au plus ancien, paginée en SQL
+      par curseur : `avant` est l'id_scan de la dernière ligne de la page
+      précédente (None pour la première page)
+    La courbe n'est calculée que pour la première page.
     """
     conn = get_connexion()
     if not conn:
@@ -461,117 +1139,118 @@ def get_historique_dossier(id_folder: int, periode: str = "30", page: int = 1, p
         if not dossier:
             return {}
 
-        # Historique des tailles par scan (période variable)
-        # Whitelist des périodes autorisées pour éviter l'injection SQL
-        periodes_valides = {"7", "30", "365"}
+        condition = _condition_periode(periode)
 
-        if periode in periodes_valides:
-            cur.execute(
-                """
-                SELECT
-                    sc.date_,
-                    sz.size_kb
-                FROM sizes sz
-                JOIN scans sc ON sz.id_scan = sc.id_scan
-                WHERE sz.id_folder = %s
-                  AND sc.status = 'completed'
-                  AND sc.date_ >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                ORDER BY sc.date_ ASC
-                """,
-                (id_folder, int(periode)),
-            )
-        elif periode == "ytd":
-            cur.execute(
-                """
-                SELECT
-                    sc.date_,
-                    sz.size_kb
-                FROM sizes sz
-                JOIN scans sc ON sz.id_scan = sc.id_scan
-                WHERE sz.id_folder = %s
-                  AND sc.status = 'completed'
-                  AND YEAR(sc.date_) = YEAR(NOW())
-                ORDER BY sc.date_ ASC
-                """,
-                (id_folder,),
-            )
-        else:
-            # Valeur par défaut si la période n'est pas reconnue
-            cur.execute(
-                """
-                SELECT
-                    sc.date_,
-                    sz.size_kb
-                FROM sizes sz
-                JOIN scans sc ON sz.id_scan = sc.id_scan
-                WHERE sz.id_folder = %s
-                  AND sc.status = 'completed'
-                  AND sc.date_ >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-                ORDER BY sc.date_ ASC
-                """,
-                (id_folder,),
-            )
-        historique_raw = cast(list[dict[str, Any]], cur.fetchall())
+        # Page du tableau : une ligne de plus pour calculer la variation de la
+        # dernière ligne affichée et savoir s'il reste une page
+        cur.execute(
+            f"""
+            SELECT sz.id_scan, sc.date_, sz.size_kb
+            FROM sizes sz
+            JOIN scans sc ON sz.id_scan = sc.id_scan
+            WHERE sz.id_folder = %s
+              AND sc.status = 'completed'
+              AND {condition}
+              AND (%s IS NULL OR sz.id_scan < %s)
+            ORDER BY sz.id_scan DESC
+            LIMIT %s
+            """,
+            (id_folder, avant, avant, per_page + 1),
+        )
+        lignes = cast(list[dict[str, Any]], cur.fetchall())
 
-        labels = []
-        data = []
         history_table = []
-
-        prev_size_kb = None
-        for row in historique_raw:
-            d_str = row["date_"].strftime("%d/%m/%Y %H:%M")
-            sz_kb = row["size_kb"]
-            sz_mo = round(sz_kb / 1024, 2)
-            
-            delta_kb = 0
-            if prev_size_kb is not None:
-                delta_kb = sz_kb - prev_size_kb
-            prev_size_kb = sz_kb
-
-            labels.append(d_str)
-            data.append(sz_mo)
+        for i, row in enumerate(lignes[:per_page]):
+            precedente = lignes[i + 1]["size_kb"] if i + 1 < len(lignes) else None
             history_table.append({
-                "date": d_str,
-                "size_kb": sz_kb,
-                "delta_kb": delta_kb
+                "id_scan": row["id_scan"],
+                "date": row["date_"].strftime("%d/%m/%Y %H:%M"),
+                "size_kb": row["size_kb"],
+                "delta_kb": row["size_kb"] - precedente if precedente is not None else 0,
             })
-        
-        # Le tableau HTML affichera du plus récent au plus ancien
-        history_table.reverse()
-
-        # Pagination
-        total_count = len(history_table)
-        total_pages = max(1, (total_count + per_page - 1) // per_page)
-        page = max(1, min(page, total_pages))
-        start = (page - 1) * per_page
-        end = start + per_page
-        paginated_table = history_table[start:end]
+        suivant = history_table[-1]["id_scan"] if len(lignes) > per_page else None
 
-        return {
+        resultat: dict[str, Any] = {
             "dossier": dossier,
-            "labels": labels,
-            "data": data,
-            "history_table": paginated_table,
+            "history_table": history_table,
             "pagination": {
-                "total_count": total_count,
-                "total_pages": total_pages,
-                "current_page": page,
                 "per_page": per_page,
+                "avant": avant,
+                "suivant": suivant,
             },
         }
+
+        if avant is None:
+            cur.execute(
+                f"""
+                SELECT sc.date_, sz.size_kb
+                FROM sizes sz
+                JOIN scans sc ON sz.id_scan = sc.id_scan
+                WHERE sz.id_folder = %s
+                  AND sc.status = 'completed'
+                  AND {condition}
+                ORDER BY sz.id_scan ASC
+                """,
+                (id_folder,),
+            )
+            serie = cast(list[dict[str, Any]], cur.fetchall())
+            indices = _lttb(
+                [(row["date_"].timestamp(), row["size_kb"]) for row in serie],
+                points,
+            )
+            resultat["labels"] = [
+                serie[i]["date_"].strftime("%d/%m/%Y %H:%M") for i in indices
+            ]
+            resultat["data"] = [round(serie[i]["size_kb"] / 1024, 2) for i in indices]
+            resultat["pagination"]["total_count"] = len(serie)
+
+        return resultat
     except mysql.connector.Error:
         return {}
     finally:
         conn.close()
 
 
+def _replier_caractere(caractere: str) -> str:
+    """Caractère en minuscule et sans accent ('É' -> 'e'), inchangé s'il se décompose en plusieurs lettres."""
+    base = "".join(
+        c for c in unicodedata.normalize("NFKD", caractere) if not unicodedata.combining(c)
+    )
+    return (base if len(base) == 1 else caractere).lower()
+
+
+def _trigrammes(texte: str) -> list[str]:
+    """
+    Trigrammes distincts d'un texte, dans l'ordre d'apparition, repliés en
+    minuscules sans accents. folder_trigrams est comparé en utf8mb4_general_ci
+    (insensible à la casse et aux accents) : 'été' et 'ete' n'y font qu'une
+    ligne, et le HAVING COUNT(*) de rechercher_dossiers doit compter les
+    trigrammes comme MariaDB.
+    """
+    texte = "".join(_replier_caractere(c) for c in texte)
+    return list(dict.fromkeys(texte[i:i + 3] for i in range(len(texte) - 2)))
+
+
+@_cache_par_scan
 def rechercher_dossiers(query: str, limit: int = 30) -> list[dict]:
     """
-    Recherche des dossiers dont le chemin contient le texte donné (insensible à la casse).
-    Retourne les résultats avec leur taille au dernier scan.
+    Recherche des dossiers dont le nom contient le texte donné (insensible à
+    la casse). Un texte contenant un séparateur (ex : Projets\\2024) désigne la
+    fin d'un chemin : son dernier segment doit figurer dans le nom du dossier
+    et le texte entier dans son chemin. Les sous-dossiers d'un dossier trouvé
+    ne sont pas listés. Retourne les résultats avec leur taille au dernier scan.
+
+    Un dernier segment d'au moins 3 caractères est cherché via l'index
+    folder_trigrams, classé par position de la correspondance dans le chemin
+    puis par taille ; un segment plus court passe par un LIKE sur le nom.
     """
     if not query or len(query) < 2:
         return []
+    # Un séparateur final ne désigne pas un sous-dossier : il est ignoré
+    query = query.rstrip("\\/")
+    segment = query.replace("/", "\\").rsplit("\\", 1)[-1]
+    if not segment:
+        return []
 
     conn = get_connexion()
     if not conn:
@@ -579,27 +1258,46 @@ def rechercher_dossiers(query: str, limit: int = 30) -> list[dict]:
     try:
         cur = conn.cursor(dictionary=True)
 
-        # Recherche LIKE sur le path — échappe les caractères spéciaux SQL
-        # Le backslash doit être échappé EN PREMIER (c'est le char d'échappement de LIKE)
-        search_term = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
-        search_term = f"%{search_term}%"
+        trigrammes = _trigrammes(segment)
+        if trigrammes:
+            # Candidats : dossiers dont le nom contient tous les trigrammes du
+            # segment, puis vérification exacte sur name et sur path
+            placeholders = ",".join(["%s"] * len(trigrammes))
+            cur.execute(
+                f"""
+                SELECT
+                    f.id_folder, f.path, f.is_new, f.size_kb
+                FROM (
+                    SELECT id_folder FROM folder_trigrams
+                    WHERE trigram IN ({placeholders})
+                    GROUP BY id_folder
+                    HAVING COUNT(*) = %s
+                ) t
+                JOIN folders f ON f.id_folder = t.id_folder
+                WHERE LOCATE(%s, f.name) > 0 AND LOCATE(%s, f.path) > 0
+                ORDER BY LOCATE(%s, f.path) ASC, size_kb DESC
+                LIMIT %s
+                """,
+                (*trigrammes, len(trigrammes), segment, query, query, limit),
+            )
+        else:
+            # Recherche LIKE sur le nom — échappe les caractères spéciaux SQL
+            # Le backslash doit être échappé EN PREMIER (c'est le char d'échappement de LIKE)
+            def motif(texte: str) -> str:
+                texte = texte.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                return f"%{texte}%"
 
-        cur.execute(
-            """
-            SELECT
-                f.id_folder, f.path, f.is_new,
-                COALESCE((
-                    SELECT sz.size_kb FROM sizes sz
-                    WHERE sz.id_folder = f.id_folder
-                    ORDER BY sz.id_scan DESC LIMIT 1
-                ), 0) AS size_kb
-            FROM folders f
-            WHERE f.path LIKE %s
-            ORDER BY LENGTH(f.path) ASC, f.path ASC
-            LIMIT %s
-            """,
-            (search_term, limit),
-        )
+            cur.execute(
+                """
+                SELECT
+                    f.id_folder, f.path, f.is_new, f.size_kb
+                FROM folders f
+                WHERE f.name LIKE %s AND f.path LIKE %s
+                ORDER BY LENGTH(f.path) ASC, f.path ASC
+                LIMIT %s
+                """,
+                (motif(segment), motif(query), limit),
+            )
         rows = cast(list[dict[str, Any]], cur.fetchall())
         return [
             {
@@ -614,3 +1312,139 @@ def rechercher_dossiers(query: str, limit: int = 30) -> list[dict]:
         return []
     finally:
         conn.close()
+
+
+@_cache_par_scan
+def get_diff_scans(
+    id_scan_a: int, id_scan_b: int, limite: int = 100, chemin: str | None = None
+) -> dict:
+    """
+    Compare deux scans quelconques (voir db.calculer_diff_scans) : dossiers
+    classés par variation absolue entre la taille au scan A et au scan B.
+    `approximatif` signale qu'un des deux scans a été sous-échantillonné par
+    la rétention. Retourne {} si l'un des scans n'existe pas.
+    """
+    from db import calculer_diff_scans, scans_approximatifs
+
+    conn = get_connexion()
+    if not conn:
+        return {}
+    try:
+        cur = conn.cursor(dictionary=True)
+        cur.execute(
+            "SELECT id_scan, date_, status FROM scans WHERE id_scan IN (%s, %s)",
+            (id_scan_a, id_scan_b),
+        )
+        scans = {row["id_scan"]: row for row in cast(list[dict[str, Any]], cur.fetchall())}
+        if id_scan_a not in scans or id_scan_b not in scans:
+            return {}
+        debut, fin = sorted((id_scan_a, id_scan_b))
+        dossiers = calculer_diff_scans(conn, debut, fin, limite, chemin)
+        return {
+            "scan_a": scans[debut],
+            "scan_b": scans[fin],
+            "approximatif": bool(scans_approximatifs(conn, [debut, fin])),
+            "dossiers": dossiers,
+        }
+    except mysql.connector.Error:
+        return {}
+    finally:
+        conn.close()
+
+
+# --- Exports (CSV / XLSX) ---
+# Générateurs de lignes lus par curseur non bufferisé : le serveur MariaDB
+# envoie les lignes au fil de la lecture, sans jamais les charger toutes en
+# mémoire. La connexion reste ouverte jusqu'à la fin (ou l'abandon) de l'export,
+# sans limite INTRA_TIMEOUT : la requête dure tant que le navigateur télécharge.
+
+ENTETES_EXPORT_SCAN = ["chemin", "taille_avant_kb", "taille_apres_kb", "variation_kb"]
+ENTETES_EXPORT_SOUS_ARBRE = ["chemin", "taille_kb", "variation_kb", "nouveau", "supprime"]
+ENTETES_EXPORT_HISTORIQUE = ["id_scan", "date", "taille_kb"]
+
+
+def _iterer_requete(requete: str, params: tuple) -> Iterator[tuple]:
+    """
+    Exécute une requête et en produit les lignes une à une (curseur non
+    bufferisé). Une erreur en cours de lecture est journalisée puis propagée :
+    la réponse est interrompue au lieu de livrer un fichier tronqué complet.
+    """
+    conn = get_connexion(borner_duree=False)
+    if not conn:
+        return
+    nb_lignes = 0
+    try:
+        cur = conn.cursor(buffered=False)
+        cur.execute(requete, params)
+        while True:
+            lignes = cur.fetchmany(TAILLE_LOT_EXPORT)
+            if not lignes:
+                break
+            nb_lignes += len(lignes)
+            yield from lignes
+        cur.close()
+    except mysql.connector.Error as err:
+        logger.error("Export interrompu après %d ligne(s) : %s", nb_lignes, err)
+        raise
+    finally:
+        conn.close()
+
+
+def iterer_changements_scan(id_scan: int) -> Iterator[tuple]:
+    """
+    Toutes les variations de taille enregistrées par un scan (sizes ne
+    stockant que les changements, ce sont exactement ses lignes), avec la
+    taille précédente de chaque dossier.
+    """
+    lignes = _iterer_requete(
+        """
+        SELECT
+            f.path,
+            COALESCE((
+                SELECT prec.size_kb FROM sizes prec
+                WHERE prec.id_folder = sz.id_folder AND prec.id_scan < sz.id_scan
+                ORDER BY prec.id_scan DESC LIMIT 1
+            ), 0) AS avant_kb,
+            sz.size_kb
+        FROM sizes sz
+        JOIN folders f ON f.id_folder = sz.id_folder
+        WHERE sz.id_scan = %s
+        """,
+        (id_scan,),
+    )
+    for chemin, avant_kb, apres_kb in lignes:
+        yield chemin, avant_kb, apres_kb, apres_kb - avant_kb
+
+
+def iterer_sous_arbre(parent_path: str) -> Iterator[tuple]:
+    """Taille courante de chaque dossier du sous-arbre (dossier inclus), parcouru par parent_id."""
+    return _iterer_requete(
+        """
+        WITH RECURSIVE arbre (id_folder) AS (
+            SELECT id_folder FROM folders
+            WHERE path_hash = UNHEX(MD5(%s)) AND path = %s
+            UNION ALL
+            SELECT f.id_folder
+            FROM arbre a
+            JOIN folders f ON f.parent_id = a.id_folder
+        )
+        SELECT f.path, f.size_kb, f.delta_kb, f.is_new, f.is_deleted
+        FROM arbre a
+        JOIN folders f ON f.id_folder = a.id_folder
+        """,
+        (parent_path, parent_path),
+    )
+
+
+def iterer_historique_dossier(id_folder: int) -> Iterator[tuple]:
+    """Historique complet des tailles d'un dossier, du plus ancien au plus récent."""
+    return _iterer_requete(
+        """
+        SELECT sz.id_scan, sc.date_, sz.size_kb
+        FROM sizes sz
+        JOIN scans sc ON sc.id_scan = sz.id_scan
+        WHERE sz.id_folder = %s
+        ORDER BY sz.id_scan
+        """,
+        (id_folder,),
+    )
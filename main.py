@@ -5,6 +5,7 @@ Script de surveillance de dossiers pour Windows Server.
 
 import argparse
 import logging
+import multiprocessing
 import os
 import signal
 import sys
@@ -19,13 +20,38 @@ from version import __version__
 
 # Imports des modules locaux
 from db import (
+    calculer_diff_scans,
     connecter_base_de_donnees,
     deconnecter_base_de_donnees,
     parser_seuils_personnalises,
+    scans_approximatifs,
+    terminer_scan,
+)
+from notifications import (
+    arreter_file_notifications,
+    demarrer_file_notifications,
+    envoyer_notif_teams,
 )
-from notifications import envoyer_notif_teams
 from scanner import scanner
-from plugin_loader import charger_plugins, get_registre
+from plugin_loader import (
+    OrdonnanceurPlugin,
+    charger_plugins,
+    get_registre,
+    noms_plugins_actifs,
+)
+from processus import (
+    abonner,
+    arreter_processus,
+    boucle_supervision,
+    declarer_processus,
+    demarrer_processus,
+    executer_intranet_enfant,
+    executer_scan_enfant,
+    get_statuts,
+    processus_actif,
+    processus_separes_actifs,
+    publier_statut,
+)
 
 # Détermine le dossier où se trouve l'exécutable (ou le script)
 if getattr(sys, "frozen", False):
@@ -45,11 +71,15 @@ logging.basicConfig(
 
 # Désactive les logs d'information des bibliothèques tierces
 logging.getLogger("werkzeug").setLevel(logging.ERROR)
+logging.getLogger("waitress").setLevel(logging.ERROR)
 logging.getLogger("flask").setLevel(logging.ERROR)
 logging.getLogger("livereload").setLevel(logging.ERROR)
 logging.getLogger("urllib3").setLevel(logging.ERROR)
 logging.getLogger("mysql.connector").setLevel(logging.ERROR)
 
+# Requêtes SQL dépassant SEUIL_REQUETE_LENTE_MS (journalisées en WARNING)
+logging.getLogger("mesures_sql").setLevel(logging.WARNING)
+
 
 def verifier_chemins_manquants(chemins_manquants: list[str]) -> None:
     """
@@ -76,7 +106,59 @@ def verifier_chemins_manquants(chemins_manquants: list[str]) -> None:
         envoyer_notif_teams(message)
 
 
+def marquer_scan_plante(code: int | None) -> None:
+    """
+    Appelé quand le processus enfant du scan s'arrête anormalement : le scan
+    qu'il avait publié « en_cours » est marqué 'failed' avant toute relance.
+    """
+    statut = get_statuts().get("scanner", {})
+    id_scan = statut.get("id_scan")
+    if statut.get("etat") != "en_cours" or not id_scan:
+        return
+    connexion = connecter_base_de_donnees()
+    if connexion:
+        terminer_scan(connexion, id_scan, "failed")
+        deconnecter_base_de_donnees(connexion)
+    publier_statut("scanner", etat="echec", id_scan=id_scan, erreur=f"processus arrêté (code {code})")
+    publier_statut("progression", etat="echec", id_scan=id_scan)
+    envoyer_notif_teams(f"❌ Le processus du scan #{id_scan} s'est arrêté (code {code}).")
+
+
+def afficher_diff_scans(id_scan_a: int, id_scan_b: int, limite: int, chemin: str | None) -> None:
+    """Affiche dans la console les dossiers ayant le plus varié entre deux scans."""
+    import mysql.connector
+
+    connexion = connecter_base_de_donnees()
+    if not connexion:
+        print("❌ Connexion à la base impossible.")
+        return
+    try:
+        dossiers = calculer_diff_scans(connexion, id_scan_a, id_scan_b, limite, chemin)
+        approximatifs = scans_approximatifs(connexion, [id_scan_a, id_scan_b])
+    except mysql.connector.Error as err:
+        print(f"❌ Erreur lors de la comparaison des scans : {err}")
+        return
+    finally:
+        deconnecter_base_de_donnees(connexion)
+
+    debut, fin = sorted((id_scan_a, id_scan_b))
+    print(f"📊 Variations entre le scan #{debut} et le scan #{fin} ({len(dossiers)} dossier(s))")
+    if approximatifs:
+        scans_cites = ", ".join(f"#{i}" for i in sorted(approximatifs))
+        print(f"⚠️ Résultat approximatif : historique sous-échantillonné par la rétention ({scans_cites})")
+    for dossier in dossiers:
+        diff_mo = dossier["diff_kb"] / 1024
+        print(
+            f"  {diff_mo:>+12.1f} Mo   "
+            f"({dossier['avant_kb'] / 1024:.1f} → {dossier['apres_kb'] / 1024:.1f} Mo)   "
+            f"{dossier['path']}"
+        )
+
+
 if __name__ == "__main__":
+    # Nécessaire pour les processus enfants du mode supervision dans l'exe
+    multiprocessing.freeze_support()
+
     # Parse les arguments en ligne de commande
     parser = argparse.ArgumentParser(description="Superviseur de Dossiers")
     parser.add_argument(
@@ -90,8 +172,30 @@ if __name__ == "__main__":
         help="Lance un plugin spécifique immédiatement et quitte (ex: --run-plugin verif_auteur)",
         metavar="NOM_PLUGIN",
     )
+    parser.add_argument(
+        "--diff",
+        type=int,
+        nargs=2,
+        help="Affiche les dossiers ayant le plus varié entre deux scans et quitte (ex: --diff 120 154)",
+        metavar=("SCAN_A", "SCAN_B"),
+    )
+    parser.add_argument(
+        "--limite",
+        type=int,
+        default=50,
+        help="Nombre de dossiers affichés par --diff (défaut : 50)",
+    )
+    parser.add_argument(
+        "--chemin",
+        type=str,
+        help="Restreint --diff à un dossier et ses sous-dossiers",
+    )
     args = parser.parse_args()
 
+    # Les notifications partent en tâche de fond (nouvelles tentatives, et
+    # fichier d'attente pour celles que Teams n'a pas pu recevoir)
+    demarrer_file_notifications()
+
     arret_demande = False
 
     def _handler_arret(signum, frame):
@@ -145,6 +249,9 @@ if __name__ == "__main__":
             print("🔍 Superviseur de Dossiers - Scan manuel")
             scanner()
             print("✅ Scan terminé.")
+        elif args.diff:
+            # Mode comparaison de deux scans
+            afficher_diff_scans(args.diff[0], args.diff[1], args.limite, args.chemin)
         elif args.run_plugin:
             # Mode exécution de plugin manuel
             print(f"🔌 Exécution manuelle du plugin : {args.run_plugin}")
@@ -171,9 +278,42 @@ if __name__ == "__main__":
             # Mode planifié (comportement par défaut)
             heure_scan = os.getenv("HEURE_SCAN", "17:30")
 
+        # Mode supervision (PROCESSUS_SEPARES=1) : scans et Intranet dans des
+        # processus enfants, ce processus ne garde que l'ordonnanceur
+        processus_separes = processus_separes_actifs()
+        file_statuts: multiprocessing.Queue | None = None
+        arret_supervision = threading.Event()
+        if processus_separes:
+            file_statuts = multiprocessing.Queue()
+            threading.Thread(
+                target=boucle_supervision,
+                args=(file_statuts, arret_supervision),
+                daemon=True,
+                name="supervision",
+            ).start()
+
         def scanner_en_thread():
-            """Lance le scan dans un thread daemon pour ne pas bloquer la boucle principale."""
-            threading.Thread(target=scanner, daemon=True, name="scan-quotidien").start()
+            """
+            Lance le scan sans bloquer la boucle principale : dans un thread daemon,
+            ou dans un processus enfant en mode supervision (relancé au plus 2 fois
+            s'il plante, ignoré si un scan tourne déjà).
+            """
+            if not processus_separes:
+                threading.Thread(target=scanner, daemon=True, name="scan-quotidien").start()
+                return
+            if processus_actif("scanner"):
+                print("⏳ Un scan est déjà en cours, lancement ignoré.")
+                return
+            # Seuls les plugins actifs à cet instant sont chargés par l'enfant
+            declarer_processus(
+                "scanner",
+                executer_scan_enfant,
+                (file_statuts, noms_plugins_actifs()),
+                ponctuel=True,
+                max_redemarrages=2,
+                a_l_arret=marquer_scan_plante,
+            )
+            demarrer_processus("scanner")
 
         # Planification du scan (dans un thread pour ne pas bloquer run_pending)
         schedule.every().day.at(heure_scan).do(scanner_en_thread).tag("daily_scan")
@@ -240,7 +380,9 @@ if __name__ == "__main__":
             print(f"✅ {len(plugins)} plugin(s) chargé(s) :")
             for plugin in plugins:
                 plugin.afficher_statut()
-                plugin.planifier(schedule)
+                # Les tâches du plugin tournent dans le pool de plugin_loader,
+                # pas dans schedule.run_pending() de la boucle principale
+                plugin.planifier(OrdonnanceurPlugin(schedule, plugin.__name__))
         else:
             print("ℹ️ Aucun plugin chargé.")
         print("-" * 60)
@@ -251,7 +393,7 @@ if __name__ == "__main__":
         statut_intranet = "❌ Désactivé"
         if intranet_enabled:
             try:
-                from intranet.app import creer_app
+                from intranet.app import creer_app, description_serveur, servir_intranet
 
                 intra_port = int(os.getenv("INTRA_PORT", 5000))
                 app = creer_app()
@@ -344,16 +486,36 @@ if __name__ == "__main__":
 
                     # Server.serve bloque l'exécution
                     server.serve(port=intra_port, host="0.0.0.0")
+                elif processus_separes:
+                    # Mode supervision : l'Intranet tourne dans son propre processus
+                    # (relancé s'il plante), les statuts lui sont relayés
+                    file_intranet: multiprocessing.Queue = multiprocessing.Queue()
+                    abonner(file_intranet)
+                    declarer_processus(
+                        "intranet",
+                        executer_intranet_enfant,
+                        (intra_port, file_statuts, file_intranet),
+                    )
+                    demarrer_processus("intranet")
+                    mode_serveur = f"{description_serveur()}, processus séparé"
+                    statut_intranet = f"✅ Actif sur le port {intra_port} ({mode_serveur})"
+                    print(
+                        f"🌐 Intranet démarré sur http://0.0.0.0:{intra_port} ({mode_serveur})"
+                    )
                 else:
-                    # Mode production / normal : Flask en arrière-plan
+                    # Mode production / normal : serveur WSGI en arrière-plan
                     thread_intranet = threading.Thread(
-                        target=app.run,
-                        kwargs={"host": "0.0.0.0", "port": intra_port, "debug": False},
+                        target=servir_intranet,
+                        args=(app, intra_port),
                         daemon=True,
+                        name="intranet",
                     )
                     thread_intranet.start()
-                    statut_intranet = f"✅ Actif sur le port {intra_port}"
-                    print(f"🌐 Intranet démarré sur http://0.0.0.0:{intra_port}")
+                    mode_serveur = description_serveur()
+                    statut_intranet = f"✅ Actif sur le port {intra_port} ({mode_serveur})"
+                    print(
+                        f"🌐 Intranet démarré sur http://0.0.0.0:{intra_port} ({mode_serveur})"
+                    )
             except Exception as e:
                 statut_intranet = f"❌ Erreur ({e})"
                 print(f"❌ Erreur lors du démarrage de l'Intranet : {e}")
@@ -489,6 +651,9 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("\n⏳ Arrêt demandé...")
     finally:
+        # Arrêt des processus enfants (mode supervision)
+        arreter_processus()
+
         # Nettoyage des scans laissés en in_progress
         try:
             _conn = connecter_base_de_donnees()
@@ -503,3 +668,6 @@ if __name__ == "__main__":
                 deconnecter_base_de_donnees(_conn)
         except Exception:
             pass
+
+        # Laisse partir les dernières notifications (le reste est mis en attente)
+        arreter_file_notifications()
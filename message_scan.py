@@ -0,0 +1,181 @@
+"""
+Module de construction de la notification de fin de scan.
+Dans chaque section (nouveaux, modifiés, supprimés), les dossiers sont
+classés par ampleur et seuls les NOTIF_MAX_LIGNES premiers sont listés, les
+autres étant résumés en une ligne « … et N autre(s) ». Le texte est ensuite
+découpé en plusieurs messages sous TAILLE_MAX_MESSAGE octets, avec un lien
+vers le détail du scan dans l'Intranet si INTRA_URL est défini.
+"""
+
+import os
+from collections.abc import Callable
+from datetime import datetime
+
+# Taille maximale d'un message (octets UTF-8) : le webhook Teams refuse les
+# charges au-delà d'environ 28 Ko, la marge couvre l'encodage JSON
+TAILLE_MAX_MESSAGE = 20000
+
+# Place réservée à l'en-tête « suite k/n » des messages suivants (octets)
+RESERVE_ENTETE_SUITE = 200
+
+# Longueur maximale d'une ligne de dossier (caractères)
+LONGUEUR_MAX_LIGNE = 300
+
+FIN_BLOC = "\n```"
+
+
+def _taille(texte: str) -> int:
+    return len(texte.encode("utf-8"))
+
+
+def _max_lignes() -> int:
+    """Nombre de dossiers listés par section (NOTIF_MAX_LIGNES, 20 par défaut)."""
+    try:
+        return max(int(os.getenv("NOTIF_MAX_LIGNES", "20")), 1)
+    except ValueError:
+        return 20
+
+
+def formater_duree(duree_scan: float) -> str:
+    """Durée lisible : « 1h 2min 3s », « 2min 3s » ou « 3s »."""
+    heures = int(duree_scan // 3600)
+    minutes = int((duree_scan % 3600) // 60)
+    secondes = int(duree_scan % 60)
+    if heures > 0:
+        return f"{heures}h {minutes}min {secondes}s"
+    if minutes > 0:
+        return f"{minutes}min {secondes}s"
+    return f"{secondes}s"
+
+
+def lignes_section(
+    dossiers: list[dict],
+    ampleur: Callable[[dict], int],
+    formater: Callable[[dict], str],
+    max_lignes: int,
+) -> list[str]:
+    """
+    Lignes d'une section : les max_lignes dossiers de plus grande ampleur
+    (valeur absolue), puis une ligne résumant les suivants et leur total.
+    """
+    tries = sorted(dossiers, key=lambda d: abs(ampleur(d)), reverse=True)
+    lignes = [formater(d)[:LONGUEUR_MAX_LIGNE] for d in tries[:max_lignes]]
+    reste = tries[max_lignes:]
+    if reste:
+        total_reste = sum(ampleur(d) for d in reste)
+        lignes.append(f"   … et {len(reste)} autre(s) ({total_reste:+} Mo au total)")
+    return lignes
+
+
+def decouper_messages(
+    entete: str,
+    sections: list[tuple[str, list[str]]],
+    pied: str = "",
+    taille_max: int = TAILLE_MAX_MESSAGE,
+) -> list[str]:
+    """
+    Assemble en-tête, sections (titre, lignes) et pied en messages d'au plus
+    taille_max octets. Une section coupée referme son bloc de code et reprend
+    dans le message suivant sous le titre « (suite) ».
+    """
+    messages: list[str] = []
+    courant = entete
+    vide = True  # Aucun dossier encore dans le message courant
+    budget = taille_max - RESERVE_ENTETE_SUITE
+
+    for titre, lignes in sections:
+        ouvert = False
+        for ligne in lignes:
+            morceau = f"\n{ligne}" if ouvert else f"\n<br>{titre}:\n```\n{ligne}"
+            if not vide and _taille(courant + morceau + FIN_BLOC) > budget:
+                messages.append(courant + (FIN_BLOC if ouvert else ""))
+                courant = ""
+                morceau = f"\n<br>{titre} (suite):\n```\n{ligne}"
+            courant += morceau
+            ouvert = True
+            vide = False
+        if ouvert:
+            courant += FIN_BLOC
+
+    if pied:
+        if not vide and _taille(courant + pied) > budget:
+            messages.append(courant)
+            courant = ""
+        courant += pied
+    messages.append(courant)
+    return messages
+
+
+def construire_messages_scan(
+    id_scan: int,
+    duree_scan: float,
+    nouveaux_dossiers: list[dict],
+    dossiers_modifies: list[dict],
+    dossiers_supprimes: list[dict],
+    total_changement_mo: int,
+) -> list[str]:
+    """
+    Construit la (ou les) notification(s) Teams de fin de scan.
+    Les chemins sont affichés avec « > » comme séparateur ; les suppressions
+    inférieures à SEUIL_DEFAUT ne sont pas listées.
+    """
+    # Seuil pour la mise en évidence par poids (5 * SEUIL_DEFAUT)
+    seuil_poids = int(os.getenv("SEUIL_DEFAUT", "100")) * 5
+    max_lignes = _max_lignes()
+
+    def chemin(dossier: dict) -> str:
+        return dossier["chemin"].replace("\\", " > ")
+
+    def marqueur(taille_mo: int) -> str:
+        return "⚠️ " if abs(taille_mo) > seuil_poids else "➖ "
+
+    signe = "+" if total_changement_mo > 0 else ""
+    nb_changements = len(nouveaux_dossiers) + len(dossiers_modifies) + len(dossiers_supprimes)
+    entete = (
+        "✅ **Scan terminé avec succès**"
+        f"\n<br>📅 {datetime.now().strftime('%d/%m/%Y à %H:%M')} ⏱️ Durée du scan : {formater_duree(duree_scan)}"
+        f"\n<br>📊 **Résumé** : {nb_changements} changements détectés (Total {signe}{total_changement_mo} Mo) \n"
+    )
+
+    sections = []
+    if nouveaux_dossiers:
+        sections.append(("🆕 **Nouveaux dossiers**", lignes_section(
+            nouveaux_dossiers,
+            lambda d: d["taille"],
+            lambda d: f"{marqueur(d['taille'])}(+ {d['taille']:>6} Mo)   {chemin(d)}",
+            max_lignes,
+        )))
+    if dossiers_modifies:
+        sections.append(("📝 **Dossiers modifiés**", lignes_section(
+            dossiers_modifies,
+            lambda d: d["difference"],
+            lambda d: (
+                f"{marqueur(d['difference'])}({'+' if d['difference'] > 0 else '-'} "
+                f"{abs(d['difference']):>6} Mo)   {chemin(d)}"
+            ),
+            max_lignes,
+        )))
+    # Filtre par seuil : ne notifier que les suppressions significatives
+    supprimes_notifies = [d for d in dossiers_supprimes if d["taille"] > seuil_poids // 5]
+    if supprimes_notifies:
+        sections.append(("🗑️ **Dossiers supprimés**", lignes_section(
+            supprimes_notifies,
+            lambda d: -d["taille"],
+            lambda d: f"{marqueur(d['taille'])}(- {d['taille']:>6} Mo)   {chemin(d)}",
+            max_lignes,
+        )))
+
+    pied = ""
+    if nb_changements == 0:
+        pied = "\n\nAucun dossier modifié ou nouveau"
+    url_intranet = os.getenv("INTRA_URL", "").strip().rstrip("/")
+    if url_intranet and nb_changements:
+        pied += f"\n<br>🔗 [Liste complète dans l'Intranet]({url_intranet}/scans?scan={id_scan})"
+
+    messages = decouper_messages(entete, sections, pied)
+    if len(messages) > 1:
+        messages = [messages[0]] + [
+            f"📨 **Scan #{id_scan} — suite {rang}/{len(messages)}**{message}"
+            for rang, message in enumerate(messages[1:], start=2)
+        ]
+    return messages
@@ -0,0 +1,257 @@
+"""
+Module de mesure des requêtes SQL.
+Les curseurs des connexions ouvertes par db.py et intranet/queries.py sont
+enveloppés pour chronométrer chaque execute / executemany, lecture des
+lignes comprise : empreinte de la requête (valeurs retirées), durée, nombre
+de lignes et fonction appelante.
+Les mesures sont agrégées par empreinte, les N exécutions les plus lentes
+sont conservées et toute requête au-delà de SEUIL_REQUETE_LENTE_MS est
+journalisée (logger « mesures_sql », niveau WARNING).
+"""
+
+import heapq
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'exécutions les plus lentes conservées
+NB_REQUETES_LENTES = 20
+
+# Nombre maximal d'empreintes agrégées (au-delà, la moins coûteuse est oubliée)
+MAX_EMPREINTES = 500
+
+# Longueur maximale d'une empreinte affichée
+LONGUEUR_EMPREINTE = 300
+
+_RE_IN = re.compile(r"\bIN\s*\(\s*%s(?:\s*,\s*%s)*\s*\)", re.IGNORECASE)
+_RE_CHAINE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NOMBRE = re.compile(r"\b\d+\b")
+_RE_ESPACES = re.compile(r"\s+")
+
+# Agrégats par empreinte : appels, durée totale / max (ms), lignes, dernier appelant
+_AGREGATS: dict[str, dict] = {}
+# Tas (durée, compteur, détail) des exécutions les plus lentes
+_LENTES: list[tuple[float, int, dict]] = []
+_compteur = 0
+_verrou = threading.Lock()
+
+
+def _seuil_lent_ms() -> float:
+    """Seuil de journalisation (SEUIL_REQUETE_LENTE_MS, 500 par défaut, 0 = désactivé)."""
+    try:
+        return float(os.getenv("SEUIL_REQUETE_LENTE_MS", "500"))
+    except ValueError:
+        return 500.0
+
+
+def empreinte(requete: str) -> str:
+    """
+    Forme normalisée d'une requête : espaces réduits, chaînes et nombres
+    littéraux remplacés par ?, listes IN (%s, %s, ...) ramenées à IN (...),
+    si bien que les appels d'une même requête partagent une empreinte.
+    """
+    texte = _RE_IN.sub("IN (...)", requete)
+    texte = _RE_CHAINE.sub("?", texte)
+    texte = _RE_NOMBRE.sub("?", texte)
+    texte = _RE_ESPACES.sub(" ", texte).strip()
+    return texte[:LONGUEUR_EMPREINTE]
+
+
+def _appelant() -> str:
+    """Fonction (module.fonction:ligne) ayant appelé le curseur instrumenté."""
+    cadre = sys._getframe(3)
+    return f"{cadre.f_globals.get('__name__', '?')}.{cadre.f_code.co_name}:{cadre.f_lineno}"
+
+
+def enregistrer_mesure(requete: str, duree_ms: float, lignes: int, appelant: str) -> None:
+    """Ajoute une exécution aux agrégats et au top des plus lentes."""
+    global _compteur
+    cle = empreinte(requete)
+    with _verrou:
+        agregat = _AGREGATS.get(cle)
+        if agregat is None:
+            if len(_AGREGATS) >= MAX_EMPREINTES:
+                del _AGREGATS[min(_AGREGATS, key=lambda k: _AGREGATS[k]["total_ms"])]
+            agregat = _AGREGATS[cle] = {
+                "empreinte": cle, "appels": 0, "total_ms": 0.0, "max_ms": 0.0, "lignes": 0,
+            }
+        agregat["appels"] += 1
+        agregat["total_ms"] += duree_ms
+        agregat["max_ms"] = max(agregat["max_ms"], duree_ms)
+        agregat["lignes"] += max(lignes, 0)
+        agregat["appelant"] = appelant
+
+        _compteur += 1
+        if len(_LENTES) < NB_REQUETES_LENTES or duree_ms > _LENTES[0][0]:
+            detail = {
+                "empreinte": cle,
+                "duree_ms": round(duree_ms, 1),
+                "lignes": lignes,
+                "appelant": appelant,
+                "horodatage": datetime.now().isoformat(timespec="seconds"),
+            }
+            if len(_LENTES) < NB_REQUETES_LENTES:
+                heapq.heappush(_LENTES, (duree_ms, _compteur, detail))
+            else:
+                heapq.heapreplace(_LENTES, (duree_ms, _compteur, detail))
+
+    seuil = _seuil_lent_ms()
+    if 0 < seuil <= duree_ms:
+        logger.warning(
+            "Requête lente (%.0f ms, %d ligne(s)) depuis %s : %s",
+            duree_ms, lignes, appelant, cle,
+        )
+
+
+class CurseurInstrumente:
+    """
+    Enveloppe d'un curseur : chronomètre execute / executemany, délègue le reste.
+    Pour une requête qui renvoie des lignes, la mesure reste ouverte pendant
+    leur lecture (fetch*, itération) : avec un curseur non bufferisé, c'est là
+    que les lignes transitent et que rowcount devient connu. Elle est close à
+    la dernière ligne lue, au prochain execute ou à la fermeture du curseur.
+    """
+
+    def __init__(self, curseur: Any):
+        self._curseur = curseur
+        self._mesure: dict | None = None
+
+    def _clore(self) -> None:
+        """Enregistre la mesure en cours, s'il y en a une."""
+        mesure, self._mesure = self._mesure, None
+        if mesure is None:
+            return
+        try:
+            lignes = int(self._curseur.rowcount)
+        except (TypeError, ValueError):
+            lignes = -1
+        enregistrer_mesure(
+            mesure["requete"], mesure["duree_s"] * 1000, max(lignes, mesure["lues"]), mesure["appelant"]
+        )
+
+    def _mesurer(self, methode: str, requete: str, *args: Any, **kwargs: Any) -> Any:
+        self._clore()
+        self._mesure = {"requete": str(requete), "duree_s": 0.0, "lues": 0, "appelant": _appelant()}
+        debut = time.perf_counter()
+        try:
+            resultat = getattr(self._curseur, methode)(requete, *args, **kwargs)
+        except BaseException:
+            self._mesure["duree_s"] += time.perf_counter() - debut
+            self._clore()
+            raise
+        self._mesure["duree_s"] += time.perf_counter() - debut
+        if not getattr(self._curseur, "with_rows", False):
+            self._clore()
+        return resultat
+
+    def _lire(self, methode: str, taille: int | None = None) -> Any:
+        """Appelle une méthode fetch* en ajoutant sa durée et ses lignes à la mesure."""
+        args = () if taille is None else (taille,)
+        debut = time.perf_counter()
+        try:
+            resultat = getattr(self._curseur, methode)(*args)
+        except BaseException:
+            if self._mesure is not None:
+                self._mesure["duree_s"] += time.perf_counter() - debut
+                self._clore()
+            raise
+        if self._mesure is not None:
+            self._mesure["duree_s"] += time.perf_counter() - debut
+            if methode == "fetchone":
+                termine = resultat is None
+                self._mesure["lues"] += 0 if termine else 1
+            else:
+                self._mesure["lues"] += len(resultat)
+                # fetchmany ne renvoie un lot incomplet qu'en fin de résultat
+                termine = methode == "fetchall" or len(resultat) < (
+                    taille or getattr(self._curseur, "arraysize", 1) or 1
+                )
+            if termine:
+                self._clore()
+        return resultat
+
+    def execute(self, requete: str, *args: Any, **kwargs: Any) -> Any:
+        return self._mesurer("execute", requete, *args, **kwargs)
+
+    def executemany(self, requete: str, *args: Any, **kwargs: Any) -> Any:
+        return self._mesurer("executemany", requete, *args, **kwargs)
+
+    def fetchone(self) -> Any:
+        return self._lire("fetchone")
+
+    def fetchmany(self, size: int | None = None) -> Any:
+        return self._lire("fetchmany", size)
+
+    def fetchall(self) -> Any:
+        return self._lire("fetchall")
+
+    def __iter__(self):
+        while True:
+            ligne = self.fetchone()
+            if ligne is None:
+                return
+            yield ligne
+
+    def close(self) -> Any:
+        self._clore()
+        return self._curseur.close()
+
+    def __enter__(self):
+        self._curseur.__enter__()
+        return self
+
+    def __exit__(self, *exc: object) -> Any:
+        self._clore()
+        return self._curseur.__exit__(*exc)
+
+    def __getattr__(self, nom: str) -> Any:
+        return getattr(self._curseur, nom)
+
+
+def instrumenter_connexion(connexion: Any) -> Any:
+    """
+    Fait produire à `connexion` des curseurs instrumentés (la connexion
+    elle-même est inchangée et retournée telle quelle).
+    """
+    creer_curseur = connexion.cursor
+
+    def cursor(*args: Any, **kwargs: Any) -> CurseurInstrumente:
+        return CurseurInstrumente(creer_curseur(*args, **kwargs))
+
+    connexion.cursor = cursor
+    return connexion
+
+
+def get_requetes_lentes() -> list[dict]:
+    """Les NB_REQUETES_LENTES exécutions les plus lentes, de la plus lente à la moins lente."""
+    with _verrou:
+        return [detail for _, _, detail in sorted(_LENTES, key=lambda e: e[0], reverse=True)]
+
+
+def get_agregats(limite: int = 50) -> list[dict]:
+    """Empreintes triées par durée cumulée décroissante, avec durée moyenne."""
+    with _verrou:
+        agregats = sorted(_AGREGATS.values(), key=lambda a: a["total_ms"], reverse=True)[:limite]
+        return [
+            {
+                **a,
+                "total_ms": round(a["total_ms"], 1),
+                "max_ms": round(a["max_ms"], 1),
+                "moyenne_ms": round(a["total_ms"] / a["appels"], 1),
+            }
+            for a in agregats
+        ]
+
+
+def reinitialiser() -> None:
+    """Vide les agrégats et le top des requêtes lentes."""
+    with _verrou:
+        _AGREGATS.clear()
+        _LENTES.clear()
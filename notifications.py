@@ -1,29 +1,312 @@
 """
 Module de notifications Microsoft Teams.
+Une fois la file démarrée (demarrer_file_notifications), les messages sont
+remis par un thread de fond sur une session HTTP persistante, avec nouvelles
+tentatives espacées ; ceux qui n'ont pu être remis sont conservés dans
+notifications_en_attente.jsonl et renvoyés plus tard. Sans file démarrée
+(tests, import direct), l'envoi reste synchrone.
 """
 
+import atexit
 import json
 import logging
 import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any
 
 import requests
 
+from processus import publier_statut
+
 logger = logging.getLogger(__name__)
 
+# Durée maximale d'un appel au webhook (secondes)
+DELAI_REQUETE = 10
+
+# Nombre de tentatives par message avant sa mise en attente sur disque
+NB_TENTATIVES = 5
+
+# Délai avant la deuxième tentative, doublé ensuite et plafonné (secondes)
+DELAI_RETRY_BASE = 2
+DELAI_RETRY_MAX = 60
+
+# Sans nouveau message pendant ce délai, les messages en attente sont renvoyés (secondes)
+INTERVALLE_REPRISE = 300
+
+# Délai laissé à la file pour se vider à l'arrêt (secondes)
+DELAI_ARRET = 30
+
+# Codes HTTP temporaires : les autres erreurs 4xx ne sont pas retentées
+CODES_TEMPORAIRES = {408, 429, 500, 502, 503, 504}
+
+if getattr(sys, "frozen", False):
+    _DOSSIER_APP = os.path.dirname(sys.executable)
+else:
+    _DOSSIER_APP = os.path.dirname(os.path.abspath(__file__))
+
+# Messages non remis, un objet JSON par ligne
+FICHIER_ATTENTE = os.path.join(_DOSSIER_APP, "notifications_en_attente.jsonl")
+
+_file: queue.Queue | None = None
+_thread: threading.Thread | None = None
+_session: requests.Session | None = None
+_arret = threading.Event()
+_echeance = 0.0
+_nom_statut = "notifications"
+_arret_enregistre = False
+_verrou_attente = threading.Lock()
+
+# Compteurs de livraison depuis le démarrage du processus
+_METRIQUES: dict[str, Any] = {
+    "envoyees": 0,
+    "rejetees": 0,
+    "tentatives_echouees": 0,
+    "mises_en_attente": 0,
+    "reprises": 0,
+    "latence_totale_ms": 0.0,
+    "latence_max_ms": 0.0,
+    "dernier_envoi": None,
+    "derniere_erreur": None,
+}
+_verrou_metriques = threading.Lock()
+
+
+def _compter(**increments: Any) -> None:
+    """Incrémente les compteurs de livraison (les clés derniere_* sont remplacées)."""
+    with _verrou_metriques:
+        for cle, valeur in increments.items():
+            if cle.startswith("dernier"):
+                _METRIQUES[cle] = valeur
+            else:
+                _METRIQUES[cle] += valeur
+
+
+def get_metriques_notifications() -> dict[str, Any]:
+    """Compteurs de livraison, latence moyenne et taille de la file en mémoire."""
+    with _verrou_metriques:
+        metriques = dict(_METRIQUES)
+    envoyees = metriques["envoyees"]
+    metriques["latence_moyenne_ms"] = (
+        round(metriques.pop("latence_totale_ms") / envoyees, 1) if envoyees else None
+    )
+    metriques["latence_max_ms"] = round(metriques["latence_max_ms"], 1)
+    metriques["en_file"] = _file.qsize() if _file is not None else 0
+    return metriques
+
+
+def _delai_retry(tentative: int, reponse: requests.Response | None) -> float:
+    """Délai avant la tentative suivante : Retry-After du webhook, sinon exponentiel."""
+    if reponse is not None:
+        try:
+            return min(float(reponse.headers.get("Retry-After", "")), DELAI_RETRY_MAX)
+        except ValueError:
+            pass
+    return min(DELAI_RETRY_BASE * 2 ** (tentative - 1), DELAI_RETRY_MAX)
+
+
+def _attendre_avant_retry(delai: float) -> bool:
+    """
+    Attend `delai` secondes avant la tentative suivante ; après une demande
+    d'arrêt, retourne False si l'échéance de l'arrêt tombe avant.
+    """
+    fin = time.monotonic() + delai
+    if not _arret.wait(delai):
+        return True
+    if fin > _echeance:
+        return False
+    time.sleep(max(0.0, fin - time.monotonic()))
+    return True
+
+
+def _livrer(element: dict) -> bool:
+    """
+    Remet un message au webhook en retentant les erreurs temporaires.
+    Retourne False si le message a dû être mis en attente sur disque.
+    """
+    url = os.getenv("TEAMS_WEBHOOK_URL")
+    if not url:
+        logger.warning("TEAMS_WEBHOOK_URL n'est pas défini, notification ignorée.")
+        return True
+    session = _session
+    if session is None:
+        # File arrêtée entre-temps : le message sera renvoyé plus tard
+        _mettre_en_attente([element])
+        return False
+
+    erreur: requests.exceptions.RequestException | None = None
+    for tentative in range(1, NB_TENTATIVES + 1):
+        reponse = None
+        debut = time.perf_counter()
+        try:
+            reponse = session.post(url, json={"text": element["message"]}, timeout=DELAI_REQUETE)
+            reponse.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            erreur = e
+            if reponse is not None and reponse.status_code not in CODES_TEMPORAIRES:
+                logger.error(f"Notification rejetée par le webhook : {e}")
+                _compter(rejetees=1, derniere_erreur=str(e))
+                return True
+            _compter(tentatives_echouees=1, derniere_erreur=str(e))
+        else:
+            latence_ms = (time.perf_counter() - debut) * 1000
+            _compter(
+                envoyees=1,
+                latence_totale_ms=latence_ms,
+                dernier_envoi=datetime.now().isoformat(timespec="seconds"),
+            )
+            with _verrou_metriques:
+                _METRIQUES["latence_max_ms"] = max(_METRIQUES["latence_max_ms"], latence_ms)
+            return True
+
+        if tentative == NB_TENTATIVES or not _attendre_avant_retry(_delai_retry(tentative, reponse)):
+            break
+
+    logger.error(f"Erreur lors de l'envoi de la notification : {erreur} (mise en attente)")
+    _mettre_en_attente([element])
+    return False
+
+
+def _mettre_en_attente(elements: list[dict]) -> None:
+    """Ajoute des messages non remis à la fin du fichier d'attente."""
+    try:
+        with _verrou_attente, open(FICHIER_ATTENTE, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(element, ensure_ascii=False) + "\n" for element in elements)
+    except OSError as e:
+        logger.error(f"{len(elements)} notification(s) perdue(s), fichier d'attente inaccessible : {e}")
+        return
+    _compter(mises_en_attente=len(elements))
+
+
+def _reprendre_attente() -> None:
+    """
+    Renvoie les messages du fichier d'attente dans l'ordre ; au premier échec,
+    le reste y retourne sans nouvelle tentative.
+    """
+    # Le fichier est renommé avant lecture : un autre processus (scan séparé)
+    # peut continuer d'y ajouter des messages pendant la reprise
+    en_reprise = FICHIER_ATTENTE + ".reprise"
+    with _verrou_attente:
+        try:
+            os.replace(FICHIER_ATTENTE, en_reprise)
+        except OSError:
+            return
+    try:
+        with open(en_reprise, encoding="utf-8") as f:
+            lignes = f.readlines()
+        os.remove(en_reprise)
+    except OSError as e:
+        logger.error(f"Lecture du fichier d'attente des notifications impossible : {e}")
+        return
+
+    elements = []
+    for ligne in lignes:
+        try:
+            elements.append(json.loads(ligne))
+        except json.JSONDecodeError:
+            # Ligne tronquée par un arrêt brutal
+            continue
+
+    for position, element in enumerate(elements):
+        _compter(reprises=1)
+        if not _livrer(element):
+            _mettre_en_attente(elements[position + 1:])
+            return
+
+
+def _boucle(file_messages: queue.Queue, reprendre_attente: bool) -> None:
+    """Thread de livraison : vide la file, reprend l'attente quand elle est calme."""
+    if reprendre_attente:
+        _reprendre_attente()
+    while True:
+        try:
+            element = file_messages.get(timeout=INTERVALLE_REPRISE)
+        except queue.Empty:
+            if reprendre_attente:
+                _reprendre_attente()
+            continue
+        if element is None:
+            return
+        _livrer(element)
+        publier_statut(_nom_statut, **get_metriques_notifications())
+
+
+def demarrer_file_notifications(nom_statut: str = "notifications", reprendre_attente: bool = True) -> None:
+    """
+    Démarre le thread de livraison (sans effet s'il tourne déjà) et vide la
+    file à la sortie du processus. reprendre_attente=False laisse le fichier
+    d'attente au processus principal (processus enfants de scan).
+    """
+    global _file, _thread, _session, _nom_statut, _arret_enregistre
+    if _thread is not None and _thread.is_alive():
+        return
+    _arret.clear()
+    _nom_statut = nom_statut
+    _file = queue.Queue()
+    _session = requests.Session()
+    _thread = threading.Thread(
+        target=_boucle, args=(_file, reprendre_attente), daemon=True, name="notifications"
+    )
+    _thread.start()
+    if not _arret_enregistre:
+        atexit.register(arreter_file_notifications)
+        _arret_enregistre = True
+
+
+def arreter_file_notifications(delai: float = DELAI_ARRET) -> None:
+    """
+    Laisse au plus `delai` secondes à la file pour se vider (nouvelles
+    tentatives comprises) ; les messages encore en file passent dans le
+    fichier d'attente.
+    """
+    global _thread, _session, _echeance
+    file_messages, session = _file, _session
+    if _thread is None or file_messages is None or session is None:
+        return
+    _echeance = time.monotonic() + delai
+    _arret.set()
+    file_messages.put(None)
+    _thread.join(delai)
+
+    restants = []
+    while True:
+        try:
+            element = file_messages.get_nowait()
+        except queue.Empty:
+            break
+        if element is not None:
+            restants.append(element)
+    if restants:
+        _mettre_en_attente(restants)
+    # Un thread encore occupé (webhook lent) s'arrêtera après son message
+    file_messages.put(None)
+
+    session.close()
+    _thread = None
+    _session = None
+
 
 def envoyer_notif_teams(message: str) -> None:
     """
-    Envoie une notification à Microsoft Teams.
+    Envoie une notification à Microsoft Teams : la met en file si le thread
+    de livraison tourne, sinon l'envoie immédiatement.
     """
     try:
         url = os.getenv("TEAMS_WEBHOOK_URL")
         if not url:
             logger.warning("TEAMS_WEBHOOK_URL n'est pas défini, notification ignorée.")
             return
+        file_messages = _file
+        if _thread is not None and file_messages is not None:
+            file_messages.put({"message": message, "horodatage": datetime.now().isoformat(timespec="seconds")})
+            return
         headers = {"Content-Type": "application/json"}
         payload = {"text": message}
         response = requests.post(
-            url, headers=headers, data=json.dumps(payload), timeout=10
+            url, headers=headers, data=json.dumps(payload), timeout=DELAI_REQUETE
         )
         # Lève une HTTPError si le code de retour est 4xx ou 5xx
         response.raise_for_status()
@@ -1,18 +1,62 @@
 """
 Module de chargement dynamique des plugins.
+Les tâches qu'un plugin planifie (scheduler.every()...do(fonction)) ne sont
+pas exécutées dans la boucle principale mais confiées à un pool borné de
+threads : une exécution à la fois par plugin, durée enregistrée, et au-delà
+de PLUGINS_TIMEOUT l'exécution est abandonnée (alerte, thread du pool
+remplacé ; le plugin est prié de s'arrêter via tache_annulee()).
+Un plugin peut aussi définir on_directory(dossier, sous_dossiers, fichiers),
+appelé pour chaque dossier pendant le parcours du scan, et
+on_scan_complete(contexte), appelé à la fin de chaque scan avec
+l'arborescence que le scanner vient de parcourir.
 """
 
 import importlib.util
 import logging
 import os
+import queue
 import sys
+import threading
+import time
 import traceback
+from collections.abc import Callable, Iterable
+from datetime import datetime
+from typing import Any
+
+from notifications import envoyer_notif_teams
+from processus import get_statuts, publier_statut
 
 logger = logging.getLogger(__name__)
 
 # Registre global des plugins : nom -> dict(module, actif, erreur, chemin)
 _REGISTRE: dict[str, dict] = {}
 
+# Exécutions des tâches planifiées : nom -> dict(en_cours, derniere_execution,
+# derniere_duree_s, duree_max_s, dernier_statut, derniere_erreur,
+# nb_executions, nb_ignorees, nb_depassements). Conservé hors du registre
+# pour survivre aux rechargements.
+_EXECUTIONS: dict[str, dict] = {}
+_verrou_executions = threading.Lock()
+
+# Fonctions optionnelles d'un plugin appelées pendant le parcours (pour
+# chaque dossier) et à la fin de chaque scan
+HOOK_VISITE_DOSSIER = "on_directory"
+HOOK_FIN_DE_SCAN = "on_scan_complete"
+
+# Statuts publiés (voir processus.publier_statut) : plugins désactivés depuis
+# l'Intranet, et état des hooks exécutés par le processus du scan
+STATUT_PLUGINS = "plugins"
+STATUT_HOOKS_SCAN = "plugins/scan"
+
+# File et threads du pool d'exécution (créés au premier lancement) ; un
+# thread retiré de _threads_pool (exécution abandonnée) s'arrête dès que
+# sa tâche rend la main
+_file_taches: queue.Queue = queue.Queue()
+_threads_pool: list[threading.Thread] = []
+
+# Demande d'arrêt de l'exécution en cours dans chaque thread (voir tache_annulee)
+_contexte_execution = threading.local()
+
 # Dossier de l'application (initialisé au premier chargement)
 _DOSSIER_APP: str = ""
 
@@ -104,9 +148,10 @@ def reinitialiser_plugins_en_erreur() -> None:
             logger.info(f"Plugin '{nom}' retiré du registre (en erreur) pour retry.")
 
 
-def charger_plugins(dossier_app: str) -> list:
+def charger_plugins(dossier_app: str, noms: Iterable[str] | None = None) -> list:
     """
-    Scanne le dossier 'plugins/' et charge les modules Python qui y sont présents.
+    Scanne le dossier 'plugins/' et charge les modules Python qui y sont présents
+    (seulement ceux de `noms` si fourni, ex : plugins actifs du processus principal).
     Met à jour le registre global (_REGISTRE) avec l'état de chaque plugin.
     Retourne la liste des modules chargés avec succès (actifs).
     """
@@ -124,7 +169,10 @@ def charger_plugins(dossier_app: str) -> list:
     if dossier not in sys.path:
         sys.path.insert(0, dossier)
 
+    retenus = None if noms is None else set(noms)
     for nom_module, chemin in _scan_fichiers_plugins():
+        if retenus is not None and nom_module not in retenus:
+            continue
         deja_present = nom_module in _REGISTRE
         en_erreur = (
             deja_present
@@ -183,13 +231,18 @@ def recharger_plugins() -> None:
         nouveaux[nom_module] = etat
 
     _REGISTRE = nouveaux
+    _publier_desactives()
 
 
 def get_registre() -> dict[str, dict]:
     """
     Retourne une copie du registre global sous une forme sérialisable (sans les modules Python).
-    Format : { nom: { actif, erreur, chemin } }
+    Format : { nom: { actif, erreur, chemin, valide, execution, execution_visite,
+    execution_fin_de_scan } }, les trois derniers étant l'état des tâches
+    planifiées, de on_directory et de on_scan_complete (voir _EXECUTIONS) ou None.
+    En mode supervision, l'état des deux hooks vient du processus du scan.
     """
+    executions = {**get_statuts().get(STATUT_HOOKS_SCAN, {}).get("executions", {}), **get_executions()}
     resultat = {}
     for nom, info in _REGISTRE.items():
         resultat[nom] = {
@@ -198,6 +251,9 @@ def get_registre() -> dict[str, dict]:
             "chemin": info.get("chemin", ""),
             "valide": info.get("module") is not None
             or (not info.get("actif") and info.get("erreur") is None),
+            "execution": executions.get(nom),
+            "execution_visite": executions.get(f"{nom}:{HOOK_VISITE_DOSSIER}"),
+            "execution_fin_de_scan": executions.get(f"{nom}:{HOOK_FIN_DE_SCAN}"),
         }
     return resultat
 
@@ -221,6 +277,7 @@ def activer_plugin(nom: str) -> dict:
 
     etat = _charger_module(nom, chemin)
     _REGISTRE[nom] = etat
+    _publier_desactives()
 
     if etat["actif"]:
         return {"ok": True, "erreur": None}
@@ -245,4 +302,331 @@ def desactiver_plugin(nom: str) -> dict:
     if nom in sys.modules:
         del sys.modules[nom]
 
+    _publier_desactives()
     return {"ok": True, "erreur": None}
+
+
+def _publier_desactives() -> None:
+    """
+    Publie les plugins désactivés manuellement : en mode supervision, c'est
+    ainsi que le processus principal apprend les choix faits dans l'Intranet.
+    """
+    publier_statut(STATUT_PLUGINS, desactives=sorted(
+        nom for nom, info in _REGISTRE.items()
+        if not info.get("actif") and not info.get("erreur")
+    ))
+
+
+def noms_plugins_actifs() -> list[str]:
+    """
+    Plugins actifs du registre, moins ceux désactivés depuis l'Intranet
+    (publiés par son processus en mode supervision).
+    """
+    desactives = set(get_statuts().get(STATUT_PLUGINS, {}).get("desactives", []))
+    return [
+        nom for nom, info in list(_REGISTRE.items())
+        if info.get("actif") and nom not in desactives
+    ]
+
+
+def _nb_threads_plugins() -> int:
+    """Taille du pool (PLUGINS_THREADS, 2 par défaut)."""
+    try:
+        return max(int(os.getenv("PLUGINS_THREADS", "2")), 1)
+    except ValueError:
+        return 2
+
+
+def _delai_max_plugin() -> float:
+    """Durée (s) au-delà de laquelle une exécution est signalée (PLUGINS_TIMEOUT, 0 = aucune)."""
+    try:
+        return float(os.getenv("PLUGINS_TIMEOUT", "3600"))
+    except ValueError:
+        return 3600.0
+
+
+def _etat_execution(nom: str) -> dict:
+    """État d'exécution d'un plugin, créé au besoin (appelant sous _verrou_executions)."""
+    return _EXECUTIONS.setdefault(nom, {
+        "en_cours": False,
+        "derniere_execution": None,
+        "derniere_duree_s": None,
+        "duree_max_s": 0.0,
+        "dernier_statut": None,
+        "derniere_erreur": None,
+        "nb_executions": 0,
+        "nb_ignorees": 0,
+        "nb_depassements": 0,
+    })
+
+
+def tache_annulee() -> bool:
+    """
+    Indique si l'exécution en cours du plugin a dépassé PLUGINS_TIMEOUT et a
+    été abandonnée. À tester par un plugin dans ses boucles longues : il doit
+    alors rendre la main au plus vite (son résultat n'est plus attendu).
+    """
+    annulation = getattr(_contexte_execution, "annulation", None)
+    return annulation is not None and annulation.is_set()
+
+
+def _completer_pool() -> None:
+    """Démarre les threads manquants du pool (appelant sous _verrou_executions)."""
+    # Threads daemon (et non ThreadPoolExecutor, qui attend ses threads
+    # à la sortie) : un plugin bloqué n'empêche pas l'arrêt du programme
+    while len(_threads_pool) < _nb_threads_plugins():
+        thread = threading.Thread(
+            target=_boucle_pool, daemon=True, name=f"plugin-{len(_threads_pool) + 1}"
+        )
+        thread.start()
+        _threads_pool.append(thread)
+
+
+def _abandonner_execution(nom: str, delai: float, execution: dict, thread: threading.Thread) -> None:
+    """
+    Appelé par le minuteur quand une exécution dure plus que PLUGINS_TIMEOUT :
+    l'exécution est enregistrée comme abandonnée (le plugin peut être relancé),
+    le plugin est prié de s'arrêter et, s'il occupait un thread du pool, ce
+    thread est remplacé pour que les autres plugins continuent de tourner.
+    """
+    with _verrou_executions:
+        if execution["terminee"]:
+            return
+        execution["terminee"] = True
+        execution["annulation"].set()
+        etat = _etat_execution(nom)
+        etat["dernier_statut"] = "delai_depasse"
+        etat["derniere_erreur"] = None
+        etat["derniere_duree_s"] = round(delai, 3)
+        etat["duree_max_s"] = round(max(etat["duree_max_s"], delai), 3)
+        etat["nb_executions"] += 1
+        etat["nb_depassements"] += 1
+        etat["en_cours"] = False
+        if thread in _threads_pool:
+            _threads_pool.remove(thread)
+            _completer_pool()
+    logger.error(f"Le plugin '{nom}' s'exécute depuis plus de {delai:.0f} s : exécution abandonnée.")
+    envoyer_notif_teams(
+        f"⏱️ Le plugin **{nom}** s'exécute depuis plus de {delai:.0f} s : "
+        f"exécution abandonnée, il sera relancé à sa prochaine échéance."
+    )
+
+
+def _executer_tache(nom: str, fonction: Callable, args: tuple, kwargs: dict) -> None:
+    """Exécute une tâche de plugin et enregistre sa durée et son résultat."""
+    execution = {"terminee": False, "annulation": threading.Event()}
+    _contexte_execution.annulation = execution["annulation"]
+    delai = _delai_max_plugin()
+    minuteur = None
+    if delai > 0:
+        minuteur = threading.Timer(
+            delai, _abandonner_execution, (nom, delai, execution, threading.current_thread())
+        )
+        minuteur.daemon = True
+        minuteur.start()
+
+    debut = time.perf_counter()
+    erreur = None
+    try:
+        fonction(*args, **kwargs)
+    except Exception:
+        erreur = traceback.format_exc().strip()
+        logger.exception(f"Erreur lors de l'exécution du plugin '{nom}'")
+    finally:
+        if minuteur:
+            minuteur.cancel()
+        duree = time.perf_counter() - debut
+        _contexte_execution.annulation = None
+        with _verrou_executions:
+            etat = _etat_execution(nom)
+            etat["duree_max_s"] = round(max(etat["duree_max_s"], duree), 3)
+            if execution["terminee"]:
+                # Déjà enregistrée comme abandonnée : une exécution plus
+                # récente du plugin peut être en cours, son état reste intact
+                logger.warning(f"Le plugin '{nom}' a rendu la main {duree:.0f} s après son lancement.")
+            else:
+                execution["terminee"] = True
+                etat["dernier_statut"] = "erreur" if erreur else "ok"
+                etat["derniere_erreur"] = erreur
+                etat["derniere_duree_s"] = round(duree, 3)
+                etat["nb_executions"] += 1
+                etat["en_cours"] = False
+
+
+def _boucle_pool() -> None:
+    """
+    Thread du pool : exécute les tâches de plugins les unes après les autres,
+    jusqu'à être remplacé après une exécution abandonnée.
+    """
+    thread = threading.current_thread()
+    while True:
+        nom, fonction, args, kwargs = _file_taches.get()
+        _executer_tache(nom, fonction, args, kwargs)
+        with _verrou_executions:
+            if thread not in _threads_pool:
+                return
+
+
+def lancer_tache_plugin(nom: str, fonction: Callable, *args: Any, **kwargs: Any) -> bool:
+    """
+    Confie une tâche du plugin `nom` au pool. Retourne False (exécution
+    ignorée) si la précédente exécution de ce plugin n'est pas terminée.
+    """
+    with _verrou_executions:
+        etat = _etat_execution(nom)
+        if etat["en_cours"]:
+            etat["nb_ignorees"] += 1
+            logger.warning(f"Plugin '{nom}' encore en cours d'exécution, lancement ignoré.")
+            return False
+        etat["en_cours"] = True
+        etat["derniere_execution"] = datetime.now().isoformat(timespec="seconds")
+        _completer_pool()
+
+    _file_taches.put((nom, fonction, args, kwargs))
+    return True
+
+
+class _TachePlanifiee:
+    """Enveloppe d'un schedule.Job : do() planifie lancer_tache_plugin à la place."""
+
+    def __init__(self, tache: Any, nom: str):
+        self._tache = tache
+        self._nom = nom
+
+    def do(self, fonction: Callable, *args: Any, **kwargs: Any) -> Any:
+        tache = self._tache.do(lancer_tache_plugin, self._nom, fonction, *args, **kwargs)
+        # Nom lisible dans les journaux de schedule (repr du job)
+        tache.job_func.__name__ = getattr(fonction, "__name__", repr(fonction))
+        return tache
+
+    def __getattr__(self, nom: str) -> Any:
+        valeur = getattr(self._tache, nom)
+        # .day, .at("08:00"), .to(5)... retournent le job : on reste enveloppé
+        if valeur is self._tache:
+            return self
+        if callable(valeur):
+            def appel(*args: Any, **kwargs: Any) -> Any:
+                resultat = valeur(*args, **kwargs)
+                return self if resultat is self._tache else resultat
+            return appel
+        return valeur
+
+
+class OrdonnanceurPlugin:
+    """
+    Ordonnanceur transmis à plugin.planifier() : même interface que le
+    module schedule, mais les tâches planifiées s'exécutent dans le pool.
+    """
+
+    def __init__(self, ordonnanceur: Any, nom: str):
+        self._ordonnanceur = ordonnanceur
+        self._nom = nom
+
+    def every(self, intervalle: int = 1) -> _TachePlanifiee:
+        return _TachePlanifiee(self._ordonnanceur.every(intervalle), self._nom)
+
+    def __getattr__(self, nom: str) -> Any:
+        return getattr(self._ordonnanceur, nom)
+
+
+def _hooks_actifs(nom_hook: str) -> list[tuple[str, Callable]]:
+    """(nom, fonction) des plugins actifs définissant la fonction nom_hook."""
+    return [
+        (nom, getattr(info["module"], nom_hook))
+        for nom, info in list(_REGISTRE.items())
+        if info.get("actif") and callable(getattr(info.get("module"), nom_hook, None))
+    ]
+
+
+def hooks_fin_de_scan() -> list[tuple[str, Callable]]:
+    """(nom, fonction) des plugins actifs définissant on_scan_complete."""
+    return _hooks_actifs(HOOK_FIN_DE_SCAN)
+
+
+def preparer_visiteurs() -> dict[str, dict]:
+    """
+    Visiteurs à transmettre à fichiers.scanner_arborescence : un par plugin
+    actif définissant on_directory, avec ses compteurs de temps à zéro.
+    """
+    return {
+        nom: {"fonction": fonction, "duree_s": 0.0, "nb_dossiers": 0, "erreur": None}
+        for nom, fonction in _hooks_actifs(HOOK_VISITE_DOSSIER)
+    }
+
+
+def _seuil_visite_pct() -> float:
+    """Part du scan (%) au-delà de laquelle un visiteur est signalé (PLUGINS_VISITE_MAX_PCT, 10 par défaut)."""
+    try:
+        return float(os.getenv("PLUGINS_VISITE_MAX_PCT", "10"))
+    except ValueError:
+        return 10.0
+
+
+def enregistrer_visites(visiteurs: dict[str, dict], duree_scan_s: float) -> list[tuple[str, float]]:
+    """
+    Enregistre le temps passé par chaque visiteur pendant le scan (sous
+    « nom:on_directory ») et retourne les (nom, part du scan en %) des
+    plugins ayant dépassé PLUGINS_VISITE_MAX_PCT % de duree_scan_s.
+    """
+    seuil = _seuil_visite_pct()
+    lents = []
+    with _verrou_executions:
+        for nom, visiteur in visiteurs.items():
+            part = 100 * visiteur["duree_s"] / duree_scan_s if duree_scan_s > 0 else 0.0
+            lent = 0 < seuil < part
+            etat = _etat_execution(f"{nom}:{HOOK_VISITE_DOSSIER}")
+            if visiteur["erreur"]:
+                etat["dernier_statut"] = "erreur"
+            else:
+                etat["dernier_statut"] = "lent" if lent else "ok"
+            etat["derniere_erreur"] = visiteur["erreur"]
+            etat["derniere_execution"] = datetime.now().isoformat(timespec="seconds")
+            etat["derniere_duree_s"] = round(visiteur["duree_s"], 3)
+            etat["duree_max_s"] = round(max(etat["duree_max_s"], visiteur["duree_s"]), 3)
+            etat["part_du_scan_pct"] = round(part, 1)
+            etat["nb_dossiers"] = visiteur["nb_dossiers"]
+            etat["nb_executions"] += 1
+            if lent:
+                etat["nb_depassements"] += 1
+                lents.append((nom, part))
+    return lents
+
+
+def executer_hooks_fin_de_scan(contexte: Any, hooks: list[tuple[str, Callable]]) -> None:
+    """
+    Appelle on_scan_complete(contexte) pour chaque plugin, l'un après l'autre.
+    Chaque appel tourne dans son propre thread, attendu au plus
+    PLUGINS_TIMEOUT secondes : un plugin bloqué est abandonné sans retenir
+    la fin du scan. Une exception est journalisée sans interrompre les
+    suivants ; la durée est enregistrée sous « nom:on_scan_complete ».
+    """
+    delai = _delai_max_plugin()
+    for nom, hook in hooks:
+        cle = f"{nom}:{HOOK_FIN_DE_SCAN}"
+        with _verrou_executions:
+            etat = _etat_execution(cle)
+            etat["en_cours"] = True
+            etat["derniere_execution"] = datetime.now().isoformat(timespec="seconds")
+        execution = threading.Thread(
+            target=_executer_tache, args=(cle, hook, (contexte,), {}), daemon=True, name=f"plugin-{cle}"
+        )
+        execution.start()
+        # Marge pour laisser le minuteur enregistrer l'abandon
+        execution.join(delai + 1 if delai > 0 else None)
+
+
+def publier_executions_hooks() -> None:
+    """
+    Publie l'état de on_directory et on_scan_complete de chaque plugin : le
+    processus enfant du scan le rend ainsi visible dans get_registre().
+    """
+    suffixes = (f":{HOOK_VISITE_DOSSIER}", f":{HOOK_FIN_DE_SCAN}")
+    publier_statut(STATUT_HOOKS_SCAN, executions={
+        cle: etat for cle, etat in get_executions().items() if cle.endswith(suffixes)
+    })
+
+
+def get_executions() -> dict[str, dict]:
+    """Copie de l'état d'exécution de chaque plugin."""
+    with _verrou_executions:
+        return {nom: dict(etat) for nom, etat in _EXECUTIONS.items()}
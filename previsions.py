@@ -0,0 +1,232 @@
+"""
+Module de prévision de croissance des dossiers.
+Charge l'historique des tailles dans une matrice NumPy dossiers × scans par
+racine, ajuste une tendance linéaire pour tous les dossiers à la fois et
+enregistre la croissance (Ko/jour) et le nombre de jours avant saturation du
+volume dans folder_forecasts, lue par le classement de l'Intranet.
+"""
+
+import logging
+import os
+import shutil
+
+import mysql.connector
+import numpy as np
+
+from notifications import envoyer_notif_teams
+
+logger = logging.getLogger(__name__)
+
+# Nombre minimal de scans (et de tailles connues par dossier) pour une tendance
+NB_POINTS_MIN_PREVISION = 3
+
+# Nombre de dossiers chargés par matrice (borne la mémoire : 10 000 dossiers
+# × 90 scans en float64 ≈ 7 Mo)
+TAILLE_LOT_PREVISIONS = 10000
+
+# Pente (Ko/jour) en dessous de laquelle un dossier est considéré stable :
+# absorbe les erreurs d'arrondi de l'ajustement sur les grandes tailles
+PENTE_MIN_CROISSANCE = 1.0
+
+# Borne de days_to_full (colonne INT) : au-delà, la date n'a plus de sens
+HORIZON_SATURATION_JOURS = 36500
+
+
+def ajuster_tendances(
+    jours: np.ndarray, matrice: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Ajuste une droite taille = a × jour + b pour chaque ligne de `matrice`
+    (dossiers × scans, NaN quand la taille n'est pas connue à ce scan).
+    sizes ne stockant que les changements, chaque NaN est d'abord remplacé
+    par la dernière taille connue à sa gauche ; les NaN restants (dossier pas
+    encore créé) sont exclus de l'ajustement.
+    Retourne (pentes en Ko/jour, nombre de points utilisés) ; la pente est NaN
+    pour les dossiers ayant moins de NB_POINTS_MIN_PREVISION points, et 0 si
+    elle est inférieure à PENTE_MIN_CROISSANCE en valeur absolue.
+    """
+    nb_dossiers, nb_scans = matrice.shape
+    connus = ~np.isnan(matrice)
+    # Report de la dernière valeur connue : indice de colonne de la dernière
+    # valeur non NaN, propagé par un maximum cumulé
+    indices = np.where(connus, np.arange(nb_scans), 0)
+    np.maximum.accumulate(indices, axis=1, out=indices)
+    remplie = matrice[np.arange(nb_dossiers)[:, None], indices]
+
+    poids = (~np.isnan(remplie)).astype(float)
+    y = np.nan_to_num(remplie)
+    x = np.broadcast_to(jours.astype(float), matrice.shape)
+
+    # Moindres carrés sur x et y centrés sur leur moyenne : la forme
+    # n·Σxy − Σx·Σy perd toute précision sur des tailles de l'ordre du To
+    n = poids.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        moyenne_x = (poids * x).sum(axis=1) / n
+        moyenne_y = (poids * y).sum(axis=1) / n
+    ecart_x = poids * (x - moyenne_x[:, None])
+    ecart_y = poids * (y - moyenne_y[:, None])
+    sxx = (ecart_x * ecart_x).sum(axis=1)
+    sxy = (ecart_x * ecart_y).sum(axis=1)
+
+    pentes = np.full(nb_dossiers, np.nan)
+    valides = (n >= NB_POINTS_MIN_PREVISION) & (sxx > 0)
+    pentes[valides] = sxy[valides] / sxx[valides]
+    pentes[np.abs(pentes) < PENTE_MIN_CROISSANCE] = 0.0
+    return pentes, n.astype(int)
+
+
+def jours_avant_saturation(pentes: np.ndarray, libre_kb: int | None) -> list[int | None]:
+    """
+    Nombre de jours avant que l'espace libre du volume soit consommé au
+    rythme de chaque dossier, plafonné à HORIZON_SATURATION_JOURS ; None si
+    le dossier ne grossit pas ou si l'espace libre est inconnu.
+    """
+    if libre_kb is None:
+        return [None] * len(pentes)
+    return [
+        min(int(libre_kb // pente), HORIZON_SATURATION_JOURS)
+        if pente >= PENTE_MIN_CROISSANCE else None
+        for pente in np.nan_to_num(pentes).tolist()
+    ]
+
+
+def _espace_libre_kb(chemin_racine: str) -> int | None:
+    """Espace libre (Ko) du volume contenant la racine, None si inaccessible."""
+    try:
+        return shutil.disk_usage(chemin_racine).free // 1024
+    except OSError:
+        return None
+
+
+def _charger_matrice(
+    curseur, ids_dossiers: list[int], ids_scans: np.ndarray
+) -> np.ndarray:
+    """
+    Matrice dossiers × scans des tailles enregistrées : la première colonne
+    reçoit la taille de chaque dossier au premier scan de la fenêtre (dernière
+    ligne sizes <= ce scan), les suivantes les seules lignes écrites ensuite.
+    """
+    premier, dernier = int(ids_scans[0]), int(ids_scans[-1])
+    placeholders = ",".join(["%s"] * len(ids_dossiers))
+    matrice = np.full((len(ids_dossiers), len(ids_scans)), np.nan)
+    dossiers = np.asarray(ids_dossiers)
+
+    curseur.execute(
+        f"SELECT s.id_folder, s.size_kb FROM sizes s "
+        f"JOIN ("
+        f"  SELECT id_folder, MAX(id_scan) AS id_scan FROM sizes "
+        f"  WHERE id_folder IN ({placeholders}) AND id_scan <= %s GROUP BY id_folder"
+        f") d ON d.id_folder = s.id_folder AND d.id_scan = s.id_scan",
+        (*ids_dossiers, premier),
+    )
+    depart = np.array(curseur.fetchall(), dtype=float).reshape(-1, 2)
+    lignes = np.searchsorted(dossiers, depart[:, 0].astype(np.int64))
+    matrice[lignes, 0] = depart[:, 1]
+
+    # Une ligne écrite par un scan non complété est rattachée au dernier scan
+    # complété qui le précède ; le tri par id_scan fait gagner la plus récente
+    curseur.execute(
+        f"SELECT id_folder, id_scan, size_kb FROM sizes "
+        f"WHERE id_folder IN ({placeholders}) AND id_scan > %s AND id_scan <= %s "
+        f"ORDER BY id_scan",
+        (*ids_dossiers, premier, dernier),
+    )
+    changements = np.array(curseur.fetchall(), dtype=float).reshape(-1, 3)
+    lignes = np.searchsorted(dossiers, changements[:, 0].astype(np.int64))
+    colonnes = np.searchsorted(ids_scans, changements[:, 1].astype(np.int64), side="right") - 1
+    matrice[lignes, colonnes] = changements[:, 2]
+    return matrice
+
+
+def calculer_previsions(connexion_mysql: mysql.connector.MySQLConnection) -> int:
+    """
+    Recalcule folder_forecasts pour tous les dossiers des racines de
+    CHEMINS_RACINES, sur les scans complétés des PREVISION_FENETRE_JOURS
+    derniers jours (90 par défaut, 0 pour désactiver).
+    Retourne le nombre de prévisions enregistrées.
+    """
+    try:
+        fenetre = int(os.getenv("PREVISION_FENETRE_JOURS", "90"))
+    except ValueError:
+        fenetre = 90
+    if fenetre <= 0:
+        return 0
+
+    total = 0
+    try:
+        curseur = connexion_mysql.cursor()
+        curseur.execute(
+            "SELECT id_scan, UNIX_TIMESTAMP(date_) FROM scans "
+            "WHERE status = 'completed' AND date_ >= NOW() - INTERVAL %s DAY "
+            "ORDER BY id_scan",
+            (fenetre,),
+        )
+        scans = [(int(str(row[0])), float(str(row[1]))) for row in curseur.fetchall()]
+        if len(scans) < NB_POINTS_MIN_PREVISION:
+            curseur.close()
+            return 0
+        ids_scans = np.array([id_scan for id_scan, _ in scans], dtype=np.int64)
+        horodatages = np.array([horodatage for _, horodatage in scans])
+        jours = (horodatages - horodatages[0]) / 86400
+        dernier_scan = int(ids_scans[-1])
+
+        curseur.execute(
+            "DELETE ff FROM folder_forecasts ff "
+            "JOIN folders f ON f.id_folder = ff.id_folder WHERE f.is_deleted = 1"
+        )
+
+        for chemin_racine in os.getenv("CHEMINS_RACINES", "").split(","):
+            chemin_racine = chemin_racine.strip()
+            if not chemin_racine:
+                continue
+            chemin_racine = os.path.normpath(chemin_racine)
+            libre_kb = _espace_libre_kb(chemin_racine)
+
+            # Sous-arbre de la racine par parent_id (pas de LIKE sur le chemin,
+            # dont les backslashs Windows sont des caractères d'échappement)
+            curseur.execute(
+                "WITH RECURSIVE sous_arbre (id_folder) AS ("
+                "  SELECT id_folder FROM folders WHERE path_hash = UNHEX(MD5(%s)) AND path = %s"
+                "  UNION ALL"
+                "  SELECT f.id_folder FROM sous_arbre s JOIN folders f ON f.parent_id = s.id_folder"
+                ") "
+                "SELECT f.id_folder FROM sous_arbre s JOIN folders f ON f.id_folder = s.id_folder "
+                "WHERE f.is_deleted = 0 ORDER BY f.id_folder",
+                (chemin_racine, chemin_racine),
+            )
+            ids_racine = [int(str(row[0])) for row in curseur.fetchall()]
+
+            for debut in range(0, len(ids_racine), TAILLE_LOT_PREVISIONS):
+                lot = ids_racine[debut:debut + TAILLE_LOT_PREVISIONS]
+                matrice = _charger_matrice(curseur, lot, ids_scans)
+                pentes, nb_points = ajuster_tendances(jours, matrice)
+                saturations = jours_avant_saturation(pentes, libre_kb)
+
+                valeurs = [
+                    (id_folder, dernier_scan, float(pente), saturation, int(points))
+                    for id_folder, pente, saturation, points in zip(
+                        lot, pentes.tolist(), saturations, nb_points.tolist()
+                    )
+                    if not np.isnan(pente)
+                ]
+                if valeurs:
+                    curseur.executemany(
+                        "INSERT INTO folder_forecasts "
+                        "(id_folder, id_scan, growth_kb_day, days_to_full, nb_points) "
+                        "VALUES (%s, %s, %s, %s, %s) "
+                        "ON DUPLICATE KEY UPDATE id_scan = VALUES(id_scan), "
+                        "growth_kb_day = VALUES(growth_kb_day), "
+                        "days_to_full = VALUES(days_to_full), nb_points = VALUES(nb_points)",
+                        valeurs,
+                    )
+                    connexion_mysql.commit()
+                    total += len(valeurs)
+
+        connexion_mysql.commit()
+        curseur.close()
+        logger.info("Prévisions de croissance : %d dossier(s) mis à jour", total)
+        return total
+
+    except mysql.connector.Error as err:
+        envoyer_notif_teams(f"Erreur lors du calcul des prévisions : {err}")
+        return total
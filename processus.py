@@ -0,0 +1,315 @@
+"""
+Module de supervision multi-processus.
+En mode PROCESSUS_SEPARES=1, l'Intranet et chaque scan tournent dans des
+processus enfants (un interpréteur et un GIL chacun) ; le processus principal
+ne garde que l'ordonnanceur, relance les enfants qui plantent et relaie leurs
+statuts via une file multiprocessing.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Délai entre deux vérifications des processus enfants (secondes)
+INTERVALLE_SURVEILLANCE = 5
+
+# Attente maximale d'un statut entre deux tours de la boucle de supervision
+# (secondes) : délai de prise en compte d'une demande d'arrêt
+ATTENTE_STATUTS = 1
+
+# Délai avant redémarrage d'un enfant planté, doublé à chaque plantage
+# rapproché et plafonné
+DELAI_REDEMARRAGE_MIN = 5
+DELAI_REDEMARRAGE_MAX = 300
+
+# Un enfant resté en vie plus longtemps que ceci est considéré stable :
+# son délai de redémarrage repart du minimum
+DUREE_STABLE = 600
+
+# Processus enfants déclarés : nom -> dict(cible, args, ponctuel, max_redemarrages,
+# a_l_arret, process, demarre_le, redemarrages, delai, relance_prevue)
+_PROCESSUS: dict[str, dict] = {}
+_verrou_processus = threading.RLock()
+
+# Dernier statut connu de chaque processus (scanner, intranet) et de chaque
+# enfant vu par le superviseur (superviseur/<nom>)
+_STATUTS: dict[str, dict] = {}
+_verrou_statuts = threading.Lock()
+
+# File vers laquelle ce processus publie ses statuts (None hors mode séparé)
+_file_publication: Any = None
+
+# Files de l'enfant intranet : le superviseur y relaie tous les statuts
+_files_abonnes: list[Any] = []
+
+
+def processus_separes_actifs() -> bool:
+    """Indique si le mode multi-processus est demandé (PROCESSUS_SEPARES=1)."""
+    return os.getenv("PROCESSUS_SEPARES", "0") == "1"
+
+
+def _enregistrer_statut(message: dict) -> None:
+    """Mémorise le dernier statut d'un processus."""
+    with _verrou_statuts:
+        _STATUTS[message["processus"]] = message
+
+
+def _diffuser(message: dict) -> None:
+    """Mémorise un statut et en envoie une copie aux abonnés (l'Intranet)."""
+    _enregistrer_statut(message)
+    for file_abonne in _files_abonnes:
+        try:
+            file_abonne.put_nowait(message)
+        except (queue.Full, OSError, ValueError):
+            pass
+
+
+def publier_statut(nom: str, **etat: Any) -> None:
+    """
+    Publie le statut d'un processus (ex : publier_statut("scanner", etat="en_cours")).
+    Dans un enfant, le message part vers le superviseur ; sinon il est
+    directement visible par get_statuts() dans le processus courant.
+    """
+    message = {"processus": nom, "horodatage": datetime.now().isoformat(timespec="seconds"), **etat}
+    if _file_publication is not None:
+        try:
+            _file_publication.put_nowait(message)
+        except (queue.Full, OSError, ValueError):
+            logger.warning("Statut non publié (file indisponible) : %s", message)
+        return
+    _diffuser(message)
+
+
+def get_statuts() -> dict[str, dict]:
+    """Retourne une copie du dernier statut connu de chaque processus."""
+    with _verrou_statuts:
+        return {nom: dict(statut) for nom, statut in _STATUTS.items()}
+
+
+def initialiser_enfant(file_publication: Any, file_reception: Any = None,
+                       a_reception: Callable[[dict], None] | None = None) -> None:
+    """
+    À appeler au début d'un processus enfant : branche publier_statut sur la
+    file du superviseur et, si file_reception est fournie, lit en tâche de fond
+    les statuts relayés (a_reception est appelé pour chacun).
+    """
+    global _file_publication
+    _file_publication = file_publication
+    if file_reception is None:
+        return
+
+    def _lire():
+        while True:
+            try:
+                message = file_reception.get()
+            except (EOFError, OSError):
+                return
+            _enregistrer_statut(message)
+            if a_reception:
+                try:
+                    a_reception(message)
+                except Exception:
+                    logger.exception("Erreur lors du traitement d'un statut relayé")
+
+    threading.Thread(target=_lire, daemon=True, name="statuts").start()
+
+
+def declarer_processus(
+    nom: str,
+    cible: Callable,
+    args: tuple = (),
+    ponctuel: bool = False,
+    max_redemarrages: int | None = None,
+    a_l_arret: Callable[[int | None], None] | None = None,
+) -> None:
+    """
+    Déclare un processus enfant à superviser. `cible` doit être une fonction
+    de module (importable par le processus enfant sous Windows).
+    ponctuel=True : l'enfant est retiré s'il se termine normalement (code 0)
+    et n'est relancé qu'en cas de plantage.
+    max_redemarrages : nombre de relances au-delà duquel l'enfant est abandonné.
+    a_l_arret : appelé (avec le code de sortie) dans ce processus quand
+    l'enfant s'arrête anormalement, avant sa relance ou son abandon.
+    """
+    with _verrou_processus:
+        _PROCESSUS[nom] = {
+            "cible": cible,
+            "args": args,
+            "ponctuel": ponctuel,
+            "max_redemarrages": max_redemarrages,
+            "a_l_arret": a_l_arret,
+            "process": None,
+            "demarre_le": 0.0,
+            "redemarrages": 0,
+            "delai": DELAI_REDEMARRAGE_MIN,
+            "relance_prevue": None,
+        }
+
+
+def demarrer_processus(nom: str) -> None:
+    """Démarre (ou redémarre) le processus enfant déclaré sous ce nom."""
+    with _verrou_processus:
+        info = _PROCESSUS[nom]
+        process = multiprocessing.Process(target=info["cible"], args=info["args"], name=nom, daemon=True)
+        process.start()
+        info["process"] = process
+        info["demarre_le"] = time.monotonic()
+        info["relance_prevue"] = None
+        publier_statut(f"superviseur/{nom}", etat="demarre", pid=process.pid,
+                       redemarrages=info["redemarrages"])
+
+
+def surveiller_processus() -> None:
+    """
+    Vérifie chaque enfant : un enfant arrêté est relancé après un délai qui
+    double à chaque plantage rapproché (DELAI_REDEMARRAGE_MIN → MAX).
+    Un enfant ponctuel terminé normalement (code 0), ou qui a épuisé
+    max_redemarrages, est retiré.
+    """
+    with _verrou_processus:
+        maintenant = time.monotonic()
+        for nom, info in list(_PROCESSUS.items()):
+            process = info["process"]
+            if process is None or process.is_alive():
+                continue
+
+            if info["relance_prevue"] is None:
+                code = process.exitcode
+                if info["ponctuel"] and code == 0:
+                    del _PROCESSUS[nom]
+                    continue
+                if info["a_l_arret"]:
+                    try:
+                        info["a_l_arret"](code)
+                    except Exception:
+                        logger.exception("Erreur après l'arrêt du processus '%s'", nom)
+                if (
+                    info["max_redemarrages"] is not None
+                    and info["redemarrages"] >= info["max_redemarrages"]
+                ):
+                    logger.error("Processus '%s' abandonné après %d relance(s)", nom, info["redemarrages"])
+                    publier_statut(f"superviseur/{nom}", etat="abandonne", code=code)
+                    del _PROCESSUS[nom]
+                    continue
+                if maintenant - info["demarre_le"] > DUREE_STABLE:
+                    info["delai"] = DELAI_REDEMARRAGE_MIN
+                info["relance_prevue"] = maintenant + info["delai"]
+                logger.error("Processus '%s' arrêté (code %s), relance dans %ss", nom, code, info["delai"])
+                publier_statut(f"superviseur/{nom}", etat="arrete", code=code,
+                               relance_dans=info["delai"])
+                info["delai"] = min(info["delai"] * 2, DELAI_REDEMARRAGE_MAX)
+            elif maintenant >= info["relance_prevue"]:
+                info["redemarrages"] += 1
+                demarrer_processus(nom)
+
+
+def relayer_statuts(file_reception: Any, attente: float = 0) -> None:
+    """
+    Vide la file des statuts publiés par les enfants : les mémorise et les
+    relaie aux abonnés (l'Intranet). Avec `attente`, patiente jusqu'à
+    `attente` secondes qu'un premier statut arrive.
+    """
+    while True:
+        try:
+            if attente > 0:
+                message = file_reception.get(timeout=attente)
+                attente = 0
+            else:
+                message = file_reception.get_nowait()
+        except (queue.Empty, OSError, EOFError):
+            return
+        _diffuser(message)
+
+
+def abonner(file_abonne: Any) -> None:
+    """Ajoute une file qui recevra une copie de tous les statuts relayés."""
+    _files_abonnes.append(file_abonne)
+
+
+def boucle_supervision(file_reception: Any, arret: threading.Event) -> None:
+    """
+    Boucle du superviseur (thread du processus principal) : relaie les
+    statuts dès leur arrivée (la progression du scan n'attend pas le tour
+    suivant) et vérifie les enfants toutes les INTERVALLE_SURVEILLANCE secondes.
+    """
+    prochaine_verification = 0.0
+    while not arret.is_set():
+        if time.monotonic() >= prochaine_verification:
+            relayer_statuts(file_reception)
+            surveiller_processus()
+            prochaine_verification = time.monotonic() + INTERVALLE_SURVEILLANCE
+        # Attente bornée à ATTENTE_STATUTS pour réagir vite à l'arrêt
+        attente = min(prochaine_verification - time.monotonic(), ATTENTE_STATUTS)
+        relayer_statuts(file_reception, attente=max(attente, 0.0))
+    arreter_processus()
+
+
+def processus_actif(nom: str) -> bool:
+    """Indique si un processus enfant de ce nom tourne (ou va être relancé)."""
+    with _verrou_processus:
+        info = _PROCESSUS.get(nom)
+        return info is not None and (
+            info["relance_prevue"] is not None
+            or (info["process"] is not None and info["process"].is_alive())
+        )
+
+
+def executer_scan_enfant(file_publication: Any, plugins_actifs: list[str] | None = None) -> None:
+    """
+    Point d'entrée du processus enfant de scan. plugins_actifs : plugins
+    actifs du processus principal, seuls chargés ici (leurs on_directory et
+    on_scan_complete sont appelés par ce processus).
+    """
+    initialiser_enfant(file_publication)
+    from notifications import arreter_file_notifications, demarrer_file_notifications
+    from plugin_loader import charger_plugins, publier_executions_hooks
+    from scanner import scanner
+
+    if getattr(sys, "frozen", False):
+        charger_plugins(os.path.dirname(sys.executable), plugins_actifs or [])
+    else:
+        charger_plugins(os.path.dirname(os.path.abspath(__file__)), plugins_actifs or [])
+    # Le fichier d'attente reste repris par le processus principal
+    demarrer_file_notifications("notifications/scanner", reprendre_attente=False)
+    try:
+        scanner()
+    finally:
+        publier_executions_hooks()
+        arreter_file_notifications()
+
+
+def _a_reception_intranet(message: dict) -> None:
+    """Dans l'enfant intranet : vide le cache des réponses à la fin d'un scan, réussi ou non."""
+    if message.get("processus") == "scanner" and message.get("etat") in ("termine", "echec"):
+        from intranet.queries import invalider_cache
+
+        invalider_cache()
+
+
+def executer_intranet_enfant(port: int, file_publication: Any, file_reception: Any) -> None:
+    """Point d'entrée du processus enfant de l'Intranet (bloquant)."""
+    initialiser_enfant(file_publication, file_reception, _a_reception_intranet)
+    from intranet.app import creer_app, servir_intranet
+
+    publier_statut("intranet", etat="en_ligne", port=port, pid=os.getpid())
+    servir_intranet(creer_app(), port)
+
+
+def arreter_processus() -> None:
+    """Arrête proprement tous les processus enfants."""
+    with _verrou_processus:
+        for info in _PROCESSUS.values():
+            process = info["process"]
+            if process is not None and process.is_alive():
+                process.terminate()
+                process.join(timeout=10)
+        _PROCESSUS.clear()
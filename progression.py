@@ -0,0 +1,109 @@
+"""
+Module de suivi de la progression du scan en cours.
+Les compteurs sont de simples entiers incrémentés depuis les boucles du scan
+(aucun verrou, aucune E/S) ; un thread les publie une fois par seconde via
+publier_statut("progression", ...), lu par /api/scan-progress.
+"""
+
+import threading
+import time
+
+from processus import publier_statut
+
+# Intervalle de publication de la progression (secondes)
+INTERVALLE_PUBLICATION = 1.0
+
+# Compteurs du scan en cours, écrits uniquement par le thread du scan et lus
+# par le thread de publication (lecture sans verrou, valeurs éventuellement
+# décalées d'une itération : acceptable pour un affichage)
+_COMPTEURS: dict = {}
+
+_arret_publication = threading.Event()
+
+
+def _reinitialiser(id_scan: int | None) -> None:
+    """Remet les compteurs à zéro pour un nouveau scan."""
+    _COMPTEURS.clear()
+    _COMPTEURS.update(
+        {
+            "id_scan": id_scan,
+            "racine": None,
+            "phase": "demarrage",
+            "debut": time.monotonic(),
+            "debut_phase": time.monotonic(),
+            "dossiers": 0,
+            "fichiers": 0,
+            "octets": 0,
+            "dossiers_phase": 0,
+            "file_attente": 0,
+        }
+    )
+
+
+def definir_phase(phase: str, racine: str | None = None) -> None:
+    """Change la phase courante (et la racine si fournie) ; le débit repart de zéro."""
+    if not _COMPTEURS:
+        return
+    if racine is not None:
+        _COMPTEURS["racine"] = racine
+    _COMPTEURS["phase"] = phase
+    _COMPTEURS["debut_phase"] = time.monotonic()
+    _COMPTEURS["dossiers_phase"] = 0
+    _COMPTEURS["file_attente"] = 0
+
+
+def compter(dossiers: int = 0, fichiers: int = 0, octets: int = 0) -> None:
+    """Incrémente les compteurs (appelé depuis les boucles chaudes du scan)."""
+    if not _COMPTEURS:
+        return
+    _COMPTEURS["dossiers"] += dossiers
+    _COMPTEURS["dossiers_phase"] += dossiers
+    _COMPTEURS["fichiers"] += fichiers
+    _COMPTEURS["octets"] += octets
+
+
+def definir_file_attente(taille: int) -> None:
+    """Nombre de dossiers encore en attente de traitement dans la phase courante."""
+    if _COMPTEURS:
+        _COMPTEURS["file_attente"] = taille
+
+
+def instantane() -> dict:
+    """Retourne l'état de la progression, débits calculés à la lecture."""
+    if not _COMPTEURS:
+        return {}
+    maintenant = time.monotonic()
+    duree = max(maintenant - _COMPTEURS["debut"], 1e-6)
+    duree_phase = max(maintenant - _COMPTEURS["debut_phase"], 1e-6)
+    return {
+        "id_scan": _COMPTEURS["id_scan"],
+        "racine": _COMPTEURS["racine"],
+        "phase": _COMPTEURS["phase"],
+        "duree_sec": round(duree),
+        "dossiers": _COMPTEURS["dossiers"],
+        "fichiers": _COMPTEURS["fichiers"],
+        "octets": _COMPTEURS["octets"],
+        "dossiers_par_sec": round(_COMPTEURS["dossiers_phase"] / duree_phase, 1),
+        "fichiers_par_sec": round(_COMPTEURS["fichiers"] / duree, 1),
+        "file_attente": _COMPTEURS["file_attente"],
+    }
+
+
+def _publier_en_boucle() -> None:
+    """Thread de publication : envoie l'instantané tant que le scan tourne."""
+    while not _arret_publication.wait(INTERVALLE_PUBLICATION):
+        publier_statut("progression", etat="en_cours", **instantane())
+
+
+def demarrer_suivi(id_scan: int) -> None:
+    """Démarre le suivi d'un scan et sa publication périodique."""
+    _reinitialiser(id_scan)
+    _arret_publication.clear()
+    threading.Thread(target=_publier_en_boucle, daemon=True, name="progression").start()
+
+
+def terminer_suivi(etat: str) -> None:
+    """Arrête la publication et publie l'état final (termine / echec)."""
+    _arret_publication.set()
+    publier_statut("progression", **{**instantane(), "etat": etat, "phase": "fin"})
+    _COMPTEURS.clear()
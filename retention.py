@@ -0,0 +1,189 @@
+"""
+Module de rétention de l'historique des tailles.
+Sous-échantillonne les anciennes lignes de la table sizes par paliers
+(ex : tous les scans sur 30 jours, une semaine sur un an, puis un mois).
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import cast
+
+import mysql.connector
+
+from notifications import envoyer_notif_teams
+
+logger = logging.getLogger(__name__)
+
+# Rang de chaque granularité : plus il est élevé, plus le palier est grossier
+RANGS_GRANULARITE = {"semaine": 1, "mois": 2}
+
+# Nombre de lignes supprimées par transaction (évite les verrous longs)
+TAILLE_LOT_RETENTION = 5000
+
+
+def parser_paliers_retention() -> list[tuple[int, str]]:
+    """
+    Parse la variable d'environnement RETENTION_PALIERS.
+    Format attendu : age_jours=granularite,age_jours=granularite
+    (ex : 30=semaine,365=mois). Granularités acceptées : semaine, mois.
+    Retourne la liste [(age_jours, granularite)] triée par âge croissant,
+    vide si la rétention est désactivée.
+    """
+    paliers: list[tuple[int, str]] = []
+    valeur = os.getenv("RETENTION_PALIERS", "")
+    if not valeur.strip():
+        return paliers
+
+    for paire in valeur.split(","):
+        paire = paire.strip()
+        if "=" not in paire:
+            continue
+        age_str, granularite = paire.split("=", 1)
+        granularite = granularite.strip().lower()
+        if granularite not in RANGS_GRANULARITE:
+            continue
+        try:
+            age = int(age_str.strip())
+        except ValueError:
+            continue
+        if age > 0:
+            paliers.append((age, granularite))
+    return sorted(paliers)
+
+
+def periode_du_scan(date_scan: datetime, granularite: str) -> tuple[datetime, datetime]:
+    """
+    Retourne les bornes [début, fin) de la période (semaine ISO ou mois civil)
+    contenant date_scan.
+    """
+    jour = date_scan.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularite == "semaine":
+        debut = jour - timedelta(days=jour.weekday())
+        return debut, debut + timedelta(days=7)
+    debut = jour.replace(day=1)
+    if debut.month == 12:
+        return debut, debut.replace(year=debut.year + 1, month=1)
+    return debut, debut.replace(month=debut.month + 1)
+
+
+def _compacter_periode(
+    connexion_mysql: mysql.connector.MySQLConnection, ids_scans: list[int]
+) -> int:
+    """
+    Ne garde, pour chaque dossier, que sa ligne la plus récente parmi les scans
+    d'une même période. Comme sizes ne stocke que les changements, la taille
+    « au plus tard à la fin de la période » reste exacte pour tous les scans suivants ;
+    celle des autres scans de la période devient approximative (db.scans_approximatifs).
+    Retourne le nombre de lignes supprimées.
+    """
+    curseur = connexion_mysql.cursor()
+    supprimees = 0
+    for i, id_scan in enumerate(ids_scans[:-1]):
+        suivants = ids_scans[i + 1:]
+        placeholders = ",".join(["%s"] * len(suivants))
+        # Lignes de ce scan remplacées par une ligne plus récente de la même période
+        curseur.execute(
+            f"SELECT s.id_folder FROM sizes s "
+            f"WHERE s.id_scan = %s AND EXISTS ("
+            f"  SELECT 1 FROM sizes s2 "
+            f"  WHERE s2.id_folder = s.id_folder AND s2.id_scan IN ({placeholders})"
+            f")",
+            (id_scan, *suivants),
+        )
+        ids_dossiers = [int(str(row[0])) for row in curseur.fetchall()]
+
+        for debut in range(0, len(ids_dossiers), TAILLE_LOT_RETENTION):
+            lot = ids_dossiers[debut:debut + TAILLE_LOT_RETENTION]
+            placeholders_lot = ",".join(["%s"] * len(lot))
+            curseur.execute(
+                f"DELETE FROM sizes WHERE id_scan = %s AND id_folder IN ({placeholders_lot})",
+                (id_scan, *lot),
+            )
+            connexion_mysql.commit()
+            supprimees += len(lot)
+    curseur.close()
+    return supprimees
+
+
+def compacter_historique_tailles(
+    connexion_mysql: mysql.connector.MySQLConnection,
+) -> int:
+    """
+    Applique les paliers de RETENTION_PALIERS à la table sizes.
+    Seules les périodes entièrement plus anciennes que l'âge du palier sont
+    traitées ; chaque scan compacté est marqué dans scans.retention pour ne pas
+    être relu aux exécutions suivantes, et chaque période est journalisée
+    dans size_compactions.
+    Retourne le nombre total de lignes supprimées.
+    """
+    paliers = parser_paliers_retention()
+    if not paliers:
+        return 0
+
+    maintenant = datetime.now()
+    total_supprimees = 0
+    try:
+        curseur = connexion_mysql.cursor()
+        curseur.execute(
+            "SELECT id_scan, date_, retention FROM scans "
+            "WHERE status = 'completed' AND date_ < %s ORDER BY id_scan",
+            (maintenant - timedelta(days=paliers[0][0]),),
+        )
+        scans = [
+            (int(str(row[0])), cast(datetime, row[1]), str(row[2]) if row[2] else None)
+            for row in curseur.fetchall()
+        ]
+        retention_appliquee = {id_scan: retention for id_scan, _, retention in scans}
+
+        # Du palier le plus grossier au plus fin : un scan déjà compacté au mois
+        # n'est plus repris par le palier hebdomadaire
+        for age, granularite in sorted(paliers, reverse=True):
+            limite = maintenant - timedelta(days=age)
+            rang = RANGS_GRANULARITE[granularite]
+            periodes: dict[datetime, list[int]] = {}
+            for id_scan, date_scan, _ in scans:
+                deja = retention_appliquee.get(id_scan)
+                if deja and RANGS_GRANULARITE.get(deja, 0) >= rang:
+                    continue
+                debut, fin = periode_du_scan(date_scan, granularite)
+                # Période pas encore entièrement échue : elle peut encore évoluer
+                if fin > limite:
+                    continue
+                periodes.setdefault(debut, []).append(id_scan)
+
+            for debut, ids_scans in sorted(periodes.items()):
+                supprimees = _compacter_periode(connexion_mysql, ids_scans)
+                placeholders = ",".join(["%s"] * len(ids_scans))
+                curseur.execute(
+                    f"UPDATE scans SET retention = %s WHERE id_scan IN ({placeholders})",
+                    (granularite, *ids_scans),
+                )
+                curseur.execute(
+                    "INSERT INTO size_compactions "
+                    "(date_, granularity, period_start, first_scan, last_scan, nb_scans, rows_deleted) "
+                    "VALUES (NOW(), %s, %s, %s, %s, %s, %s)",
+                    (
+                        granularite,
+                        debut.date(),
+                        ids_scans[0],
+                        ids_scans[-1],
+                        len(ids_scans),
+                        supprimees,
+                    ),
+                )
+                connexion_mysql.commit()
+                for id_scan in ids_scans:
+                    retention_appliquee[id_scan] = granularite
+                total_supprimees += supprimees
+
+        curseur.close()
+        logger.info(
+            "Rétention de l'historique : %d ligne(s) supprimée(s) dans sizes",
+            total_supprimees,
+        )
+        return total_supprimees
+
+    except mysql.connector.Error as err:
+        envoyer_notif_teams(f"Erreur lors de la compaction de l'historique : {err}")
+        return total_supprimees
@@ -4,26 +4,96 @@ Orchestre le processus de scan : connexion BDD, parcours des dossiers,
 mise à jour des données et envoi de notifications.
 """
 
+import logging
 import os
 import time
-from datetime import datetime
+from types import MappingProxyType
 
 from db import (
     connecter_base_de_donnees,
     creer_scan,
     deconnecter_base_de_donnees,
     detecter_dossiers_supprimes,
+    enregistrer_point_de_controle,
+    enregistrer_resume_scan,
     enregistrer_totaux_scan,
+    mettre_a_jour_stats_tableau_de_bord,
     reset_statut_nouveaux_dossiers_racines,
     terminer_scan,
     traiter_dossiers_en_lot,
     marquer_dossiers_comme_racines,
 )
 from fichiers import filtrer_dossiers_redondants, scanner_arborescence
+from intranet.queries import invalider_cache
+from message_scan import construire_messages_scan
+from mesures_sql import get_agregats, get_requetes_lentes
 from notifications import envoyer_notif_teams
+from plugin_loader import (
+    enregistrer_visites,
+    executer_hooks_fin_de_scan,
+    hooks_fin_de_scan,
+    preparer_visiteurs,
+)
+from previsions import calculer_previsions
+from processus import publier_statut
+from progression import definir_phase, demarrer_suivi, terminer_suivi
+from retention import compacter_historique_tailles
 
 SCAN_EN_COURS_ID: int | None = None
 
+logger = logging.getLogger(__name__)
+
+
+def executer_maintenance_apres_scan(connexion_mysql) -> None:
+    """
+    Étapes de maintenance qui suivent un scan complété : rétention de
+    l'historique (RETENTION_PALIERS) puis prévisions de croissance
+    (PREVISION_FENETRE_JOURS). Une erreur est signalée sans remettre en cause
+    le scan, déjà marqué 'completed'.
+    """
+    etapes = (
+        ("la rétention de l'historique", compacter_historique_tailles),
+        ("le calcul des prévisions", calculer_previsions),
+    )
+    for description, etape in etapes:
+        try:
+            etape(connexion_mysql)
+        except Exception as e:
+            logger.exception("Erreur durant %s après le scan", description)
+            envoyer_notif_teams(f"⚠️ Erreur durant {description} après le scan : {e}")
+
+
+def construire_contexte_fin_de_scan(
+    id_scan: int,
+    arbres: dict[str, dict[str, int]],
+    nouveaux_dossiers: list[dict],
+    dossiers_modifies: list[dict],
+    dossiers_supprimes: list[dict],
+    total_changement_ko: int,
+) -> MappingProxyType:
+    """
+    Contexte transmis à on_scan_complete : vues en lecture seule
+    (MappingProxyType) sur les dictionnaires du scan, sans copie des données.
+      - id_scan, total_changement_ko
+      - arbres : {chemin_racine: {chemin_dossier: taille_en_octets}}, un
+        parent précédant ses enfants
+      - nouveaux, modifies, supprimes : tuples des changements détectés
+        (non filtrés), chacun en lecture seule
+    """
+    def figer(dossiers: list[dict]) -> tuple:
+        return tuple(MappingProxyType(dossier) for dossier in dossiers)
+
+    return MappingProxyType({
+        "id_scan": id_scan,
+        "arbres": MappingProxyType(
+            {racine: MappingProxyType(arbre) for racine, arbre in arbres.items()}
+        ),
+        "nouveaux": figer(nouveaux_dossiers),
+        "modifies": figer(dossiers_modifies),
+        "supprimes": figer(dossiers_supprimes),
+        "total_changement_ko": total_changement_ko,
+    })
+
 
 def scanner() -> None:
     """
@@ -41,6 +111,8 @@ def scanner() -> None:
         if not id_scan:
             return
         SCAN_EN_COURS_ID = id_scan
+        publier_statut("scanner", etat="en_cours", id_scan=id_scan)
+        demarrer_suivi(id_scan)
 
         # Parse les chemins racines séparés par des virgules
         chemins_racines = os.getenv("CHEMINS_RACINES", "").split(",")
@@ -60,19 +132,33 @@ def scanner() -> None:
         total_changement_taille = 0
         total_dossiers_scannes = 0
         taille_totale_racines_ko = 0
+        # Plus fortes variations de taille du scan, signalées ou non (top_movers)
+        mouvements: list = []
+
+        # Arborescences conservées pour les plugins définissant on_scan_complete
+        # (sinon chacune est libérée dès la racine suivante)
+        hooks = hooks_fin_de_scan()
+        arbres: dict[str, dict[str, int]] = {}
+        # Plugins recevant chaque dossier pendant le parcours (on_directory)
+        visiteurs = preparer_visiteurs()
 
         for chemin_racine in chemins_racines:
             chemin_racine = chemin_racine.strip()
             if not chemin_racine:
                 continue
-            dossiers_avec_tailles = scanner_arborescence(chemin_racine, chemins_exclus)
+            dossiers_avec_tailles = scanner_arborescence(
+                chemin_racine, chemins_exclus, visiteurs
+            )
+            if hooks:
+                arbres[chemin_racine] = dossiers_avec_tailles
+            definir_phase("base")
             (
                 nouveaux,
                 modifies,
                 taille_scan,
                 changement_racine,
             ) = traiter_dossiers_en_lot(
-                connexion_mysql, dossiers_avec_tailles, chemin_racine, id_scan
+                connexion_mysql, dossiers_avec_tailles, chemin_racine, id_scan, mouvements
             )
             nouveaux_dossiers.extend(nouveaux)
             dossiers_modifies.extend(modifies)
@@ -91,6 +177,15 @@ def scanner() -> None:
             )
             dossiers_supprimes.extend(supprimes)
 
+        # Temps passé dans les visiteurs des plugins, rapporté à la durée du scan
+        if visiteurs:
+            plugins_lents = enregistrer_visites(visiteurs, time.time() - debut_scan)
+            if plugins_lents:
+                envoyer_notif_teams(
+                    "🐢 **Plugins ralentissant le scan** : "
+                    + ", ".join(f"{nom} ({part:.0f} % du scan)" for nom, part in plugins_lents)
+                )
+
         # Enregistrer les totaux corrects dans la table scans
         enregistrer_totaux_scan(
             connexion_mysql, id_scan, total_dossiers_scannes, taille_totale_racines_ko
@@ -99,6 +194,31 @@ def scanner() -> None:
         # Assurer que les dossiers racines sont bien marqués dans la BDD
         marquer_dossiers_comme_racines(connexion_mysql, chemins_racines)
 
+        # Résumé et événements du scan, écrits avant filtrer_dossiers_redondants :
+        # événements des dossiers signalés, plus fortes variations de toutes
+        # celles du scan (mouvements)
+        enregistrer_resume_scan(
+            connexion_mysql,
+            id_scan,
+            nouveaux_dossiers,
+            dossiers_modifies,
+            dossiers_supprimes,
+            total_changement_taille,
+            mouvements,
+        )
+
+        # Vue en lecture seule des résultats complets pour les plugins
+        contexte = None
+        if hooks:
+            contexte = construire_contexte_fin_de_scan(
+                id_scan,
+                arbres,
+                nouveaux_dossiers,
+                dossiers_modifies,
+                dossiers_supprimes,
+                total_changement_taille,
+            )
+
         # Filtre les dossiers parents redondants pour la notification
         nouveaux_dossiers = filtrer_dossiers_redondants(nouveaux_dossiers)
         dossiers_modifies = filtrer_dossiers_redondants(dossiers_modifies)
@@ -107,77 +227,52 @@ def scanner() -> None:
         # Convertir les totaux de Ko en Mo pour l'affichage dans la notification
         total_changement_mo = round(total_changement_taille / 1024)
 
-        # Construction du message pour la notification Teams
-        signe = "+" if total_changement_mo > 0 else ""
-        message = "✅ **Scan terminé avec succès**"
-
-        # Calcul de la durée du scan
-        duree_scan = time.time() - debut_scan
-        heures = int(duree_scan // 3600)
-        minutes = int((duree_scan % 3600) // 60)
-        secondes = int(duree_scan % 60)
-        if heures > 0:
-            duree_formatee = f"{heures}h {minutes}min {secondes}s"
-        elif minutes > 0:
-            duree_formatee = f"{minutes}min {secondes}s"
-        else:
-            duree_formatee = f"{secondes}s"
-
-        message += f"\n<br>📅 {datetime.now().strftime('%d/%m/%Y à %H:%M')} ⏱️ Durée du scan : {duree_formatee}"
-        message += f"\n<br>📊 **Résumé** : {len(nouveaux_dossiers) + len(dossiers_modifies) + len(dossiers_supprimes)} changements détectés (Total {signe}{total_changement_mo} Mo) \n"
-
-        # Seuil pour la mise en évidence par poids (5 * SEUIL_DEFAUT)
-        seuil_poids = int(os.getenv("SEUIL_DEFAUT", 100)) * 5
-
-        if len(nouveaux_dossiers) > 0:
-            message += "\n<br>🆕 **Nouveaux dossiers**:\n```"
-            for dossier in nouveaux_dossiers:
-                marqueur = "⚠️ " if dossier["taille"] > seuil_poids else "➖ "
-                dossier["chemin"] = dossier["chemin"].replace("\\", " > ")
-                message += (
-                    f"\n{marqueur}(+ {dossier['taille']:>6} Mo)   {dossier['chemin']}"
-                )
-            message += "\n```"
-
-        if len(dossiers_modifies) > 0:
-            message += "\n<br>📝 **Dossiers modifiés**:\n```"
-            for dossier in dossiers_modifies:
-                diff = dossier["difference"]
-                signe_mod = "+" if diff > 0 else "-"
-                abs_diff = abs(diff)
-                marqueur = "⚠️ " if abs_diff > seuil_poids else "➖ "
-                dossier["chemin"] = dossier["chemin"].replace("\\", " > ")
-                message += (
-                    f"\n{marqueur}({signe_mod} {abs_diff:>6} Mo)   {dossier['chemin']}"
-                )
-            message += "\n```"
-
-        if len(dossiers_supprimes) > 0:
-            # Filtre par seuil : ne notifier que les suppressions significatives
-            supprimes_notifies = [
-                d for d in dossiers_supprimes if d["taille"] > seuil_poids // 5
-            ]
-            if supprimes_notifies:
-                message += "\n<br>🗑️ **Dossiers supprimés**:\n```"
-                for dossier in supprimes_notifies:
-                    marqueur = "⚠️ " if dossier["taille"] > seuil_poids else "➖ "
-                    dossier["chemin"] = dossier["chemin"].replace("\\", " > ")
-                    message += (
-                        f"\n{marqueur}(- {dossier['taille']:>6} Mo)   {dossier['chemin']}"
-                    )
-                message += "\n```"
-
-        if len(nouveaux_dossiers) == 0 and len(dossiers_modifies) == 0 and len(dossiers_supprimes) == 0:
-            message += "\n\nAucun dossier modifié ou nouveau"
+        # Notification Teams : sections plafonnées et découpées sous la
+        # taille maximale acceptée par le webhook
+        messages = construire_messages_scan(
+            id_scan,
+            time.time() - debut_scan,
+            nouveaux_dossiers,
+            dossiers_modifies,
+            dossiers_supprimes,
+            total_changement_mo,
+        )
 
         terminer_scan(connexion_mysql, id_scan, "completed")
-        envoyer_notif_teams(message)
+        mettre_a_jour_stats_tableau_de_bord(connexion_mysql, id_scan)
+        enregistrer_point_de_controle(connexion_mysql, id_scan)
+        for message in messages:
+            envoyer_notif_teams(message)
+
+        # Sous-échantillonnage de l'historique ancien et tendances de
+        # croissance : leurs erreurs ne font pas échouer le scan terminé
+        executer_maintenance_apres_scan(connexion_mysql)
+
+        # Les réponses de l'Intranet mises en cache datent du scan précédent
+        # (en mode supervision, l'Intranet vide son cache à réception du statut)
+        invalider_cache()
+        terminer_suivi("termine")
+        publier_statut("scanner", etat="termine", id_scan=id_scan)
+        # Requêtes les plus coûteuses du scan, affichées par l'Intranet
+        # quand le scan tourne dans un processus séparé
+        publier_statut(
+            "requetes_sql", id_scan=id_scan, lentes=get_requetes_lentes(), agregats=get_agregats(20)
+        )
+
+        # Plugins réutilisant l'arborescence du scan (après le commit final)
+        if hooks:
+            executer_hooks_fin_de_scan(contexte, hooks)
 
     except Exception as e:
         # En cas d'erreur, marquer le scan comme "failed" et notifier
         envoyer_notif_teams(f"❌ Erreur critique durant le scan : {e}")
         if connexion_mysql and id_scan:
             terminer_scan(connexion_mysql, id_scan, "failed")
+        if id_scan:
+            terminer_suivi("echec")
+        # Le cache a pu être rempli pendant le scan (vue "en cours")
+        invalider_cache()
+        publier_statut("scanner", etat="echec", id_scan=id_scan, erreur=str(e))
 
     finally:
         SCAN_EN_COURS_ID = None
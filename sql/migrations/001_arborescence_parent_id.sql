@@ -0,0 +1,46 @@
+-- ============================================================
+-- Migration 001 — Arborescence par liste d'adjacence
+-- ============================================================
+-- Ajoute parent_id et name à folders pour que les requêtes
+-- enfants / sous-arbre / ancêtres passent par un index au lieu
+-- de LEFT(path, n) et du comptage des séparateurs.
+-- Usage : mysql -u root -p superviseur_dossiers < sql/migrations/001_arborescence_parent_id.sql
+--
+-- Les dossiers des racines encore scannées sont aussi complétés
+-- automatiquement au scan suivant ; ce script couvre en plus les
+-- dossiers supprimés et les racines archivées.
+-- ============================================================
+
+-- Séparateur des chemins stockés : '\\' (Windows) ou '/' (Docker Linux)
+SET @sep = '\\';
+
+ALTER TABLE folders
+    ADD COLUMN parent_id BIGINT       NULL     DEFAULT NULL AFTER path,
+    ADD COLUMN name      VARCHAR(255) NOT NULL DEFAULT ''   AFTER parent_id;
+
+-- ------------------------------------------------------------
+-- 1. Nom = dernier segment du chemin (chemin complet pour D:\)
+-- ------------------------------------------------------------
+UPDATE folders SET name = SUBSTRING_INDEX(path, @sep, -1);
+UPDATE folders SET name = path WHERE name = '';
+
+-- ------------------------------------------------------------
+-- 2. Parent = chemin privé de son dernier segment
+--    Deux passes pour garder la jointure sur uq_path :
+--    'D:\Data\X' → 'D:\Data', puis 'D:\Data' → 'D:\'
+-- ------------------------------------------------------------
+UPDATE folders f
+JOIN folders p
+  ON p.path = LEFT(f.path, CHAR_LENGTH(f.path) - CHAR_LENGTH(f.name) - 1)
+SET f.parent_id = p.id_folder
+WHERE f.name != f.path;
+
+UPDATE folders f
+JOIN folders p
+  ON p.path = LEFT(f.path, CHAR_LENGTH(f.path) - CHAR_LENGTH(f.name))
+SET f.parent_id = p.id_folder
+WHERE f.parent_id IS NULL
+  AND f.name != f.path
+  AND p.id_folder != f.id_folder;
+
+CREATE INDEX idx_folders_parent_name ON folders(parent_id, name);
@@ -0,0 +1,23 @@
+-- ============================================================
+-- Migration 002 — Rétention par paliers de l'historique sizes
+-- ============================================================
+-- scans.retention mémorise la granularité déjà appliquée à un scan
+-- ('semaine', 'mois') ; size_compactions journalise chaque période
+-- sous-échantillonnée et le nombre de lignes supprimées.
+-- Usage : mysql -u root -p superviseur_dossiers < sql/migrations/002_retention_historique.sql
+-- ============================================================
+
+ALTER TABLE scans
+    ADD COLUMN retention VARCHAR(10) NULL DEFAULT NULL AFTER total_size_kb;
+
+CREATE TABLE size_compactions (
+    id_compaction BIGINT      NOT NULL AUTO_INCREMENT,
+    date_         TIMESTAMP   NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    granularity   VARCHAR(10) NOT NULL,
+    period_start  DATE        NOT NULL,
+    first_scan    BIGINT      NOT NULL,
+    last_scan     BIGINT      NOT NULL,
+    nb_scans      INT         NOT NULL,
+    rows_deleted  BIGINT      NOT NULL,
+    PRIMARY KEY (id_compaction)
+);
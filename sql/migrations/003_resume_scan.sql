@@ -0,0 +1,33 @@
+-- ============================================================
+-- Migration 003 — Résumé précalculé de chaque scan
+-- ============================================================
+-- scan_summary et scan_events sont écrits par le scanner à la fin
+-- de chaque cycle ; l'Intranet les lit au lieu de recalculer les
+-- alertes à partir de sizes. Les scans antérieurs à cette migration
+-- restent affichés via l'ancien calcul.
+-- Usage : mysql -u root -p superviseur_dossiers < sql/migrations/003_resume_scan.sql
+-- ============================================================
+
+CREATE TABLE scan_summary (
+    id_scan      BIGINT   NOT NULL,
+    nb_new       INT      NOT NULL DEFAULT 0,
+    nb_modified  INT      NOT NULL DEFAULT 0,
+    nb_deleted   INT      NOT NULL DEFAULT 0,
+    variation_kb BIGINT   NOT NULL DEFAULT 0,
+    top_movers   LONGTEXT NULL     DEFAULT NULL,
+    PRIMARY KEY (id_scan),
+    FOREIGN KEY (id_scan) REFERENCES scans(id_scan)
+);
+
+CREATE TABLE scan_events (
+    id_scan        BIGINT      NOT NULL,
+    id_folder      BIGINT      NOT NULL,
+    event_type     VARCHAR(12) NOT NULL,
+    size_before_kb BIGINT      NOT NULL DEFAULT 0,
+    size_after_kb  BIGINT      NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_scan, id_folder),
+    FOREIGN KEY (id_scan)   REFERENCES scans(id_scan),
+    FOREIGN KEY (id_folder) REFERENCES folders(id_folder)
+);
+
+CREATE INDEX idx_scan_events_type ON scan_events(id_scan, event_type);
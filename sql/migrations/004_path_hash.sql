@@ -0,0 +1,23 @@
+-- ============================================================
+-- Migration 004 — Clé de chemin hachée
+-- ============================================================
+-- Remplace l'index unique sur path (VARCHAR(512) utf8mb4, jusqu'à
+-- 2 Ko par entrée) par un index sur path_hash = UNHEX(MD5(path))
+-- (16 octets) + path_collision, et passe path en TEXT pour accepter
+-- les chemins de plus de 512 caractères.
+-- Les index préfixés path(100) restent valables sur une colonne TEXT.
+-- Usage : mysql -u root -p superviseur_dossiers < sql/migrations/004_path_hash.sql
+-- ============================================================
+
+ALTER TABLE folders
+    ADD COLUMN path_hash BINARY(16) NULL AFTER path,
+    ADD COLUMN path_collision TINYINT UNSIGNED NOT NULL DEFAULT 0 AFTER path_hash;
+
+-- Les chemins étaient uniques : aucune collision possible sur les lignes existantes
+UPDATE folders SET path_hash = UNHEX(MD5(path));
+
+ALTER TABLE folders
+    MODIFY COLUMN path_hash BINARY(16) NOT NULL,
+    DROP INDEX uq_path,
+    ADD UNIQUE KEY uq_path_hash (path_hash, path_collision),
+    MODIFY COLUMN path TEXT NOT NULL;
@@ -0,0 +1,24 @@
+-- ============================================================
+-- Migration 005 — Index de recherche par trigrammes
+-- ============================================================
+-- folder_trigrams associe chaque trigramme (3 caractères consécutifs)
+-- du nom d'un dossier à son id_folder. La recherche de l'Intranet
+-- l'utilise au lieu d'un LIKE '%terme%' sur toute la table folders.
+-- Le scanner l'alimente ensuite pour chaque nouveau dossier.
+-- Requiert la migration 001 (colonne name) et le moteur Sequence de
+-- MariaDB (table virtuelle seq_1_to_255, activé par défaut).
+-- Usage : mysql -u root -p superviseur_dossiers < sql/migrations/005_index_trigrammes.sql
+-- ============================================================
+
+CREATE TABLE folder_trigrams (
+    trigram   CHAR(3) NOT NULL,
+    id_folder BIGINT  NOT NULL,
+    PRIMARY KEY (trigram, id_folder),
+    KEY idx_folder_trigrams_folder (id_folder),
+    FOREIGN KEY (id_folder) REFERENCES folders(id_folder)
+);
+
+INSERT IGNORE INTO folder_trigrams (trigram, id_folder)
+SELECT LOWER(SUBSTRING(f.name, s.seq, 3)), f.id_folder
+FROM folders f
+JOIN seq_1_to_255 s ON s.seq <= CHAR_LENGTH(f.name) - 2;
@@ -0,0 +1,39 @@
+-- ============================================================
+-- Migration 006 — Taille courante dans folders
+-- ============================================================
+-- folders.size_kb reprend la dernière taille enregistrée dans sizes et
+-- folders.delta_kb sa variation lors du dernier scan complété (0 si le
+-- dossier n'a pas changé). Le scanner les tient ensuite à jour ; les index
+-- (parent_id, size_kb) et (parent_id, delta_kb) servent à lister les
+-- enfants d'un dossier triés par taille ou par variation, page par page.
+-- Usage : mysql -u root -p superviseur_dossiers < sql/migrations/006_taille_courante.sql
+-- ============================================================
+
+ALTER TABLE folders
+    ADD COLUMN size_kb  BIGINT NOT NULL DEFAULT 0 AFTER name,
+    ADD COLUMN delta_kb BIGINT NOT NULL DEFAULT 0 AFTER size_kb;
+
+UPDATE folders f
+JOIN (
+    SELECT
+        id_folder,
+        MAX(CASE WHEN rang = 1 THEN id_scan END) AS id_scan,
+        MAX(CASE WHEN rang = 1 THEN size_kb END) AS derniere_kb,
+        MAX(CASE WHEN rang = 2 THEN size_kb END) AS precedente_kb
+    FROM (
+        SELECT id_folder, id_scan, size_kb,
+               ROW_NUMBER() OVER (PARTITION BY id_folder ORDER BY id_scan DESC) AS rang
+        FROM sizes
+    ) s
+    WHERE rang <= 2
+    GROUP BY id_folder
+) t ON t.id_folder = f.id_folder
+SET f.size_kb  = t.derniere_kb,
+    f.delta_kb = IF(
+        t.id_scan = (SELECT MAX(id_scan) FROM scans WHERE status = 'completed'),
+        t.derniere_kb - COALESCE(t.precedente_kb, 0),
+        0
+    );
+
+CREATE INDEX idx_folders_parent_size  ON folders(parent_id, size_kb);
+CREATE INDEX idx_folders_parent_delta ON folders(parent_id, delta_kb);
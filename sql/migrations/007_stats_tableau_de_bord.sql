@@ -0,0 +1,30 @@
+-- ============================================================
+-- Migration 007 — Compteurs du tableau de bord
+-- ============================================================
+-- dashboard_stats contient une seule ligne (id_stats = 1) : nombre de
+-- dossiers, nombre de scans complétés et top des variations du dernier
+-- scan. Le scanner la met à jour à la fin de chaque scan ; le tableau de
+-- bord la lit en une requête au lieu de compter folders et scans.
+-- Requiert la migration 003 (scan_summary).
+-- Usage : mysql -u root -p superviseur_dossiers < sql/migrations/007_stats_tableau_de_bord.sql
+-- ============================================================
+
+CREATE TABLE dashboard_stats (
+    id_stats      TINYINT   NOT NULL,
+    total_folders BIGINT    NOT NULL DEFAULT 0,
+    total_scans   INT       NOT NULL DEFAULT 0,
+    last_scan     BIGINT    NULL     DEFAULT NULL,
+    top_movers    LONGTEXT  NULL     DEFAULT NULL,
+    updated_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_stats)
+);
+
+-- Sans résumé pour le dernier scan, top_movers reste NULL jusqu'au
+-- prochain scan (le tableau de bord n'affiche alors pas de top)
+INSERT INTO dashboard_stats (id_stats, total_folders, total_scans, last_scan, top_movers)
+SELECT 1,
+       (SELECT COUNT(*) FROM folders),
+       (SELECT COUNT(*) FROM scans WHERE status = 'completed'),
+       d.id_scan,
+       (SELECT top_movers FROM scan_summary WHERE id_scan = d.id_scan)
+FROM (SELECT MAX(id_scan) AS id_scan FROM scans WHERE status = 'completed') d;
@@ -0,0 +1,35 @@
+-- ============================================================
+-- Migration 008 — Points de contrôle des tailles
+-- ============================================================
+-- sizes ne stockant que les changements, la taille d'un dossier à un scan X
+-- est sa dernière ligne sizes <= X. size_checkpoints copie, tous les
+-- INTERVALLE_POINTS_CONTROLE scans, la taille de chaque dossier existant :
+-- l'arbre au scan X se reconstitue depuis le dernier point de contrôle <= X
+-- et les seules lignes sizes écrites depuis.
+-- L'index (id_folder, id_scan, size_kb) remplace (id_folder) : la dernière
+-- ligne <= X d'un dossier se lit dans l'index, sans accès à la table.
+-- Requiert la migration 006 (folders.size_kb).
+-- Usage : mysql -u root -p superviseur_dossiers < sql/migrations/008_points_de_controle.sql
+-- ============================================================
+
+CREATE TABLE size_checkpoints (
+    id_scan    BIGINT  NOT NULL,
+    id_folder  BIGINT  NOT NULL,
+    size_kb    BIGINT  NOT NULL,
+    PRIMARY KEY (id_scan, id_folder),
+    FOREIGN KEY (id_scan)   REFERENCES scans(id_scan),
+    FOREIGN KEY (id_folder) REFERENCES folders(id_folder)
+);
+
+-- Le nouvel index couvre la clé étrangère sur id_folder : il est créé avant
+-- la suppression de l'ancien
+CREATE INDEX idx_sizes_folder_scan ON sizes(id_folder, id_scan, size_kb);
+DROP INDEX idx_sizes_id_folder ON sizes;
+
+-- Premier point de contrôle : tailles courantes, au dernier scan ayant
+-- écrit dans sizes
+INSERT INTO size_checkpoints (id_scan, id_folder, size_kb)
+SELECT d.id_scan, f.id_folder, f.size_kb
+FROM folders f
+JOIN (SELECT MAX(id_scan) AS id_scan FROM sizes) d ON d.id_scan IS NOT NULL
+WHERE f.is_deleted = 0;
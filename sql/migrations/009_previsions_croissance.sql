@@ -0,0 +1,23 @@
+-- ============================================================
+-- Migration 009 — Prévisions de croissance
+-- ============================================================
+-- folder_forecasts reçoit, pour chaque dossier, la pente de sa tendance
+-- de taille (Ko/jour) sur les PREVISION_FENETRE_JOURS derniers jours et le
+-- nombre de jours avant saturation du volume à ce rythme. Le scanner la
+-- recalcule après chaque scan complété ; l'index sur growth_kb_day sert au
+-- classement « croissance la plus rapide » du tableau de bord.
+-- La table se remplit au prochain scan.
+-- Usage : mysql -u root -p superviseur_dossiers < sql/migrations/009_previsions_croissance.sql
+-- ============================================================
+
+CREATE TABLE folder_forecasts (
+    id_folder     BIGINT    NOT NULL,
+    id_scan       BIGINT    NOT NULL,
+    growth_kb_day DOUBLE    NOT NULL,
+    days_to_full  INT       NULL     DEFAULT NULL,
+    nb_points     INT       NOT NULL,
+    computed_at   TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_folder),
+    KEY idx_forecasts_growth (growth_kb_day),
+    FOREIGN KEY (id_folder) REFERENCES folders(id_folder)
+);
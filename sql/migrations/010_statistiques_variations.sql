@@ -0,0 +1,21 @@
+-- ============================================================
+-- Migration 010 — Statistiques de variation par dossier
+-- ============================================================
+-- Moyenne et variance exponentielles (EWMA) des variations de chaque
+-- dossier, tenues à jour par le scanner à chaque changement de taille :
+-- une variation est signalée sur son z-score au lieu d'un seuil fixe en Mo.
+-- nb_deltas compte les scans observés (apprentissage : seuils fixes pendant
+-- les 5 premiers) ; stats_scan est le dernier scan intégré, les scans sans
+-- changement étant appliqués en une fois au changement suivant.
+-- Les statistiques partent de zéro : les dossiers existants repassent par
+-- l'apprentissage à partir du dernier scan.
+-- Usage : mysql -u root -p superviseur_dossiers < sql/migrations/010_statistiques_variations.sql
+-- ============================================================
+
+ALTER TABLE folders
+    ADD COLUMN ewma_delta_kb   DOUBLE NOT NULL DEFAULT 0    AFTER delta_kb,
+    ADD COLUMN ewmvar_delta_kb DOUBLE NOT NULL DEFAULT 0    AFTER ewma_delta_kb,
+    ADD COLUMN nb_deltas       INT    NOT NULL DEFAULT 0    AFTER ewmvar_delta_kb,
+    ADD COLUMN stats_scan      BIGINT NULL     DEFAULT NULL AFTER nb_deltas;
+
+UPDATE folders SET stats_scan = (SELECT MAX(id_scan) FROM scans);
@@ -15,12 +15,22 @@ USE superviseur_dossiers;
 -- ------------------------------------------------------------
 CREATE TABLE folders (
     id_folder  BIGINT       NOT NULL AUTO_INCREMENT,
-    path       VARCHAR(512) NOT NULL,
+    path       TEXT         NOT NULL,
+    path_hash  BINARY(16)   NOT NULL,
+    path_collision TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    parent_id  BIGINT       NULL     DEFAULT NULL,
+    name       VARCHAR(255) NOT NULL DEFAULT '',
+    size_kb    BIGINT       NOT NULL DEFAULT 0,
+    delta_kb   BIGINT       NOT NULL DEFAULT 0,
+    ewma_delta_kb   DOUBLE  NOT NULL DEFAULT 0,
+    ewmvar_delta_kb DOUBLE  NOT NULL DEFAULT 0,
+    nb_deltas  INT          NOT NULL DEFAULT 0,
+    stats_scan BIGINT       NULL     DEFAULT NULL,
     is_new     TINYINT(1)   NOT NULL DEFAULT 1,
     is_root    TINYINT(1)   NOT NULL DEFAULT 0,
     is_deleted TINYINT(1)   NOT NULL DEFAULT 0,
     PRIMARY KEY (id_folder),
-    UNIQUE KEY uq_path (path)
+    UNIQUE KEY uq_path_hash (path_hash, path_collision)
 );
 
 CREATE TABLE scans (
@@ -30,6 +40,7 @@ CREATE TABLE scans (
     status        VARCHAR(20)  NOT NULL DEFAULT 'in_progress',
     total_folders INT          NULL     DEFAULT NULL,
     total_size_kb BIGINT       NULL     DEFAULT NULL,
+    retention     VARCHAR(10)  NULL     DEFAULT NULL,
     PRIMARY KEY (id_scan)
 );
 
@@ -42,12 +53,89 @@ CREATE TABLE sizes (
     FOREIGN KEY (id_folder) REFERENCES folders(id_folder)
 );
 
+CREATE TABLE size_checkpoints (
+    id_scan    BIGINT  NOT NULL,
+    id_folder  BIGINT  NOT NULL,
+    size_kb    BIGINT  NOT NULL,
+    PRIMARY KEY (id_scan, id_folder),
+    FOREIGN KEY (id_scan)   REFERENCES scans(id_scan),
+    FOREIGN KEY (id_folder) REFERENCES folders(id_folder)
+);
+
+CREATE TABLE size_compactions (
+    id_compaction BIGINT      NOT NULL AUTO_INCREMENT,
+    date_         TIMESTAMP   NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    granularity   VARCHAR(10) NOT NULL,
+    period_start  DATE        NOT NULL,
+    first_scan    BIGINT      NOT NULL,
+    last_scan     BIGINT      NOT NULL,
+    nb_scans      INT         NOT NULL,
+    rows_deleted  BIGINT      NOT NULL,
+    PRIMARY KEY (id_compaction)
+);
+
+CREATE TABLE scan_summary (
+    id_scan      BIGINT   NOT NULL,
+    nb_new       INT      NOT NULL DEFAULT 0,
+    nb_modified  INT      NOT NULL DEFAULT 0,
+    nb_deleted   INT      NOT NULL DEFAULT 0,
+    variation_kb BIGINT   NOT NULL DEFAULT 0,
+    top_movers   LONGTEXT NULL     DEFAULT NULL,
+    PRIMARY KEY (id_scan),
+    FOREIGN KEY (id_scan) REFERENCES scans(id_scan)
+);
+
+CREATE TABLE scan_events (
+    id_scan        BIGINT      NOT NULL,
+    id_folder      BIGINT      NOT NULL,
+    event_type     VARCHAR(12) NOT NULL,
+    size_before_kb BIGINT      NOT NULL DEFAULT 0,
+    size_after_kb  BIGINT      NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_scan, id_folder),
+    FOREIGN KEY (id_scan)   REFERENCES scans(id_scan),
+    FOREIGN KEY (id_folder) REFERENCES folders(id_folder)
+);
+
+CREATE TABLE folder_trigrams (
+    trigram   CHAR(3) NOT NULL,
+    id_folder BIGINT  NOT NULL,
+    PRIMARY KEY (trigram, id_folder),
+    KEY idx_folder_trigrams_folder (id_folder),
+    FOREIGN KEY (id_folder) REFERENCES folders(id_folder)
+);
+
+CREATE TABLE dashboard_stats (
+    id_stats      TINYINT   NOT NULL,
+    total_folders BIGINT    NOT NULL DEFAULT 0,
+    total_scans   INT       NOT NULL DEFAULT 0,
+    last_scan     BIGINT    NULL     DEFAULT NULL,
+    top_movers    LONGTEXT  NULL     DEFAULT NULL,
+    updated_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_stats)
+);
+
+CREATE TABLE folder_forecasts (
+    id_folder     BIGINT    NOT NULL,
+    id_scan       BIGINT    NOT NULL,
+    growth_kb_day DOUBLE    NOT NULL,
+    days_to_full  INT       NULL     DEFAULT NULL,
+    nb_points     INT       NOT NULL,
+    computed_at   TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_folder),
+    KEY idx_forecasts_growth (growth_kb_day),
+    FOREIGN KEY (id_folder) REFERENCES folders(id_folder)
+);
+
 -- ------------------------------------------------------------
 -- 2. Index de performance
 -- ------------------------------------------------------------
 CREATE INDEX idx_scan_status_date     ON scans(status, date_);
-CREATE INDEX idx_sizes_id_folder      ON sizes(id_folder);
+CREATE INDEX idx_sizes_folder_scan    ON sizes(id_folder, id_scan, size_kb);
 CREATE INDEX idx_folders_is_deleted   ON folders(is_deleted);
 CREATE INDEX idx_folders_is_new       ON folders(is_new);
 CREATE INDEX idx_folders_deleted_path ON folders(is_deleted, path(100));
 CREATE INDEX idx_folders_new_path     ON folders(is_new, path(100));
+CREATE INDEX idx_folders_parent_name  ON folders(parent_id, name);
+CREATE INDEX idx_folders_parent_size  ON folders(parent_id, size_kb);
+CREATE INDEX idx_folders_parent_delta ON folders(parent_id, delta_kb);
+CREATE INDEX idx_scan_events_type     ON scan_events(id_scan, event_type);
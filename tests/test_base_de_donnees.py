@@ -5,6 +5,7 @@ creer_scan, terminer_scan et inserer_ou_mettre_a_jour_dossier.
 NB: Ces tests ont été réalisés avec l'aide de l'Intelligence Artificielle.
 """
 
+import json
 import os
 import sys
 import unittest
@@ -22,6 +23,12 @@ from db import (
     traiter_dossiers_en_lot,
     parser_seuils_personnalises,
     obtenir_seuil_pour_chemin,
+    enregistrer_resume_scan,
+    retenir_mouvement,
+    mettre_a_jour_stats_tableau_de_bord,
+    calculer_diff_scans,
+    enregistrer_point_de_controle,
+    mettre_a_jour_statistiques_variation,
 )
 
 
@@ -200,20 +207,25 @@ class TestTerminerScan(unittest.TestCase):
 class TestTraiterDossiersEnLot(unittest.TestCase):
     """Tests pour la fonction traiter_dossiers_en_lot."""
 
-    def _mock_connexion(self, dernier_scan_id=1, dossiers_existants=None, tailles_precedentes=None):
+    def _mock_connexion(self, dossiers_existants=None, scans_termines=(1,)):
+        """
+        dossiers_existants : lignes (id_folder, path, a_completer, size_kb, delta_kb),
+        éventuellement suivies des statistiques (ewma, variance, nb_deltas, stats_scan).
+        scans_termines : id des scans complétés avant le scan traité.
+        """
         mock_connexion = MagicMock()
         mock_curseur = MagicMock()
         
         if dossiers_existants is None:
             dossiers_existants = []
-        if tailles_precedentes is None:
-            tailles_precedentes = []
+        dossiers_existants = [
+            tuple(row) + (0.0, 0.0, 0, None)[len(row) - 5:] for row in dossiers_existants
+        ]
             
-        mock_curseur.fetchone.return_value = (dernier_scan_id,) if dernier_scan_id else None
+        mock_curseur.fetchone.return_value = None
         
         mock_curseur.fetchall.side_effect = [
-            dossiers_existants,
-            tailles_precedentes
+            dossiers_existants, [(id_scan,) for id_scan in scans_termines]
         ]
         
         mock_curseur.lastrowid = 42
@@ -237,9 +249,7 @@ class TestTraiterDossiersEnLot(unittest.TestCase):
         """Une modification au-dessus du seuil doit être détectée."""
         dossiers = {"C:\\test": 204800000}  # ~195 Mo
         mock_conn, _ = self._mock_connexion(
-            dernier_scan_id=1,
-            dossiers_existants=[(1, "C:\\test")],
-            tailles_precedentes=[(1, 51200)]  # 50 Mo en Ko
+            dossiers_existants=[(1, "C:\\test", 0, 51200, 0)]  # 50 Mo en Ko
         )
         
         nouveaux, modifies, total_ko, diff_racine = traiter_dossiers_en_lot(mock_conn, dossiers, id_scan=2)
@@ -250,6 +260,110 @@ class TestTraiterDossiersEnLot(unittest.TestCase):
         self.assertEqual(modifies[0]["chemin"], "C:\\test")
         self.assertTrue(modifies[0]["difference"] > 100)
 
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100"})
+    def test_variation_sous_le_seuil_retenue_pour_le_resume(self):
+        """Une variation non signalée est tout de même retenue dans les mouvements."""
+        dossiers = {"C:\\test": 62914560}  # 60 Mo, soit +10 Mo
+        mock_conn, _ = self._mock_connexion(
+            dossiers_existants=[(1, "C:\\test", 0, 51200, 0)]
+        )
+        mouvements: list = []
+
+        _, modifies, _, _ = traiter_dossiers_en_lot(
+            mock_conn, dossiers, id_scan=2, mouvements=mouvements
+        )
+
+        self.assertEqual(modifies, [])
+        self.assertEqual([e for _, _, e in mouvements], [(1, "modification", "C:\\test", 51200, 61440)])
+
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100"})
+    def test_taille_courante_recopiee_dans_folders(self):
+        """size_kb / delta_kb suivent les changements ; une variation passée est remise à zéro."""
+        mock_conn, mock_cur = self._mock_connexion(
+            dossiers_existants=[
+                (1, "C:\\a", 0, 100, 0),    # grossit
+                (2, "C:\\b", 0, 200, 50),   # inchangé, avait varié au scan précédent
+                (3, "C:\\c", 0, 300, 0),    # inchangé
+            ]
+        )
+        traiter_dossiers_en_lot(
+            mock_conn, {"C:\\a": 150 * 1024, "C:\\b": 200 * 1024, "C:\\c": 300 * 1024}, id_scan=2
+        )
+
+        mises_a_jour = [
+            c[0][1] for c in mock_cur.executemany.call_args_list
+            if c[0][0].startswith("UPDATE folders SET size_kb")
+        ]
+        self.assertEqual(
+            [(m[0], m[1], m[-1]) for m in mises_a_jour[0]], [(150, 50, 1), (200, 0, 2)]
+        )
+        # Première variation intégrée dans les statistiques du dossier grossi
+        self.assertEqual(mises_a_jour[0][0][2:6], (5.0, 225.0, 1, 2))
+
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100", "SEUIL_ZSCORE": "3", "SEUIL_MIN_ANOMALIE": "10"})
+    def test_variation_inhabituelle_signalee_sur_zscore(self):
+        """Après apprentissage, une variation sous le seuil fixe mais inhabituelle est signalée."""
+        # Dossier stable (moyenne 0, écart-type 1 Mo ramené à ECART_TYPE_MIN_KB = 10 Mo) :
+        # +50 Mo est très inhabituel
+        mock_conn, _ = self._mock_connexion(
+            dossiers_existants=[(1, "C:\\a", 0, 51200, 0, 0.0, 1024.0 ** 2, 10, 1)]
+        )
+        _, modifies, _, _ = traiter_dossiers_en_lot(
+            mock_conn, {"C:\\a": (51200 + 50 * 1024) * 1024}, id_scan=2
+        )
+        self.assertEqual(len(modifies), 1)
+        self.assertEqual(modifies[0]["zscore"], 5.0)
+
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100", "SEUIL_ZSCORE": "3", "SEUIL_MIN_ANOMALIE": "10"})
+    def test_dossier_immobile_pas_de_zscore_infini(self):
+        """Variance nulle : la première petite variation n'est pas signalée (écart-type minimal)."""
+        mock_conn, _ = self._mock_connexion(
+            dossiers_existants=[(1, "C:\\a", 0, 51200, 0, 0.0, 0.0, 10, 1)]
+        )
+        _, modifies, _, _ = traiter_dossiers_en_lot(
+            mock_conn, {"C:\\a": (51200 + 20 * 1024) * 1024}, id_scan=2
+        )
+        self.assertEqual(modifies, [])
+
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100", "SEUIL_ZSCORE": "3", "SEUILS_PERSONNALISES": "C:\\tmp=100"})
+    def test_seuil_personnalise_prioritaire_sur_le_zscore(self):
+        """Un dossier couvert par SEUILS_PERSONNALISES garde son seuil fixe, même après apprentissage."""
+        mock_conn, _ = self._mock_connexion(
+            dossiers_existants=[(1, "C:\\tmp", 0, 1024000, 0, 0.0, (500 * 1024.0) ** 2, 30, 1)]
+        )
+        _, modifies, _, _ = traiter_dossiers_en_lot(
+            mock_conn, {"C:\\tmp": (1024000 + 300 * 1024) * 1024}, id_scan=2
+        )
+        self.assertEqual(len(modifies), 1)
+        self.assertEqual(modifies[0]["difference"], 300)
+
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100"})
+    def test_scans_sans_changement_comptes_parmi_les_scans_completes(self):
+        """Les trous d'id (scans échoués) ne comptent pas comme scans sans changement."""
+        mock_conn, mock_cur = self._mock_connexion(
+            dossiers_existants=[(1, "C:\\a", 0, 100, 0, 0.0, 0.0, 6, 1)],
+            scans_termines=(1, 3, 7),
+        )
+        traiter_dossiers_en_lot(mock_conn, {"C:\\a": 150 * 1024}, id_scan=10)
+
+        mises_a_jour = [
+            c[0][1] for c in mock_cur.executemany.call_args_list
+            if c[0][0].startswith("UPDATE folders SET size_kb")
+        ]
+        # 6 scans intégrés + 2 complétés sans changement (3 et 7) + ce scan
+        self.assertEqual(mises_a_jour[0][0][4:6], (9, 10))
+
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100", "SEUIL_ZSCORE": "3", "SEUIL_MIN_ANOMALIE": "10"})
+    def test_dossier_bruyant_ignore(self):
+        """Un dossier qui varie habituellement de ±500 Mo n'est pas signalé pour 300 Mo."""
+        mock_conn, _ = self._mock_connexion(
+            dossiers_existants=[(1, "C:\\tmp", 0, 1024000, 0, 0.0, (500 * 1024.0) ** 2, 30, 1)]
+        )
+        _, modifies, _, _ = traiter_dossiers_en_lot(
+            mock_conn, {"C:\\tmp": (1024000 + 300 * 1024) * 1024}, id_scan=2
+        )
+        self.assertEqual(modifies, [])
+
     @patch.dict(os.environ, {"SEUIL_DEFAUT": "100"})
     def test_petit_dossier_ignore(self):
         """Une modification ou un dossier sous le seuil ne déclenche rien."""
@@ -259,6 +373,55 @@ class TestTraiterDossiersEnLot(unittest.TestCase):
         self.assertEqual(len(nouveaux), 0)
         self.assertEqual(len(modifies), 0)
 
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100"})
+    def test_nouveau_dossier_rattache_a_son_parent(self):
+        """Un nouveau dossier doit être inséré avec l'id de son parent et son nom."""
+        racine = os.path.join("racine")
+        enfant = os.path.join(racine, "enfant")
+        mock_conn, mock_cur = self._mock_connexion(
+            dossiers_existants=[(7, racine, 0, 0, 0)]
+        )
+        traiter_dossiers_en_lot(mock_conn, {racine: 0, enfant: 0}, id_scan=2)
+
+        inserts = [
+            c[0][1]
+            for c in mock_cur.execute.call_args_list
+            if c[0][0].startswith("INSERT INTO folders")
+        ]
+        self.assertEqual(inserts, [(enfant, enfant, 0, 7, "enfant")])
+
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100"})
+    def test_collision_path_hash_reessaie_rang_suivant(self):
+        """Une collision de path_hash relance l'insertion avec path_collision + 1."""
+        mock_conn, mock_cur = self._mock_connexion()
+        doublon = mysql.connector.Error(errno=1062)
+        appels = []
+
+        def execute(requete, params=None):
+            appels.append((requete, params))
+            if requete.startswith("INSERT INTO folders") and params[2] == 0:
+                raise doublon
+
+        mock_cur.execute.side_effect = execute
+        mock_cur.fetchone.return_value = None  # chemin absent : vraie collision
+        traiter_dossiers_en_lot(mock_conn, {"C:\\test": 0}, id_scan=2)
+
+        rangs = [p[2] for r, p in appels if r.startswith("INSERT INTO folders")]
+        self.assertEqual(rangs, [0, 1])
+
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100"})
+    def test_nouveaux_dossiers_indexes_pour_la_recherche(self):
+        """Les nouveaux dossiers sont ajoutés à folder_trigrams en une requête."""
+        mock_conn, mock_cur = self._mock_connexion()
+        traiter_dossiers_en_lot(mock_conn, {"C:\\a": 0, "C:\\b": 0}, id_scan=2)
+
+        index = [
+            c[0] for c in mock_cur.execute.call_args_list
+            if c[0][0].startswith("INSERT IGNORE INTO folder_trigrams")
+        ]
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index[0][1], [42, 42])
+
     @patch.dict(os.environ, {"SEUIL_DEFAUT": "100"})
     def test_fait_un_commit(self):
         """Doit faire un commit après l'opération (car on a moins de 5000 dossiers)."""
@@ -268,6 +431,194 @@ class TestTraiterDossiersEnLot(unittest.TestCase):
         mock_conn.commit.assert_called()
 
 
+
+class TestMettreAJourStatistiquesVariation(unittest.TestCase):
+    """Tests pour la fonction mettre_a_jour_statistiques_variation."""
+
+    def test_apprentissage_sans_zscore(self):
+        """Pendant l'apprentissage, les statistiques évoluent sans z-score."""
+        stats, zscore = mettre_a_jour_statistiques_variation((0.0, 0.0, 0, 1), 100, 2, alpha=0.5)
+        self.assertIsNone(zscore)
+        self.assertEqual(stats, (50.0, 2500.0, 1, 2))
+
+    def test_scans_sans_changement_appliques_en_une_fois(self):
+        """j scans sans changement équivalent à j variations nulles intégrées une à une."""
+        alpha = 0.2
+        pas_a_pas = (40.0, 300.0, 6, 10)
+        for id_scan in range(11, 14):
+            pas_a_pas, _ = mettre_a_jour_statistiques_variation(pas_a_pas, 0, id_scan, alpha)
+        pas_a_pas, z_attendu = mettre_a_jour_statistiques_variation(pas_a_pas, 25, 14, alpha)
+
+        en_une_fois, zscore = mettre_a_jour_statistiques_variation((40.0, 300.0, 6, 10), 25, 14, alpha)
+
+        for attendu, obtenu in zip(pas_a_pas, en_une_fois):
+            self.assertAlmostEqual(attendu, obtenu)
+        self.assertAlmostEqual(z_attendu, zscore)
+
+
+class TestEnregistrerResumeScan(unittest.TestCase):
+    """Tests pour la fonction enregistrer_resume_scan."""
+
+    def test_evenements_et_resume_inseres(self):
+        """Chaque événement est écrit dans scan_events et compté dans scan_summary."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value = mock_cur
+        nouveaux = [{"type": "nouveau", "chemin": "C:\\a", "id_folder": 1, "taille_kb": 300}]
+        modifies = [
+            {"type": "modification", "chemin": "C:\\b", "id_folder": 2,
+             "avant_kb": 100, "apres_kb": 1100},
+        ]
+        supprimes = [
+            {"type": "suppression", "chemin": "C:\\c", "id_folder": 3, "taille_kb": 0},
+        ]
+
+        enregistrer_resume_scan(mock_conn, 5, nouveaux, modifies, supprimes, 1300)
+
+        lignes = mock_cur.executemany.call_args[0][1]
+        self.assertEqual(
+            lignes,
+            [(5, 1, "nouveau", 0, 300), (5, 2, "modification", 100, 1100)],
+        )
+        params = mock_cur.execute.call_args[0][1]
+        self.assertEqual(params[:5], (5, 1, 1, 0, 1300))
+        top = json.loads(params[5])
+        self.assertEqual(top[0]["id_folder"], 2)
+        self.assertEqual(top[0]["diff_kb"], 1000)
+        mock_conn.commit.assert_called()
+
+    @patch("db.NB_TOP_MOUVEMENTS", 2)
+    def test_top_mouvements_sous_les_seuils(self):
+        """top_movers reprend les plus fortes variations, même non signalées."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value = mock_cur
+        mouvements: list = []
+        for evenement in [
+            (1, "modification", "C:\\a", 100, 150),
+            (2, "modification", "C:\\b", 100, 90),
+            (3, "nouveau", "C:\\c", 0, 80),
+        ]:
+            retenir_mouvement(mouvements, evenement)
+
+        enregistrer_resume_scan(mock_conn, 5, [], [], [], 50, mouvements)
+
+        mock_cur.executemany.assert_not_called()
+        params = mock_cur.execute.call_args[0][1]
+        self.assertEqual(params[:5], (5, 0, 0, 0, 50))
+        self.assertEqual([m["id_folder"] for m in json.loads(params[5])], [3, 1])
+
+    @patch("db.envoyer_notif_teams")
+    def test_erreur_envoie_notification(self, mock_notif):
+        """Une erreur SQL est signalée sans interrompre le scan."""
+        mock_conn = MagicMock()
+        mock_conn.cursor.side_effect = mysql.connector.Error("Erreur")
+        enregistrer_resume_scan(mock_conn, 5, [], [], [], 0)
+        mock_notif.assert_called_once()
+
+class TestMettreAJourStatsTableauDeBord(unittest.TestCase):
+    """Tests pour la fonction mettre_a_jour_stats_tableau_de_bord."""
+
+    def test_upsert_de_la_ligne_unique(self):
+        """La ligne id_stats = 1 est insérée ou remplacée, puis validée."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value = mock_cur
+
+        mettre_a_jour_stats_tableau_de_bord(mock_conn, 9)
+
+        requete, params = mock_cur.execute.call_args[0]
+        self.assertIn("INSERT INTO dashboard_stats", requete)
+        self.assertIn("ON DUPLICATE KEY UPDATE", requete)
+        self.assertEqual(params, (9, 9))
+        mock_conn.commit.assert_called_once()
+
+    @patch("db.envoyer_notif_teams")
+    def test_erreur_envoie_notification(self, mock_notif):
+        """Une erreur SQL est notifiée sans interrompre le scan."""
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value.execute.side_effect = mysql.connector.Error("Erreur")
+        mettre_a_jour_stats_tableau_de_bord(mock_conn, 9)
+        mock_notif.assert_called_once()
+
+
+class TestEnregistrerPointDeControle(unittest.TestCase):
+    """Tests pour la fonction enregistrer_point_de_controle."""
+
+    def _mock_connexion(self, scans_depuis):
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchone.return_value = (scans_depuis,)
+        return mock_conn, mock_cur
+
+    @patch.dict(os.environ, {"INTERVALLE_POINTS_CONTROLE": "10"})
+    def test_intervalle_atteint(self):
+        """Après 10 scans complétés, les tailles courantes sont copiées."""
+        mock_conn, mock_cur = self._mock_connexion(10)
+
+        self.assertTrue(enregistrer_point_de_controle(mock_conn, 42))
+
+        requete, params = mock_cur.execute.call_args[0]
+        self.assertIn("INSERT INTO size_checkpoints", requete)
+        self.assertIn("FROM folders WHERE is_deleted = 0", requete)
+        self.assertEqual(params, (42,))
+        mock_conn.commit.assert_called_once()
+
+    @patch.dict(os.environ, {"INTERVALLE_POINTS_CONTROLE": "10"})
+    def test_intervalle_non_atteint(self):
+        """Avant l'intervalle, rien n'est écrit."""
+        mock_conn, mock_cur = self._mock_connexion(9)
+
+        self.assertFalse(enregistrer_point_de_controle(mock_conn, 42))
+        self.assertEqual(mock_cur.execute.call_count, 1)
+        mock_conn.commit.assert_not_called()
+
+    @patch.dict(os.environ, {"INTERVALLE_POINTS_CONTROLE": "0"})
+    def test_desactive(self):
+        """Un intervalle de 0 désactive les points de contrôle."""
+        mock_conn = MagicMock()
+        self.assertFalse(enregistrer_point_de_controle(mock_conn, 42))
+        mock_conn.cursor.assert_not_called()
+
+
+class TestCalculerDiffScans(unittest.TestCase):
+    """Tests pour la fonction calculer_diff_scans."""
+
+    def _mock_connexion(self, lignes):
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.return_value = lignes
+        return mock_conn, mock_cur
+
+    def test_scans_dans_le_desordre(self):
+        """Les scans sont remis dans l'ordre et seule la plage ]A, B] est relue."""
+        ligne = {"id_folder": 1, "path": "D:\\a", "avant_kb": 10, "apres_kb": 30, "diff_kb": 20}
+        mock_conn, mock_cur = self._mock_connexion([ligne])
+
+        resultat = calculer_diff_scans(mock_conn, 9, 4, limite=10)
+
+        requete, params = mock_cur.execute.call_args[0]
+        self.assertIn("WHERE id_scan > %s AND id_scan <= %s", requete)
+        self.assertIn("ORDER BY ABS(apres_kb - avant_kb) DESC", requete)
+        self.assertEqual(params, [4, 9, 4, 9, 10])
+        self.assertEqual(resultat, [ligne])
+        mock_cur.close.assert_called_once()
+
+    def test_filtre_sur_un_chemin(self):
+        """Un chemin restreint la comparaison à ce dossier et ses descendants (LIKE échappé)."""
+        mock_conn, mock_cur = self._mock_connexion([])
+        chemin = os.path.join("data", "mon_projet")
+
+        calculer_diff_scans(mock_conn, 1, 2, limite=5, chemin=chemin)
+
+        requete, params = mock_cur.execute.call_args[0]
+        self.assertIn("f.path = %s OR f.path LIKE %s", requete)
+        self.assertEqual(params[4], chemin)
+        self.assertTrue(params[5].endswith("mon\\_projet" + os.sep.replace("\\", "\\\\") + "%"))
+
+
 class TestParserSeuilsPersonnalises(unittest.TestCase):
     """Tests pour la fonction parser_seuils_personnalises."""
 
@@ -0,0 +1,66 @@
+"""
+Tests pour les exports CSV / XLSX de l'Intranet (intranet/export.py).
+"""
+
+import io
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from intranet.export import generer_csv, generer_export, generer_xlsx
+
+
+class TestExport(unittest.TestCase):
+    """Tests pour la génération des fichiers d'export."""
+
+    def test_csv_entetes_et_lignes(self):
+        """Le CSV commence par un BOM, utilise « ; » et convertit les bytes."""
+        contenu = b"".join(
+            generer_csv(["chemin", "taille_kb"], [(b"D:\\Data", 10), ("D:\\Autre", 20)])
+        ).decode("utf-8")
+        self.assertTrue(contenu.startswith("\ufeff"))
+        self.assertEqual(
+            contenu.lstrip("\ufeff").splitlines(),
+            ["chemin;taille_kb", "D:\\Data;10", "D:\\Autre;20"],
+        )
+
+    @patch("intranet.export.LIGNES_PAR_MORCEAU_CSV", 2)
+    def test_csv_envoye_par_morceaux(self):
+        """Les lignes sont lues au fil de l'eau, par morceaux de LIGNES_PAR_MORCEAU_CSV."""
+        lues = []
+
+        def lignes():
+            for i in range(5):
+                lues.append(i)
+                yield (i,)
+
+        generateur = generer_csv(["n"], lignes())
+        next(generateur)  # en-tête seul
+        self.assertEqual(lues, [])
+        self.assertEqual(next(generateur), b"0\r\n1\r\n")
+        self.assertEqual(lues, [0, 1])
+        self.assertEqual(len(list(generateur)), 2)  # 2 + 1 lignes restantes
+
+    def test_xlsx_relisible(self):
+        """Le classeur produit en mode write_only se relit avec openpyxl."""
+        from openpyxl import load_workbook  # type: ignore[import-untyped]
+
+        contenu = b"".join(generer_xlsx("scan_3", ["chemin", "taille_kb"], [("D:\\Data", 10)]))
+        feuille = load_workbook(io.BytesIO(contenu)).active
+        self.assertEqual(feuille.title, "scan_3")
+        self.assertEqual(
+            [tuple(l) for l in feuille.iter_rows(values_only=True)],
+            [("chemin", "taille_kb"), ("D:\\Data", 10)],
+        )
+
+    def test_format_inconnu_exporte_en_csv(self):
+        """generer_export retombe sur le CSV pour tout format autre que xlsx."""
+        contenu = b"".join(generer_export("csv", "t", ["a"], [(1,)]))
+        self.assertIn(b"a\r\n1\r\n", contenu)
+
+
+if __name__ == "__main__":
+    unittest.main()
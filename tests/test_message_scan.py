@@ -0,0 +1,126 @@
+"""
+Tests pour la construction de la notification de fin de scan.
+Vérifie le classement par ampleur, le plafonnement des sections, le
+découpage sous la taille maximale et le lien vers l'Intranet.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from message_scan import (
+    construire_messages_scan,
+    decouper_messages,
+    formater_duree,
+    lignes_section,
+)
+
+
+class TestFormaterDuree(unittest.TestCase):
+    """Tests pour la fonction formater_duree."""
+
+    def test_formats(self):
+        self.assertEqual(formater_duree(15), "15s")
+        self.assertEqual(formater_duree(125), "2min 5s")
+        self.assertEqual(formater_duree(3725), "1h 2min 5s")
+
+
+class TestLignesSection(unittest.TestCase):
+    """Tests pour la fonction lignes_section."""
+
+    def test_classement_et_resume(self):
+        """Les plus fortes variations (en valeur absolue) d'abord, le reste résumé."""
+        dossiers = [{"d": 5}, {"d": -300}, {"d": 40}, {"d": 2}]
+
+        lignes = lignes_section(dossiers, lambda d: d["d"], lambda d: str(d["d"]), 2)
+
+        self.assertEqual(lignes[:2], ["-300", "40"])
+        self.assertEqual(lignes[2], "   … et 2 autre(s) (+7 Mo au total)")
+
+    def test_section_sous_le_plafond(self):
+        """Sans dépassement, pas de ligne de résumé."""
+        lignes = lignes_section([{"d": 1}], lambda d: d["d"], str, 5)
+        self.assertEqual(len(lignes), 1)
+
+
+class TestDecouperMessages(unittest.TestCase):
+    """Tests pour la fonction decouper_messages."""
+
+    @patch("message_scan.RESERVE_ENTETE_SUITE", 0)
+    def test_section_coupee_reprend_en_suite(self):
+        """Chaque message tient dans le budget et ses blocs de code sont refermés."""
+        lignes = [f"ligne {i:03d} " + "x" * 40 for i in range(100)]
+
+        messages = decouper_messages("En-tête", [("📝 **Modifiés**", lignes)], taille_max=1000)
+
+        self.assertGreater(len(messages), 1)
+        for message in messages:
+            self.assertLessEqual(len(message.encode("utf-8")), 1000)
+            self.assertEqual(message.count("```") % 2, 0)
+        self.assertIn("📝 **Modifiés** (suite)", messages[1])
+        texte = "".join(messages)
+        self.assertTrue(all(ligne in texte for ligne in lignes))
+
+    def test_un_seul_message_si_court(self):
+        messages = decouper_messages("En-tête", [("Titre", ["a", "b"])], pied="\nfin")
+        self.assertEqual(messages, ["En-tête\n<br>Titre:\n```\na\nb\n```\nfin"])
+
+
+class TestConstruireMessagesScan(unittest.TestCase):
+    """Tests pour la fonction construire_messages_scan."""
+
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100", "NOTIF_MAX_LIGNES": "20", "INTRA_URL": ""})
+    def test_migration_massive_plafonnee(self):
+        """20 000 dossiers modifiés : top 20 de chaque section et résumé du reste."""
+        modifies = [
+            {"chemin": f"D:\\Data\\projet{i}", "difference": i} for i in range(20000)
+        ]
+
+        messages = construire_messages_scan(7, 42, [], modifies, [], 150)
+
+        self.assertEqual(len(messages), 1)
+        self.assertIn("D: > Data > projet19999", messages[0])
+        self.assertNotIn("projet19979", messages[0])
+        self.assertIn("… et 19980 autre(s)", messages[0])
+        self.assertIn("20000 changements détectés", messages[0])
+
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100", "NOTIF_MAX_LIGNES": "5000", "INTRA_URL": ""})
+    def test_decoupage_sous_la_taille_maximale(self):
+        """Sans plafond effectif, le texte est réparti en messages numérotés."""
+        nouveaux = [{"chemin": f"D:\\Data\\nouveau{i}", "taille": 200} for i in range(3000)]
+
+        messages = construire_messages_scan(7, 42, nouveaux, [], [], 600000)
+
+        self.assertGreater(len(messages), 1)
+        for message in messages:
+            self.assertLessEqual(len(message.encode("utf-8")), 20000)
+        self.assertTrue(messages[1].startswith(f"📨 **Scan #7 — suite 2/{len(messages)}**"))
+
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100", "INTRA_URL": "http://srv-fichiers:5000/"})
+    def test_lien_vers_le_detail_du_scan(self):
+        """Le dernier message renvoie vers le détail du scan dans l'Intranet."""
+        nouveaux = [{"chemin": "C:\\nouveau", "taille": 200}]
+
+        messages = construire_messages_scan(12, 5, nouveaux, [], [], 200)
+
+        self.assertIn("(http://srv-fichiers:5000/scans?scan=12)", messages[-1])
+
+    @patch.dict(os.environ, {"SEUIL_DEFAUT": "100"})
+    def test_suppressions_sous_le_seuil_non_listees(self):
+        """Les suppressions inférieures à SEUIL_DEFAUT ne sont pas listées."""
+        supprimes = [
+            {"chemin": "C:\\petit", "taille": 50},
+            {"chemin": "C:\\gros", "taille": 800},
+        ]
+
+        message = construire_messages_scan(1, 5, [], [], supprimes, -850)[0]
+
+        self.assertIn("⚠️ (-    800 Mo)   C: > gros", message)
+        self.assertNotIn("petit", message)
+
+
+if __name__ == "__main__":
+    unittest.main()
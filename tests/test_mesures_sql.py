@@ -0,0 +1,195 @@
+"""
+Tests pour la mesure des requêtes SQL.
+Vérifie les empreintes, les agrégats, le top des requêtes lentes, la
+journalisation au-delà du seuil et l'instrumentation des curseurs.
+"""
+
+import os
+import sys
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mesures_sql import (
+    empreinte,
+    enregistrer_mesure,
+    get_agregats,
+    get_requetes_lentes,
+    instrumenter_connexion,
+    reinitialiser,
+)
+
+
+class TestEmpreinte(unittest.TestCase):
+    """Tests pour la fonction empreinte."""
+
+    def test_listes_in_regroupees(self):
+        """Une liste IN de longueur quelconque donne la même empreinte."""
+        self.assertEqual(
+            empreinte("SELECT * FROM folders WHERE id_folder IN (%s,%s,%s)"),
+            empreinte("SELECT * FROM folders WHERE id_folder IN (%s)"),
+        )
+
+    def test_litteraux_et_espaces(self):
+        """Chaînes et nombres deviennent ?, les espaces sont réduits."""
+        self.assertEqual(
+            empreinte("SELECT  path\n FROM folders WHERE path = 'C:\\\\Data' LIMIT 10"),
+            "SELECT path FROM folders WHERE path = ? LIMIT ?",
+        )
+
+
+class TestEnregistrerMesure(unittest.TestCase):
+    """Tests pour les agrégats et le top des requêtes lentes."""
+
+    def setUp(self):
+        reinitialiser()
+
+    def tearDown(self):
+        reinitialiser()
+
+    @patch.dict(os.environ, {"SEUIL_REQUETE_LENTE_MS": "0"})
+    def test_agregats_par_empreinte(self):
+        """Les appels d'une même requête sont cumulés, triés par durée totale."""
+        enregistrer_mesure("SELECT 1 FROM scans WHERE id_scan = 4", 10.0, 1, "a.f:1")
+        enregistrer_mesure("SELECT 1 FROM scans WHERE id_scan = 5", 30.0, 1, "a.f:1")
+        enregistrer_mesure("SELECT * FROM folders", 25.0, 100, "b.g:2")
+
+        agregats = get_agregats()
+
+        self.assertEqual(len(agregats), 2)
+        self.assertEqual(agregats[0]["empreinte"], "SELECT ? FROM scans WHERE id_scan = ?")
+        self.assertEqual(agregats[0]["appels"], 2)
+        self.assertEqual(agregats[0]["total_ms"], 40.0)
+        self.assertEqual(agregats[0]["max_ms"], 30.0)
+        self.assertEqual(agregats[0]["moyenne_ms"], 20.0)
+
+    @patch.dict(os.environ, {"SEUIL_REQUETE_LENTE_MS": "0"})
+    @patch("mesures_sql.NB_REQUETES_LENTES", 2)
+    def test_top_des_plus_lentes(self):
+        """Seules les N exécutions les plus lentes sont gardées, la plus lente en tête."""
+        for duree in (5.0, 50.0, 20.0, 1.0):
+            enregistrer_mesure("SELECT 1", duree, 0, "a.f:1")
+
+        self.assertEqual([r["duree_ms"] for r in get_requetes_lentes()], [50.0, 20.0])
+
+    @patch.dict(os.environ, {"SEUIL_REQUETE_LENTE_MS": "100"})
+    def test_journalise_au_dela_du_seuil(self):
+        """Une requête plus longue que le seuil est journalisée en WARNING."""
+        with self.assertLogs("mesures_sql", level="WARNING") as logs:
+            enregistrer_mesure("SELECT * FROM sizes", 150.0, 3, "db.f:12")
+            enregistrer_mesure("SELECT * FROM scans", 50.0, 1, "db.f:13")
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("db.f:12", logs.output[0])
+        self.assertIn("SELECT * FROM sizes", logs.output[0])
+
+
+class _CurseurNonBufferise:
+    """Imite un curseur non bufferisé : rowcount vaut -1 tant que les lignes n'ont pas été lues."""
+
+    with_rows = True
+    arraysize = 1
+
+    def __init__(self, lignes, delai_lecture=0.0):
+        self._lignes = list(lignes)
+        self._delai = delai_lecture
+        self.rowcount = -1
+
+    def execute(self, requete, params=None):
+        self.rowcount = -1
+
+    def fetchmany(self, size=1):
+        time.sleep(self._delai)
+        lot, self._lignes = self._lignes[:size], self._lignes[size:]
+        self.rowcount = max(self.rowcount, 0) + len(lot)
+        return lot
+
+    def fetchone(self):
+        lot = self.fetchmany(1)
+        return lot[0] if lot else None
+
+    def fetchall(self):
+        return self.fetchmany(len(self._lignes))
+
+    def close(self):
+        pass
+
+
+class TestInstrumenterConnexion(unittest.TestCase):
+    """Tests pour l'instrumentation des curseurs."""
+
+    def setUp(self):
+        reinitialiser()
+
+    def tearDown(self):
+        reinitialiser()
+
+    @patch.dict(os.environ, {"SEUIL_REQUETE_LENTE_MS": "0"})
+    def test_curseur_mesure_et_delegue(self):
+        """execute est mesuré avec l'appelant, le reste du curseur est délégué."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.rowcount = 7
+        mock_cur.fetchall.return_value = [(1,)]
+
+        self.assertIs(instrumenter_connexion(mock_conn), mock_conn)
+        curseur = mock_conn.cursor(dictionary=True)
+        curseur.execute("SELECT id_folder FROM folders WHERE id_folder = %s", (3,))
+
+        self.assertEqual(curseur.fetchall(), [(1,)])
+        mock_cur.execute.assert_called_once_with(
+            "SELECT id_folder FROM folders WHERE id_folder = %s", (3,)
+        )
+        lente = get_requetes_lentes()[0]
+        self.assertEqual(lente["lignes"], 7)
+        self.assertTrue(lente["appelant"].startswith(f"{__name__}.test_curseur_mesure_et_delegue:"))
+
+    @patch.dict(os.environ, {"SEUIL_REQUETE_LENTE_MS": "0"})
+    def test_requete_en_erreur_mesuree(self):
+        """Une requête qui lève une exception est tout de même mesurée."""
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value.execute.side_effect = RuntimeError("boom")
+        curseur = instrumenter_connexion(mock_conn).cursor()
+
+        with self.assertRaises(RuntimeError):
+            curseur.execute("SELECT 1")
+
+        self.assertEqual(get_agregats()[0]["appels"], 1)
+
+    @patch.dict(os.environ, {"SEUIL_REQUETE_LENTE_MS": "0"})
+    def test_lecture_des_lignes_mesuree(self):
+        """Curseur non bufferisé : la lecture par lots compte dans la durée et les lignes."""
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value = _CurseurNonBufferise(range(5), delai_lecture=0.02)
+        curseur = instrumenter_connexion(mock_conn).cursor(buffered=False)
+
+        curseur.execute("SELECT id_folder FROM folders")
+        self.assertEqual(get_agregats(), [])
+        while curseur.fetchmany(2):
+            pass
+
+        agregat = get_agregats()[0]
+        self.assertEqual(agregat["appels"], 1)
+        self.assertEqual(agregat["lignes"], 5)
+        self.assertGreaterEqual(agregat["total_ms"], 60)
+
+    @patch.dict(os.environ, {"SEUIL_REQUETE_LENTE_MS": "0"})
+    def test_mesure_close_a_l_execute_suivant(self):
+        """Des lignes lues en partie (itération, fetchone) sont comptées au prochain execute."""
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value = _CurseurNonBufferise([(1,), (2,), (3,)])
+        curseur = instrumenter_connexion(mock_conn).cursor()
+
+        curseur.execute("SELECT id_scan FROM scans")
+        self.assertEqual(next(iter(curseur)), (1,))
+        curseur.execute("SELECT id_folder FROM folders")
+        curseur.close()
+
+        self.assertEqual(sorted(a["lignes"] for a in get_agregats()), [0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
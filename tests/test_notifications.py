@@ -0,0 +1,152 @@
+"""
+Tests pour la file de livraison des notifications Teams.
+Un petit serveur HTTP local joue le rôle du webhook : il répond selon une
+liste de codes prévue par chaque test et mémorise les messages reçus.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import notifications
+from notifications import (
+    arreter_file_notifications,
+    demarrer_file_notifications,
+    envoyer_notif_teams,
+    get_metriques_notifications,
+)
+
+
+class _Webhook(BaseHTTPRequestHandler):
+    """Répond avec le prochain code de `codes` (200 quand la liste est vide)."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        corps = self.rfile.read(int(self.headers["Content-Length"]))
+        serveur = self.server
+        with serveur.verrou:
+            code = serveur.codes.pop(0) if serveur.codes else 200
+            serveur.connexions.add(self.client_address)
+            if code == 200:
+                serveur.recus.append(json.loads(corps)["text"])
+        self.send_response(code)
+        self.send_header("Content-Length", "1")
+        self.end_headers()
+        self.wfile.write(b"1")
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFileNotifications(unittest.TestCase):
+    """Tests de bout en bout contre un webhook local."""
+
+    def setUp(self):
+        self.serveur = ThreadingHTTPServer(("127.0.0.1", 0), _Webhook)
+        self.serveur.codes = []
+        self.serveur.recus = []
+        self.serveur.connexions = set()
+        self.serveur.verrou = threading.Lock()
+        threading.Thread(target=self.serveur.serve_forever, daemon=True).start()
+
+        self.dossier = tempfile.mkdtemp()
+        url = f"http://127.0.0.1:{self.serveur.server_port}/webhook"
+        for patcher in (
+            patch.dict(os.environ, {"TEAMS_WEBHOOK_URL": url}),
+            patch("notifications.FICHIER_ATTENTE", os.path.join(self.dossier, "attente.jsonl")),
+            patch("notifications.DELAI_RETRY_BASE", 0.01),
+            patch("notifications.publier_statut"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.fichier_attente = notifications.FICHIER_ATTENTE
+
+    def tearDown(self):
+        arreter_file_notifications(delai=5)
+        self.serveur.shutdown()
+        self.serveur.server_close()
+        shutil.rmtree(self.dossier, ignore_errors=True)
+
+    def _lire_attente(self):
+        with open(self.fichier_attente, encoding="utf-8") as f:
+            return [json.loads(ligne)["message"] for ligne in f]
+
+    def test_livraison_sur_une_seule_connexion(self):
+        """Les messages sont remis dans l'ordre en réutilisant la même connexion."""
+        demarrer_file_notifications()
+        for i in range(3):
+            envoyer_notif_teams(f"message {i}")
+        arreter_file_notifications(delai=5)
+
+        self.assertEqual(self.serveur.recus, ["message 0", "message 1", "message 2"])
+        self.assertEqual(len(self.serveur.connexions), 1)
+
+    def test_nouvelles_tentatives_sur_erreur_temporaire(self):
+        """Un 503 puis un 429 sont retentés jusqu'à la livraison."""
+        self.serveur.codes = [503, 429]
+        avant = get_metriques_notifications()
+
+        demarrer_file_notifications()
+        envoyer_notif_teams("après deux échecs")
+        arreter_file_notifications(delai=5)
+
+        apres = get_metriques_notifications()
+        self.assertEqual(self.serveur.recus, ["après deux échecs"])
+        self.assertEqual(apres["tentatives_echouees"] - avant["tentatives_echouees"], 2)
+        self.assertEqual(apres["envoyees"] - avant["envoyees"], 1)
+        self.assertFalse(os.path.exists(self.fichier_attente))
+
+    @patch("notifications.NB_TENTATIVES", 2)
+    def test_mise_en_attente_puis_reprise(self):
+        """Un message jamais accepté est écrit sur disque puis renvoyé au démarrage suivant."""
+        self.serveur.codes = [500, 500]
+
+        demarrer_file_notifications()
+        envoyer_notif_teams("webhook en panne")
+        arreter_file_notifications(delai=5)
+
+        self.assertEqual(self.serveur.recus, [])
+        self.assertEqual(self._lire_attente(), ["webhook en panne"])
+
+        demarrer_file_notifications()
+        arreter_file_notifications(delai=5)
+
+        self.assertEqual(self.serveur.recus, ["webhook en panne"])
+        self.assertFalse(os.path.exists(self.fichier_attente))
+
+    def test_erreur_definitive_non_retentee(self):
+        """Un 400 n'est ni retenté ni mis en attente."""
+        self.serveur.codes = [400]
+        avant = get_metriques_notifications()
+
+        demarrer_file_notifications()
+        envoyer_notif_teams("refusé")
+        arreter_file_notifications(delai=5)
+
+        self.assertEqual(get_metriques_notifications()["rejetees"] - avant["rejetees"], 1)
+        self.assertEqual(self.serveur.codes, [])
+        self.assertFalse(os.path.exists(self.fichier_attente))
+
+    def test_file_non_videe_a_l_arret_mise_en_attente(self):
+        """Les messages encore en file quand l'arrêt expire partent sur disque."""
+        with patch("notifications._livrer", side_effect=lambda e: threading.Event().wait(0.5)):
+            demarrer_file_notifications()
+            envoyer_notif_teams("en cours")
+            envoyer_notif_teams("restant")
+            threading.Event().wait(0.1)
+            arreter_file_notifications(delai=0)
+
+        self.assertEqual(self._lire_attente(), ["restant"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
 import os
 import sys
 import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import patch
 from unittest.mock import MagicMock
@@ -8,6 +10,7 @@ from unittest.mock import MagicMock
 # Ajoute le dossier racine au PYTHONPATH
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import processus
 from plugin_loader import charger_plugins
 
 
@@ -79,6 +82,24 @@ class TestPluginLoader(unittest.TestCase):
             self.assertEqual(len(resultat), 0)
             mock_logger.assert_called()
 
+    def test_charge_seulement_les_plugins_demandes(self):
+        """Avec une liste de noms, les autres plugins ne sont ni importés ni configurés."""
+        import plugin_loader
+
+        self.addCleanup(plugin_loader._REGISTRE.pop, "plugin_retenu", None)
+        self.addCleanup(sys.modules.pop, "plugin_retenu", None)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, "plugins"))
+            contenu_plugin = "def configurer(dossier):\n    pass\ndef planifier(scheduler):\n    pass\ndef afficher_statut():\n    pass"
+            for nom in ("plugin_retenu", "plugin_desactive"):
+                with open(os.path.join(tmpdir, "plugins", f"{nom}.py"), "w") as f:
+                    f.write(contenu_plugin)
+
+            resultat = charger_plugins(tmpdir, ["plugin_retenu"])
+
+            self.assertIn("plugin_retenu", [m.__name__ for m in resultat])
+            self.assertNotIn("plugin_desactive", plugin_loader._REGISTRE)
+
 
 class TestRegistrePlugins(unittest.TestCase):
     """Tests pour la gestion du registre des plugins."""
@@ -88,6 +109,8 @@ class TestRegistrePlugins(unittest.TestCase):
 
         plugin_loader._REGISTRE.clear()
         plugin_loader._DOSSIER_APP = ""
+        processus._STATUTS.clear()
+        self.addCleanup(processus._STATUTS.clear)
 
     def test_get_registre_vide(self):
         from plugin_loader import get_registre
@@ -121,6 +144,33 @@ class TestRegistrePlugins(unittest.TestCase):
         res = desactiver_plugin("mon_plugin")
         self.assertTrue(res["ok"])
         self.assertFalse(plugin_loader._REGISTRE["mon_plugin"]["actif"])
+        self.assertEqual(processus.get_statuts()["plugins"]["desactives"], ["mon_plugin"])
+
+    def test_noms_plugins_actifs_sans_les_desactives_publies(self):
+        """Un plugin désactivé dans l'Intranet (autre processus) n'est plus transmis au scan."""
+        import plugin_loader
+        from plugin_loader import noms_plugins_actifs
+
+        for nom in ("p_a", "p_b"):
+            plugin_loader._REGISTRE[nom] = {"actif": True, "module": object(), "erreur": None}
+        processus.publier_statut("plugins", desactives=["p_b"])
+
+        self.assertEqual(noms_plugins_actifs(), ["p_a"])
+
+    def test_get_registre_hooks_publies_par_le_scan(self):
+        """L'état des hooks publié par le processus du scan apparaît dans le registre."""
+        import plugin_loader
+        from plugin_loader import get_registre
+
+        plugin_loader._REGISTRE["p_hook"] = {"actif": True, "module": object(), "erreur": None, "chemin": ""}
+        processus.publier_statut("plugins/scan", executions={
+            "p_hook:on_scan_complete": {"dernier_statut": "ok"},
+            "p_hook:on_directory": {"dernier_statut": "lent"},
+        })
+
+        registre = get_registre()["p_hook"]
+        self.assertEqual(registre["execution_fin_de_scan"]["dernier_statut"], "ok")
+        self.assertEqual(registre["execution_visite"]["dernier_statut"], "lent")
 
     def test_desactiver_plugin_inexistant(self):
         from plugin_loader import desactiver_plugin
@@ -192,5 +242,230 @@ class TestRegistrePlugins(unittest.TestCase):
             self.assertTrue(plugin_loader._REGISTRE["nouveau_plugin"]["actif"])
 
 
+class TestExecutionPlugins(unittest.TestCase):
+    """Tests pour l'exécution des tâches de plugins dans le pool."""
+
+    def setUp(self):
+        import plugin_loader
+
+        plugin_loader._EXECUTIONS.clear()
+
+    def _attendre_fin(self, nom, delai=5):
+        """Attend que la tâche du plugin `nom` soit terminée et retourne son état."""
+        from plugin_loader import get_executions
+
+        fin = time.monotonic() + delai
+        while time.monotonic() < fin:
+            etat = get_executions().get(nom)
+            if etat and not etat["en_cours"]:
+                return etat
+            time.sleep(0.01)
+        self.fail(f"La tâche du plugin '{nom}' ne s'est pas terminée")
+
+    def test_duree_enregistree_dans_le_registre(self):
+        """Une exécution réussie est chronométrée et visible dans get_registre."""
+        import plugin_loader
+        from plugin_loader import get_registre, lancer_tache_plugin
+
+        appels = []
+        plugin_loader._REGISTRE["p_ok"] = {"actif": True, "erreur": None, "chemin": "", "module": object()}
+        self.addCleanup(plugin_loader._REGISTRE.pop, "p_ok", None)
+
+        self.assertTrue(lancer_tache_plugin("p_ok", appels.append, "x"))
+        self._attendre_fin("p_ok")
+
+        execution = get_registre()["p_ok"]["execution"]
+        self.assertEqual(appels, ["x"])
+        self.assertEqual(execution["dernier_statut"], "ok")
+        self.assertEqual(execution["nb_executions"], 1)
+        self.assertIsNotNone(execution["derniere_duree_s"])
+
+    def test_pas_de_chevauchement(self):
+        """Tant qu'une exécution tourne, les lancements du même plugin sont ignorés."""
+        from plugin_loader import get_executions, lancer_tache_plugin
+
+        liberer = threading.Event()
+        self.assertTrue(lancer_tache_plugin("p_lent", liberer.wait, 5))
+        self.assertFalse(lancer_tache_plugin("p_lent", liberer.wait, 5))
+        self.assertEqual(get_executions()["p_lent"]["nb_ignorees"], 1)
+
+        liberer.set()
+        self._attendre_fin("p_lent")
+        self.assertTrue(lancer_tache_plugin("p_lent", liberer.wait, 5))
+        self._attendre_fin("p_lent")
+
+    def test_exception_enregistree(self):
+        """Une exception du plugin est journalisée et n'arrête pas le pool."""
+        from plugin_loader import lancer_tache_plugin
+
+        def planter():
+            raise RuntimeError("boom")
+
+        with patch("plugin_loader.logger"):
+            lancer_tache_plugin("p_erreur", planter)
+            etat = self._attendre_fin("p_erreur")
+
+        self.assertEqual(etat["dernier_statut"], "erreur")
+        self.assertIn("RuntimeError: boom", etat["derniere_erreur"])
+
+    @patch("plugin_loader.envoyer_notif_teams")
+    @patch.dict(os.environ, {"PLUGINS_TIMEOUT": "0.05"})
+    def test_depassement_du_delai_signale(self, mock_notif):
+        """Une exécution plus longue que PLUGINS_TIMEOUT est signalée sur Teams."""
+        from plugin_loader import lancer_tache_plugin
+
+        with patch("plugin_loader.logger"):
+            lancer_tache_plugin("p_bloque", time.sleep, 0.3)
+            etat = self._attendre_fin("p_bloque")
+
+        self.assertEqual(etat["dernier_statut"], "delai_depasse")
+        self.assertEqual(etat["nb_depassements"], 1)
+        mock_notif.assert_called_once()
+        self.assertIn("p_bloque", mock_notif.call_args[0][0])
+
+    @patch("plugin_loader.envoyer_notif_teams")
+    @patch.dict(os.environ, {"PLUGINS_TIMEOUT": "0.05", "PLUGINS_THREADS": "2"})
+    def test_plugins_bloques_ne_retiennent_pas_le_pool(self, _):
+        """Au-delà du délai, l'exécution est abandonnée : le pool reste disponible et le plugin relançable."""
+        from plugin_loader import get_executions, lancer_tache_plugin, tache_annulee
+
+        liberer = threading.Event()
+        self.addCleanup(liberer.set)
+        annulations = []
+
+        def bloquer():
+            liberer.wait(5)
+            annulations.append(tache_annulee())
+
+        appels = []
+        with patch("plugin_loader.logger"):
+            self.assertTrue(lancer_tache_plugin("p_bloque_1", bloquer))
+            self.assertTrue(lancer_tache_plugin("p_bloque_2", bloquer))
+            self._attendre_fin("p_bloque_1")
+            self._attendre_fin("p_bloque_2")
+
+            # Les deux threads bloqués ont été remplacés
+            self.assertTrue(lancer_tache_plugin("p_libre", appels.append, "x"))
+            self.assertEqual(self._attendre_fin("p_libre")["dernier_statut"], "ok")
+            self.assertEqual(appels, ["x"])
+            # Le plugin bloqué peut être relancé
+            self.assertTrue(lancer_tache_plugin("p_bloque_1", appels.append, "y"))
+            self._attendre_fin("p_bloque_1")
+
+            liberer.set()
+            fin = time.monotonic() + 5
+            while len(annulations) < 2 and time.monotonic() < fin:
+                time.sleep(0.01)
+
+        self.assertEqual(annulations, [True, True])
+        executions = get_executions()
+        self.assertEqual(executions["p_bloque_2"]["dernier_statut"], "delai_depasse")
+        self.assertEqual(executions["p_bloque_1"]["nb_depassements"], 1)
+        self.assertEqual(executions["p_bloque_1"]["nb_executions"], 2)
+
+    def test_ordonnanceur_plugin(self):
+        """Les tâches planifiées par le plugin passent par le pool, pas par run_pending."""
+        import schedule
+
+        from plugin_loader import OrdonnanceurPlugin
+
+        ordonnanceur = schedule.Scheduler()
+        appels = []
+
+        def executer():
+            appels.append(threading.current_thread().name)
+
+        tache = OrdonnanceurPlugin(ordonnanceur, "p_planifie").every().day.at("08:00").do(executer)
+        tache.tag("p_planifie")
+        ordonnanceur.run_all()
+        self._attendre_fin("p_planifie")
+
+        self.assertEqual(len(ordonnanceur.get_jobs("p_planifie")), 1)
+        self.assertEqual(len(appels), 1)
+        self.assertTrue(appels[0].startswith("plugin-"))
+
+    def test_hooks_fin_de_scan(self):
+        """Seuls les plugins actifs définissant on_scan_complete sont appelés."""
+        import plugin_loader
+        from plugin_loader import (
+            executer_hooks_fin_de_scan,
+            get_executions,
+            hooks_fin_de_scan,
+        )
+
+        recus = []
+        avec_hook = MagicMock(spec=["on_scan_complete"])
+        avec_hook.on_scan_complete.side_effect = recus.append
+        en_erreur = MagicMock(spec=["on_scan_complete"])
+        en_erreur.on_scan_complete.side_effect = RuntimeError("boom")
+        registre = {
+            "a_erreur": {"actif": True, "module": en_erreur},
+            "b_hook": {"actif": True, "module": avec_hook},
+            "c_sans_hook": {"actif": True, "module": MagicMock(spec=["planifier"])},
+            "d_inactif": {"actif": False, "module": None},
+        }
+
+        with patch.dict(plugin_loader._REGISTRE, registre, clear=True):
+            hooks = hooks_fin_de_scan()
+            with patch("plugin_loader.logger"):
+                executer_hooks_fin_de_scan("contexte", hooks)
+
+        self.assertEqual([nom for nom, _ in hooks], ["a_erreur", "b_hook"])
+        # L'exception du premier plugin n'empêche pas l'appel du suivant
+        self.assertEqual(recus, ["contexte"])
+        executions = get_executions()
+        self.assertEqual(executions["a_erreur:on_scan_complete"]["dernier_statut"], "erreur")
+        self.assertEqual(executions["b_hook:on_scan_complete"]["dernier_statut"], "ok")
+
+    @patch("plugin_loader.envoyer_notif_teams")
+    @patch.dict(os.environ, {"PLUGINS_TIMEOUT": "0.05"})
+    def test_hook_fin_de_scan_bloque_abandonne(self, _):
+        """Un on_scan_complete bloqué ne retient pas la fin du scan au-delà du délai."""
+        from plugin_loader import executer_hooks_fin_de_scan, get_executions
+
+        liberer = threading.Event()
+        self.addCleanup(liberer.set)
+        debut = time.monotonic()
+        with patch("plugin_loader.logger"):
+            executer_hooks_fin_de_scan("contexte", [("p_bloque", lambda _: liberer.wait(5))])
+
+        self.assertLess(time.monotonic() - debut, 2)
+        etat = get_executions()["p_bloque:on_scan_complete"]
+        self.assertEqual(etat["dernier_statut"], "delai_depasse")
+        self.assertFalse(etat["en_cours"])
+
+    @patch.dict(os.environ, {"PLUGINS_VISITE_MAX_PCT": "10"})
+    def test_visiteurs_lents_signales(self):
+        """Un visiteur dépassant PLUGINS_VISITE_MAX_PCT % du scan est signalé."""
+        import plugin_loader
+        from plugin_loader import (
+            enregistrer_visites,
+            get_executions,
+            preparer_visiteurs,
+        )
+
+        registre = {
+            "p_lent": {"actif": True, "module": MagicMock(spec=["on_directory"])},
+            "p_rapide": {"actif": True, "module": MagicMock(spec=["on_directory"])},
+            "p_sans_visiteur": {"actif": True, "module": MagicMock(spec=["planifier"])},
+        }
+        with patch.dict(plugin_loader._REGISTRE, registre, clear=True):
+            visiteurs = preparer_visiteurs()
+
+        self.assertEqual(sorted(visiteurs), ["p_lent", "p_rapide"])
+        visiteurs["p_lent"].update(duree_s=3.0, nb_dossiers=500)
+        visiteurs["p_rapide"].update(duree_s=0.5, nb_dossiers=500)
+
+        lents = enregistrer_visites(visiteurs, 20.0)
+
+        self.assertEqual(lents, [("p_lent", 15.0)])
+        executions = get_executions()
+        self.assertEqual(executions["p_lent:on_directory"]["dernier_statut"], "lent")
+        self.assertEqual(executions["p_lent:on_directory"]["part_du_scan_pct"], 15.0)
+        self.assertEqual(executions["p_lent:on_directory"]["nb_depassements"], 1)
+        self.assertEqual(executions["p_rapide:on_directory"]["dernier_statut"], "ok")
+        self.assertEqual(executions["p_rapide:on_directory"]["nb_dossiers"], 500)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,145 @@
+"""
+Tests pour les prévisions de croissance des dossiers.
+Vérifie l'ajustement vectorisé des tendances, le calcul des jours avant
+saturation et l'enregistrement dans folder_forecasts.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from previsions import ajuster_tendances, calculer_previsions, jours_avant_saturation
+
+
+class TestAjusterTendances(unittest.TestCase):
+    """Tests pour la fonction ajuster_tendances."""
+
+    def test_pentes_de_tous_les_dossiers(self):
+        """Chaque ligne reçoit sa pente ; les trous reprennent la dernière taille connue."""
+        jours = np.array([0.0, 1.0, 2.0, 3.0])
+        matrice = np.array([
+            [100.0, 110.0, 120.0, 130.0],
+            [500.0, np.nan, np.nan, 500.0],
+            [80.0, 60.0, np.nan, 20.0],
+        ])
+
+        pentes, nb_points = ajuster_tendances(jours, matrice)
+
+        # Troisième ligne : le trou vaut 60 (et non une valeur ignorée, qui donnerait -20)
+        np.testing.assert_allclose(pentes, [10.0, 0.0, -18.0])
+        self.assertEqual(nb_points.tolist(), [4, 4, 4])
+
+    def test_dossier_recent_sans_assez_de_points(self):
+        """Un dossier apparu au dernier scan n'a pas de tendance."""
+        jours = np.array([0.0, 1.0, 2.0])
+        matrice = np.array([[np.nan, np.nan, 50.0]])
+
+        pentes, nb_points = ajuster_tendances(jours, matrice)
+
+        self.assertTrue(np.isnan(pentes[0]))
+        self.assertEqual(nb_points[0], 1)
+
+    def test_grand_dossier_constant_stable(self):
+        """Un dossier de grande taille inchangée a une pente nulle, sans date de saturation."""
+        jours = np.array([0.0, 0.7, 1.3, 2.9, 4.1, 30.2, 61.7, 89.9])
+        matrice = np.full((1, len(jours)), 123456789.0)
+
+        pentes, _ = ajuster_tendances(jours, matrice)
+
+        self.assertEqual(pentes[0], 0.0)
+        self.assertEqual(jours_avant_saturation(pentes, 10**9), [None])
+
+
+class TestJoursAvantSaturation(unittest.TestCase):
+    """Tests pour la fonction jours_avant_saturation."""
+
+    def test_seuls_les_dossiers_en_croissance(self):
+        """Les dossiers stables, en baisse ou sans tendance n'ont pas de date."""
+        pentes = np.array([10.0, 0.0, -5.0, np.nan])
+        self.assertEqual(jours_avant_saturation(pentes, 1000), [100, None, None, None])
+
+    def test_espace_libre_inconnu(self):
+        """Sans espace libre connu, aucune date n'est calculée."""
+        self.assertEqual(jours_avant_saturation(np.array([10.0]), None), [None])
+
+    def test_plafonne_a_l_horizon(self):
+        """Une croissance infime sur un grand volume ne dépasse pas la capacité d'un INT."""
+        self.assertEqual(jours_avant_saturation(np.array([1.0]), 10**12), [36500])
+
+
+class TestCalculerPrevisions(unittest.TestCase):
+    """Tests pour la fonction calculer_previsions."""
+
+    @patch.dict(os.environ, {"PREVISION_FENETRE_JOURS": "0"})
+    def test_desactive(self):
+        """Une fenêtre de 0 jour désactive les prévisions."""
+        mock_conn = MagicMock()
+        self.assertEqual(calculer_previsions(mock_conn), 0)
+        mock_conn.cursor.assert_not_called()
+
+    @patch.dict(os.environ, {"PREVISION_FENETRE_JOURS": "90"})
+    def test_pas_assez_de_scans(self):
+        """Moins de trois scans complétés : rien n'est calculé."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.return_value = [(1, 0), (2, 86400)]
+
+        self.assertEqual(calculer_previsions(mock_conn), 0)
+        mock_cur.executemany.assert_not_called()
+
+    @patch("previsions._espace_libre_kb", return_value=3000)
+    @patch.dict(os.environ, {"PREVISION_FENETRE_JOURS": "90", "CHEMINS_RACINES": "D:\\Data"})
+    def test_enregistre_les_tendances_par_racine(self, _mock_libre):
+        """Une matrice par racine : tailles de départ puis changements, tendance enregistrée."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.side_effect = [
+            # Scans complétés de la fenêtre (id, horodatage)
+            [(10, 0), (11, 86400), (12, 172800)],
+            # Dossiers de la racine
+            [(1,), (2,)],
+            # Tailles au premier scan de la fenêtre
+            [(1, 100), (2, 40)],
+            # Changements ]10, 12] (id_folder, id_scan, size_kb)
+            [(1, 11, 110), (1, 12, 120)],
+        ]
+
+        self.assertEqual(calculer_previsions(mock_conn), 2)
+
+        requete, valeurs = mock_cur.executemany.call_args[0]
+        self.assertIn("INSERT INTO folder_forecasts", requete)
+        self.assertEqual(valeurs[0][:2], (1, 12))
+        self.assertAlmostEqual(valeurs[0][2], 10.0)
+        self.assertEqual(valeurs[0][3], 300)
+        self.assertAlmostEqual(valeurs[1][2], 0.0)
+        self.assertIsNone(valeurs[1][3])
+
+    @patch("previsions._espace_libre_kb", return_value=None)
+    @patch.dict(os.environ, {"PREVISION_FENETRE_JOURS": "90", "CHEMINS_RACINES": "D:\\Data"})
+    def test_sous_arbre_d_une_racine_windows(self, _mock_libre):
+        """Les dossiers d'une racine D:\\Data sont lus par parent_id, sans LIKE sur le backslash."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.side_effect = [
+            [(10, 0), (11, 86400), (12, 172800)],
+            [],
+        ]
+
+        calculer_previsions(mock_conn)
+
+        requete, params = mock_cur.execute.call_args_list[2][0]
+        self.assertIn("f.parent_id = s.id_folder", requete)
+        self.assertNotIn("LIKE", requete)
+        self.assertEqual(params, ("D:\\Data", "D:\\Data"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+Tests pour la supervision multi-processus.
+Vérifie publier_statut, relayer_statuts et surveiller_processus.
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import processus
+from processus import (
+    boucle_supervision,
+    declarer_processus,
+    demarrer_processus,
+    get_statuts,
+    processus_actif,
+    publier_statut,
+    relayer_statuts,
+    surveiller_processus,
+)
+
+
+class TestStatuts(unittest.TestCase):
+    """Tests pour la publication et le relais des statuts."""
+
+    def setUp(self):
+        processus._STATUTS.clear()
+        processus._files_abonnes.clear()
+        self.addCleanup(processus._STATUTS.clear)
+        self.addCleanup(processus._files_abonnes.clear)
+
+    def test_publier_sans_file_est_visible_localement(self):
+        """Hors processus enfant, le statut est directement lisible."""
+        publier_statut("scanner", etat="en_cours", id_scan=4)
+        statut = get_statuts()["scanner"]
+        self.assertEqual(statut["etat"], "en_cours")
+        self.assertEqual(statut["id_scan"], 4)
+
+    def test_publier_depuis_un_enfant_passe_par_la_file(self):
+        """Dans un enfant, le statut part vers la file du superviseur."""
+        file_statuts = queue.Queue()
+        with patch.object(processus, "_file_publication", file_statuts):
+            publier_statut("scanner", etat="termine")
+        self.assertEqual(file_statuts.get_nowait()["etat"], "termine")
+        self.assertEqual(get_statuts(), {})
+
+    def test_relayer_statuts_vers_les_abonnes(self):
+        """Le superviseur mémorise les statuts reçus et les relaie à l'Intranet."""
+        file_statuts = queue.Queue()
+        file_intranet = queue.Queue()
+        processus.abonner(file_intranet)
+        file_statuts.put({"processus": "scanner", "etat": "en_cours"})
+
+        relayer_statuts(file_statuts)
+
+        self.assertEqual(get_statuts()["scanner"]["etat"], "en_cours")
+        self.assertEqual(file_intranet.get_nowait()["processus"], "scanner")
+
+    @patch("processus.arreter_processus")
+    @patch("processus.surveiller_processus")
+    def test_statut_relaye_sans_attendre_la_surveillance(self, mock_surveiller, _):
+        """Un statut publié entre deux vérifications est relayé dès son arrivée."""
+        file_statuts = queue.Queue()
+        file_intranet = queue.Queue()
+        processus.abonner(file_intranet)
+        arret = threading.Event()
+        boucle = threading.Thread(target=boucle_supervision, args=(file_statuts, arret))
+        boucle.start()
+        self.addCleanup(boucle.join)
+        self.addCleanup(arret.set)
+
+        time.sleep(0.1)
+        debut = time.monotonic()
+        file_statuts.put({"processus": "progression", "etat": "en_cours"})
+        message = file_intranet.get(timeout=processus.INTERVALLE_SURVEILLANCE)
+
+        self.assertEqual(message["processus"], "progression")
+        self.assertLess(time.monotonic() - debut, 0.5)
+        self.assertEqual(mock_surveiller.call_count, 1)
+
+    @patch("intranet.queries.invalider_cache")
+    def test_intranet_vide_son_cache_a_la_fin_du_scan(self, mock_invalider):
+        """L'Intranet vide son cache quand le scan se termine, y compris en échec."""
+        processus._a_reception_intranet({"processus": "scanner", "etat": "en_cours"})
+        mock_invalider.assert_not_called()
+        for etat in ("termine", "echec"):
+            processus._a_reception_intranet({"processus": "scanner", "etat": etat})
+        self.assertEqual(mock_invalider.call_count, 2)
+
+
+class TestSurveillerProcessus(unittest.TestCase):
+    """Tests pour la fonction surveiller_processus."""
+
+    def setUp(self):
+        processus._PROCESSUS.clear()
+        self.addCleanup(processus._PROCESSUS.clear)
+        patcher = patch("processus.multiprocessing.Process")
+        self.mock_process = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _arreter(self, code):
+        """Simule l'arrêt du processus enfant courant avec ce code de sortie."""
+        self.mock_process.return_value.is_alive.return_value = False
+        self.mock_process.return_value.exitcode = code
+
+    @patch("processus.time.monotonic")
+    def test_enfant_plante_relance_apres_delai(self, mock_temps):
+        """Un enfant arrêté est relancé après DELAI_REDEMARRAGE_MIN, puis le délai double."""
+        mock_temps.return_value = 1000.0
+        declarer_processus("intranet", print)
+        demarrer_processus("intranet")
+        self._arreter(1)
+
+        surveiller_processus()
+        self.assertEqual(self.mock_process.return_value.start.call_count, 1)
+        self.assertTrue(processus_actif("intranet"))
+
+        mock_temps.return_value = 1000.0 + processus.DELAI_REDEMARRAGE_MIN
+        surveiller_processus()
+        self.assertEqual(self.mock_process.return_value.start.call_count, 2)
+        info = processus._PROCESSUS["intranet"]
+        self.assertEqual(info["redemarrages"], 1)
+        self.assertEqual(info["delai"], processus.DELAI_REDEMARRAGE_MIN * 2)
+
+    def test_enfant_ponctuel_termine_est_retire(self):
+        """Un scan terminé normalement n'est pas relancé."""
+        declarer_processus("scanner", print, ponctuel=True)
+        demarrer_processus("scanner")
+        self._arreter(0)
+
+        surveiller_processus()
+
+        self.assertNotIn("scanner", processus._PROCESSUS)
+        self.assertFalse(processus_actif("scanner"))
+
+    def test_max_redemarrages_atteint_abandonne(self):
+        """Au-delà de max_redemarrages, l'enfant n'est plus relancé."""
+        declarer_processus("scanner", print, ponctuel=True, max_redemarrages=0)
+        demarrer_processus("scanner")
+        self._arreter(1)
+
+        surveiller_processus()
+
+        self.assertNotIn("scanner", processus._PROCESSUS)
+        self.assertEqual(self.mock_process.return_value.start.call_count, 1)
+
+    def test_a_l_arret_appele_sur_plantage(self):
+        """a_l_arret reçoit le code d'un enfant planté, pas celui d'un enfant ponctuel terminé."""
+        codes = []
+        declarer_processus("scanner", print, ponctuel=True, a_l_arret=codes.append)
+        demarrer_processus("scanner")
+        self._arreter(-9)
+
+        surveiller_processus()
+        surveiller_processus()
+
+        self.assertEqual(codes, [-9])
+
+        declarer_processus("scanner", print, ponctuel=True, a_l_arret=codes.append)
+        demarrer_processus("scanner")
+        self._arreter(0)
+        surveiller_processus()
+
+        self.assertEqual(codes, [-9])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Tests pour le suivi de progression du scan en cours.
+Vérifie les compteurs, le calcul des débits et la publication finale.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import progression
+from fichiers import scanner_arborescence
+
+
+class TestProgression(unittest.TestCase):
+    """Tests pour les compteurs de progression."""
+
+    def setUp(self):
+        progression._COMPTEURS.clear()
+        self.addCleanup(progression._COMPTEURS.clear)
+
+    def test_compteurs_inactifs_hors_scan(self):
+        """Sans scan en cours, les appels sont ignorés et l'instantané est vide."""
+        progression.compter(dossiers=3, fichiers=10, octets=2048)
+        progression.definir_phase("structure", "C:\\Racine")
+        progression.definir_file_attente(5)
+        self.assertEqual(progression.instantane(), {})
+
+    def test_compteurs_et_debits(self):
+        """Les compteurs s'accumulent et les débits sont calculés à la lecture."""
+        progression._reinitialiser(7)
+        progression.definir_phase("structure", "C:\\Racine")
+        progression.compter(dossiers=2, fichiers=10, octets=4096)
+        progression.definir_file_attente(3)
+
+        etat = progression.instantane()
+        self.assertEqual(etat["id_scan"], 7)
+        self.assertEqual(etat["racine"], "C:\\Racine")
+        self.assertEqual(etat["phase"], "structure")
+        self.assertEqual(etat["dossiers"], 2)
+        self.assertEqual(etat["fichiers"], 10)
+        self.assertEqual(etat["octets"], 4096)
+        self.assertEqual(etat["file_attente"], 3)
+        self.assertGreater(etat["dossiers_par_sec"], 0)
+
+    def test_changement_de_phase_garde_la_racine(self):
+        """Une nouvelle phase sans racine conserve la racine et vide la file."""
+        progression._reinitialiser(1)
+        progression.definir_phase("tailles", "C:\\Racine")
+        progression.definir_file_attente(8)
+        progression.definir_phase("agregation")
+
+        etat = progression.instantane()
+        self.assertEqual(etat["racine"], "C:\\Racine")
+        self.assertEqual(etat["phase"], "agregation")
+        self.assertEqual(etat["file_attente"], 0)
+
+    @patch("progression.publier_statut")
+    def test_terminer_suivi_publie_etat_final(self, mock_publier):
+        """terminer_suivi publie l'état final puis remet les compteurs à zéro."""
+        progression._reinitialiser(5)
+        progression.compter(dossiers=4)
+
+        progression.terminer_suivi("termine")
+
+        nom, = mock_publier.call_args.args
+        etat = mock_publier.call_args.kwargs
+        self.assertEqual(nom, "progression")
+        self.assertEqual(etat["etat"], "termine")
+        self.assertEqual(etat["phase"], "fin")
+        self.assertEqual(etat["dossiers"], 4)
+        self.assertEqual(progression._COMPTEURS, {})
+
+    @patch("fichiers._calculer_taille_fichiers_dossier")
+    @patch("fichiers.os.walk")
+    def test_scanner_arborescence_alimente_les_compteurs(self, mock_walk, mock_taille):
+        """Le parcours compte dossiers, fichiers et octets vus."""
+        mock_walk.return_value = [
+            ("racine", ["a"], ["f1", "f2"]),
+            (os.path.join("racine", "a"), [], ["f3"]),
+        ]
+        mock_taille.side_effect = lambda dossier, fichiers: (dossier, 100 * len(fichiers))
+        progression._reinitialiser(2)
+
+        scanner_arborescence("racine")
+
+        etat = progression.instantane()
+        self.assertEqual(etat["racine"], "racine")
+        self.assertEqual(etat["dossiers"], 2)
+        self.assertEqual(etat["fichiers"], 3)
+        self.assertEqual(etat["octets"], 300)
+        self.assertEqual(etat["file_attente"], 0)
+
+    @patch("fichiers._calculer_taille_fichiers_dossier")
+    @patch("fichiers.os.walk")
+    def test_visiteurs_appeles_pour_chaque_dossier(self, mock_walk, mock_taille):
+        """Chaque visiteur reçoit les entrées du dossier ; un visiteur en erreur est écarté."""
+        mock_walk.return_value = [
+            ("racine", ["a"], ["f1"]),
+            (os.path.join("racine", "a"), [], ["f2", "f3"]),
+        ]
+        mock_taille.side_effect = lambda dossier, fichiers: (dossier, 0)
+        recus = []
+
+        def planter(*args):
+            raise RuntimeError("boom")
+
+        visiteurs = {
+            "p_ok": {"fonction": lambda *args: recus.append(args), "duree_s": 0.0, "nb_dossiers": 0, "erreur": None},
+            "p_erreur": {"fonction": planter, "duree_s": 0.0, "nb_dossiers": 0, "erreur": None},
+        }
+
+        with patch("fichiers.logger"):
+            scanner_arborescence("racine", visiteurs=visiteurs)
+
+        self.assertEqual(recus, [
+            ("racine", ("a",), ("f1",)),
+            (os.path.join("racine", "a"), (), ("f2", "f3")),
+        ])
+        self.assertEqual(visiteurs["p_ok"]["nb_dossiers"], 2)
+        self.assertGreater(visiteurs["p_ok"]["duree_s"], 0)
+        self.assertEqual(visiteurs["p_erreur"]["nb_dossiers"], 1)
+        self.assertIn("RuntimeError: boom", visiteurs["p_erreur"]["erreur"])
+
+
+if __name__ == "__main__":
+    unittest.main()
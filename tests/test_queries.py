@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 import unittest
@@ -12,12 +13,32 @@ from intranet.queries import (
     get_scans_history,
     get_scan_details,
     get_stats_dashboard,
+    get_enfants_dossier,
+    get_sous_arbre,
+    get_enfants_page,
+    iterer_changements_scan,
+    get_diff_scans,
+    get_croissances_rapides,
+    _tailles_au_scan,
+    rechercher_dossiers,
+    get_historique_dossier,
+    _lttb,
+    _enrichir_avec_taille,
+    _cache_par_scan,
+    invalider_cache,
+    get_stats_cache,
 )
 
 
 class TestQueries(unittest.TestCase):
     """Tests pour les fonctions SQL de l'Intranet (intranet/queries.py)."""
 
+    def setUp(self):
+        # Sans version de scan, le cache est contourné
+        patcher = patch("intranet.queries._version_scan_courante", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     @patch("intranet.queries.mysql.connector.connect")
     def test_get_connexion_reussie(self, mock_connect):
         """Vérifie que la connexion est retournée si réussie."""
@@ -25,6 +46,29 @@ class TestQueries(unittest.TestCase):
         mock_connect.return_value = mock_conn
         self.assertEqual(get_connexion(), mock_conn)
 
+    @patch.dict(os.environ, {"INTRA_TIMEOUT": "12"})
+    @patch("intranet.queries.mysql.connector.connect")
+    def test_get_connexion_borne_la_duree_des_requetes(self, mock_connect):
+        """Chaque connexion de l'Intranet limite ses requêtes à INTRA_TIMEOUT secondes."""
+        mock_conn = MagicMock()
+        mock_connect.return_value = mock_conn
+        # Curseur brut, relevé avant que get_connexion n'enveloppe mock_conn.cursor
+        mock_cur = mock_conn.cursor.return_value
+        get_connexion()
+        mock_cur.execute.assert_called_once_with(
+            "SET SESSION max_statement_time = %s", (12,)
+        )
+
+    @patch("intranet.queries.mysql.connector.connect")
+    def test_get_connexion_fermee_si_borne_refusee(self, mock_connect):
+        """Si la limite de durée ne peut être posée, la connexion est fermée et None retourné."""
+        import mysql.connector
+        mock_conn = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value.execute.side_effect = mysql.connector.Error("Erreur")
+        self.assertIsNone(get_connexion())
+        mock_conn.close.assert_called_once()
+
     @patch("intranet.queries.mysql.connector.connect")
     def test_get_connexion_echec(self, mock_connect):
         """Vérifie que None est retourné en cas d'erreur de connexion."""
@@ -78,13 +122,16 @@ class TestQueries(unittest.TestCase):
         mock_conn.cursor.return_value = mock_cur
         
         # Mock des retours fetchone() et fetchall()
+        # 0. pas encore de ligne dashboard_stats : calcul depuis les tables
         # 1. dernier_scan
         # 2. total_dossiers
         # 3. total_scans
         mock_cur.fetchone.side_effect = [
+            None,
             {"id_scan": 2, "date_": "2026-04-24", "status": "completed"},
             {"total": 1500},
-            {"total": 10}
+            {"total": 10},
+            None,  # pas de résumé précalculé : ancien calcul
         ]
         
         # 4. deux_derniers scans (fetchall)
@@ -102,6 +149,578 @@ class TestQueries(unittest.TestCase):
         self.assertEqual(len(resultat["top_changements"]), 1)
         mock_conn.close.assert_called_once()
 
+    @patch("intranet.queries.get_connexion")
+    def test_get_stats_dashboard_lit_scan_summary(self, mock_get_conn):
+        """Le top des changements est lu dans scan_summary quand il existe."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        top = [{"id_folder": i, "path": f"C:\\d{i}", "diff_kb": 100 - i} for i in range(8)]
+        mock_cur.fetchone.side_effect = [
+            None,
+            {"id_scan": 2, "date_": "2026-04-24", "status": "completed"},
+            {"total": 1500},
+            {"total": 10},
+            {"top_movers": json.dumps(top)},
+        ]
+        mock_cur.fetchall.return_value = [{"id_scan": 2}, {"id_scan": 1}]
+
+        resultat = get_stats_dashboard()
+
+        self.assertEqual(resultat["top_changements"], top[:5])
+        requetes = [c[0][0] for c in mock_cur.execute.call_args_list]
+        self.assertFalse(any("JOIN sizes s2" in r for r in requetes))
+
+    @patch("intranet.queries.get_connexion")
+    def test_get_stats_dashboard_lit_dashboard_stats(self, mock_get_conn):
+        """Avec dashboard_stats, le tableau de bord tient en une seule requête."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        top = [{"id_folder": i, "path": f"C:\\d{i}", "diff_kb": 100 - i} for i in range(8)]
+        mock_cur.fetchone.return_value = {
+            "id_scan": 5, "date_": "2026-04-24", "status": "in_progress",
+            "total_folders": 1500, "total_scans": 4, "top_movers": json.dumps(top),
+        }
+
+        resultat = get_stats_dashboard()
+
+        self.assertEqual(mock_cur.execute.call_count, 1)
+        self.assertEqual(resultat["dernier_scan"]["status"], "in_progress")
+        self.assertEqual(resultat["total_dossiers"], 1500)
+        self.assertEqual(resultat["total_scans"], 4)
+        self.assertEqual(resultat["top_changements"], top[:5])
+
+    @patch("intranet.queries.get_connexion")
+    def test_get_scan_details_lit_scan_events(self, mock_get_conn):
+        """Les alertes d'un scan résumé viennent de scan_events."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchone.side_effect = [
+            {"id_scan": 3, "date_": None, "date_end": None, "status": "completed",
+             "total_folders": 10, "total_size_kb": 5000, "duration_sec": 4},
+            {"variation_kb": 1200},
+        ]
+        mock_cur.fetchall.return_value = [
+            {"event_type": "modification", "id_folder": 4, "path": "C:\\x",
+             "size_before_kb": 100, "size_after_kb": 1300},
+        ]
+
+        resultat = get_scan_details(3)
+
+        self.assertEqual(resultat["resume"]["variation_kb"], 1200)
+        self.assertEqual(
+            resultat["alertes"],
+            [{"type": "modification", "id_folder": 4, "chemin": "C:\\x",
+              "diff_kb": 1200, "taille_kb": 1300}],
+        )
+
+    @patch("intranet.queries.get_connexion")
+    def test_get_enfants_dossier_par_parent_id(self, mock_get_conn):
+        """Les enfants sont résolus par parent_id à partir du chemin du parent."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.return_value = []
+
+        self.assertEqual(get_enfants_dossier("D:\\Data"), [])
+        requete, params = mock_cur.execute.call_args[0]
+        self.assertIn("f.parent_id = p.id_folder", requete)
+        self.assertIn("p.path_hash = UNHEX(MD5(%s))", requete)
+        self.assertEqual(params, ("D:\\Data", "D:\\Data"))
+        mock_conn.close.assert_called_once()
+
+    @patch("intranet.queries.get_connexion")
+    def test_get_sous_arbre_imbrique_les_niveaux(self, mock_get_conn):
+        """Le sous-arbre est lu en une requête puis imbriqué niveau par niveau."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        base = {"is_new": 0, "is_deleted": 0, "delta_kb": 0, "has_children": 0}
+        mock_cur.fetchall.return_value = [
+            {**base, "id_folder": 2, "parent_id": 1, "path": "D:\\Data\\A",
+             "profondeur": 1, "size_kb": 300, "delta_kb": 200, "has_children": 1},
+            {**base, "id_folder": 3, "parent_id": 1, "path": "D:\\Data\\B",
+             "profondeur": 1, "size_kb": 50},
+            {**base, "id_folder": 4, "parent_id": 2, "path": "D:\\Data\\A\\X",
+             "profondeur": 2, "size_kb": 300, "has_children": 1},
+        ]
+
+        arbre = get_sous_arbre("D:\\Data", 2)
+
+        requete, params = mock_cur.execute.call_args[0]
+        self.assertIn("WITH RECURSIVE", requete)
+        self.assertEqual(params[:3], ("D:\\Data", "D:\\Data", 2))
+        self.assertFalse(arbre["tronque"])
+        a, b = arbre["children"]
+        self.assertEqual(a["delta_kb"], 200)
+        self.assertEqual(b["delta_kb"], 0)
+        self.assertEqual([c["id_folder"] for c in a["children"]], [4])
+        # Dernier niveau chargé : ses enfants restent à charger
+        self.assertTrue(a["children"][0]["has_children"])
+        self.assertIsNone(a["children"][0]["children"])
+
+    @patch("intranet.queries.get_connexion")
+    def test_get_enfants_page_keyset_et_autres(self, mock_get_conn):
+        """Page triée par taille : curseur de la page suivante et reste agrégé."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        ligne = {"is_new": 0, "is_deleted": 0, "delta_kb": 0}
+        mock_cur.fetchone.side_effect = [
+            {"id_folder": 1},                # parent
+            {"nb": 40, "size_kb": 900},      # reste après la page
+            {"nb": 42},                      # total
+        ]
+        mock_cur.fetchall.side_effect = [
+            [
+                {**ligne, "id_folder": 5, "path": "D:\\P\\a", "name": "a", "size_kb": 500},
+                {**ligne, "id_folder": 6, "path": "D:\\P\\b", "name": "b", "size_kb": 300},
+                {**ligne, "id_folder": 7, "path": "D:\\P\\c", "name": "c", "size_kb": 300},
+            ],
+            [],  # has_children
+        ]
+
+        page = get_enfants_page("D:\\P", "taille", None, 2)
+
+        requete, params = mock_cur.execute.call_args_list[1][0]
+        self.assertIn("ORDER BY f.size_kb DESC, f.id_folder DESC", requete)
+        self.assertEqual(params, (1, 3))
+        self.assertEqual([i["id_folder"] for i in page["items"]], [5, 6])
+        self.assertEqual(json.loads(page["suivant"]), [300, 6])
+        self.assertEqual(page["autres"], {"nb": 40, "size_kb": 900})
+        self.assertEqual(page["total"], 42)
+
+    @patch("intranet.queries.get_connexion")
+    def test_get_enfants_page_suivante_par_nom(self, mock_get_conn):
+        """Avec un curseur, la requête reprend après (name, id_folder) sans recompter."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchone.return_value = {"id_folder": 1}
+        mock_cur.fetchall.return_value = []
+
+        page = get_enfants_page("D:\\P", "nom", json.dumps(["m", 9]), 50)
+
+        requete, params = mock_cur.execute.call_args_list[1][0]
+        self.assertIn("f.name > %s OR (f.name = %s AND f.id_folder > %s)", requete)
+        self.assertEqual(params, (1, "m", "m", 9, 51))
+        self.assertIsNone(page["suivant"])
+        self.assertIsNone(page["total"])
+
+    @patch("intranet.queries.get_connexion")
+    def test_get_croissances_rapides(self, mock_get_conn):
+        """Le classement est lu dans folder_forecasts, trié par croissance."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        ligne = {"id_folder": 1, "path": "D:\\A", "size_kb": 10, "growth_kb_day": 5.0,
+                 "days_to_full": 12, "nb_points": 30}
+        mock_cur.fetchall.return_value = [ligne]
+
+        self.assertEqual(get_croissances_rapides(5), [ligne])
+        requete, params = mock_cur.execute.call_args[0]
+        self.assertIn("ORDER BY ff.growth_kb_day DESC", requete)
+        self.assertEqual(params, (5,))
+
+    @patch("db.scans_approximatifs", return_value=[])
+    @patch("db.calculer_diff_scans")
+    @patch("intranet.queries.get_connexion")
+    def test_get_diff_scans(self, mock_get_conn, mock_diff, _):
+        """Le diff renvoie les deux scans (dans l'ordre) et les dossiers classés."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.return_value = [
+            {"id_scan": 3, "date_": "2026-04-01", "status": "completed"},
+            {"id_scan": 8, "date_": "2026-04-24", "status": "completed"},
+        ]
+        mock_diff.return_value = [{"id_folder": 1, "diff_kb": 50}]
+
+        resultat = get_diff_scans(8, 3, 20)
+
+        mock_diff.assert_called_once_with(mock_conn, 3, 8, 20, None)
+        self.assertEqual(resultat["scan_a"]["id_scan"], 3)
+        self.assertEqual(resultat["dossiers"], [{"id_folder": 1, "diff_kb": 50}])
+        self.assertFalse(resultat["approximatif"])
+
+    @patch("db.scans_approximatifs", return_value=[3])
+    @patch("db.calculer_diff_scans", return_value=[])
+    @patch("intranet.queries.get_connexion")
+    def test_get_diff_scans_signale_un_scan_compacte(self, mock_get_conn, _, mock_approx):
+        """Un diff impliquant un scan sous-échantillonné par la rétention est signalé."""
+        mock_conn = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value.fetchall.return_value = [
+            {"id_scan": 3, "date_": "2026-04-01", "status": "completed"},
+            {"id_scan": 8, "date_": "2026-04-24", "status": "completed"},
+        ]
+
+        resultat = get_diff_scans(3, 8)
+
+        mock_approx.assert_called_once_with(mock_conn, [3, 8])
+        self.assertTrue(resultat["approximatif"])
+
+    @patch("intranet.queries.get_connexion")
+    def test_get_diff_scans_scan_inconnu(self, mock_get_conn):
+        """Un scan inexistant donne un résultat vide (404 côté API)."""
+        mock_conn = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value.fetchall.return_value = [
+            {"id_scan": 3, "date_": "2026-04-01", "status": "completed"},
+        ]
+        self.assertEqual(get_diff_scans(3, 99), {})
+
+    @patch("intranet.queries.TAILLE_LOT_EXPORT", 2)
+    @patch("intranet.queries.get_connexion")
+    def test_export_changements_scan_par_lots(self, mock_get_conn):
+        """L'export lit par lots sur un curseur non bufferisé et ferme la connexion à la fin."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchmany.side_effect = [
+            [("D:\\A", 100, 150), ("D:\\B", 0, 10)],
+            [("D:\\C", 50, 0)],
+            [],
+        ]
+
+        lignes = list(iterer_changements_scan(7))
+
+        mock_get_conn.assert_called_once_with(borner_duree=False)
+        mock_conn.cursor.assert_called_once_with(buffered=False)
+        mock_cur.fetchmany.assert_called_with(2)
+        self.assertEqual(mock_cur.execute.call_args[0][1], (7,))
+        self.assertEqual(lignes[0], ("D:\\A", 100, 150, 50))
+        self.assertEqual(lignes[2], ("D:\\C", 50, 0, -50))
+        mock_conn.close.assert_called_once()
+
+    @patch("intranet.queries.get_connexion")
+    def test_export_interrompu_sur_erreur(self, mock_get_conn):
+        """Une erreur en cours d'export est propagée (pas de fichier tronqué terminé normalement)."""
+        import mysql.connector
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchmany.side_effect = [
+            [("D:\\A", 100, 150)],
+            mysql.connector.Error("Query execution was interrupted"),
+        ]
+
+        lignes = iterer_changements_scan(7)
+        self.assertEqual(next(lignes), ("D:\\A", 100, 150, 50))
+        with (
+            self.assertLogs("intranet.queries", level="ERROR"),
+            self.assertRaises(mysql.connector.Error),
+        ):
+            next(lignes)
+        mock_conn.close.assert_called_once()
+
+    @patch("intranet.queries.MAX_NOEUDS_SOUS_ARBRE", 2)
+    @patch("intranet.queries.get_connexion")
+    def test_get_sous_arbre_tronque_le_dernier_niveau(self, mock_get_conn):
+        """Au-delà de la limite, le niveau incomplet est retiré en entier."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        base = {"is_new": 0, "is_deleted": 0, "delta_kb": 0,
+                "has_children": 1, "size_kb": 1}
+        mock_cur.fetchall.return_value = [
+            {**base, "id_folder": 2, "parent_id": 1, "path": "D:\\A", "profondeur": 1},
+            {**base, "id_folder": 3, "parent_id": 2, "path": "D:\\A\\B", "profondeur": 2},
+            {**base, "id_folder": 4, "parent_id": 2, "path": "D:\\A\\C", "profondeur": 2},
+        ]
+
+        arbre = get_sous_arbre("D:\\", 2)
+
+        self.assertTrue(arbre["tronque"])
+        self.assertEqual(arbre["profondeur"], 1)
+        self.assertEqual(len(arbre["children"]), 1)
+        self.assertIsNone(arbre["children"][0]["children"])
+
+    @patch("db.scans_approximatifs", return_value=[])
+    @patch("intranet.queries.get_connexion")
+    def test_get_sous_arbre_a_la_date_d_un_scan(self, mock_get_conn, _):
+        """L'arbre au scan X part du point de contrôle et rejoue les lignes sizes suivantes."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        base = {"is_new": 0, "is_deleted": 0, "delta_kb": 0, "has_children": 0,
+                "size_kb": 999, "parent_id": 1, "profondeur": 1}
+        point_de_controle = [{"id_folder": 2, "size_kb": 100}, {"id_folder": 4, "size_kb": 70}]
+        # Point de contrôle du scan 10, scan complété précédent, point de contrôle du scan 9
+        mock_cur.fetchone.side_effect = [{"id_scan": 5}, {"id_scan": 9}, {"id_scan": 5}]
+        mock_cur.fetchall.side_effect = [
+            [
+                {**base, "id_folder": 2, "path": "D:\\A"},
+                {**base, "id_folder": 3, "path": "D:\\B"},
+                {**base, "id_folder": 4, "path": "D:\\C", "is_deleted": 1},
+                {**base, "id_folder": 5, "path": "D:\\D", "is_new": 1},
+            ],
+            # Scan 10 : point de contrôle 5 puis changements ]5, 10]
+            point_de_controle,
+            [{"id_folder": 4, "size_kb": 0}, {"id_folder": 2, "size_kb": 150},
+             {"id_folder": 3, "size_kb": 20}],
+            # Scan 9 : point de contrôle 5 puis changements ]5, 9]
+            point_de_controle,
+            [{"id_folder": 4, "size_kb": 0}],
+        ]
+
+        arbre = get_sous_arbre("D:\\", 1, id_scan=10)
+
+        requete, params = mock_cur.execute.call_args_list[3][0]
+        self.assertIn("id_scan > %s AND id_scan <= %s", requete)
+        self.assertEqual(params[-2:], (5, 10))
+        # C supprimé avant le scan 10, D créé après : absents
+        a, b = arbre["children"]
+        self.assertEqual((a["size_kb"], a["delta_kb"], a["is_new"]), (150, 50, False))
+        self.assertEqual((b["size_kb"], b["delta_kb"], b["is_new"]), (20, 20, True))
+        self.assertEqual(arbre["id_scan"], 10)
+        self.assertFalse(arbre["approximatif"])
+
+    @patch("db.scans_approximatifs", return_value=[])
+    @patch("intranet.queries._tailles_au_scan")
+    @patch("intranet.queries.get_connexion")
+    def test_get_sous_arbre_compare_au_scan_complete_precedent(self, mock_get_conn, mock_tailles, _):
+        """Les scans 8 et 9 ont échoué : les variations du scan 10 partent du scan 7."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.return_value = [
+            {"id_folder": 2, "parent_id": 1, "path": "D:\\A", "profondeur": 1, "is_new": 0,
+             "is_deleted": 0, "delta_kb": 0, "has_children": 0, "size_kb": 999},
+        ]
+        mock_cur.fetchone.return_value = {"id_scan": 7}
+        mock_tailles.side_effect = [{2: 150}, {2: 100}]
+
+        arbre = get_sous_arbre("D:\\", 1, id_scan=10)
+
+        self.assertEqual([c[0][2] for c in mock_tailles.call_args_list], [10, 7])
+        self.assertIn("status = 'completed' AND id_scan < %s", mock_cur.execute.call_args_list[1][0][0])
+        self.assertEqual(arbre["children"][0]["delta_kb"], 50)
+
+    def test_tailles_au_scan_sans_point_de_controle(self):
+        """Sans point de contrôle, la dernière ligne sizes <= X est lue par dossier."""
+        mock_cur = MagicMock()
+        mock_cur.fetchone.return_value = {"id_scan": None}
+        mock_cur.fetchall.return_value = [{"id_folder": 2, "size_kb": 40}]
+
+        tailles = _tailles_au_scan(mock_cur, [2, 3], 7)
+
+        requete, params = mock_cur.execute.call_args[0]
+        self.assertIn("GROUP BY id_folder", requete)
+        self.assertEqual(params, (2, 3, 7))
+        self.assertEqual(tailles, {2: 40})
+
+    @patch("intranet.queries.get_connexion")
+    def test_rechercher_dossiers_par_trigrammes(self, mock_get_conn):
+        """Un terme d'au moins 3 caractères passe par folder_trigrams."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.return_value = [
+            {"id_folder": 3, "path": "D:\\Projets", "is_new": 0, "size_kb": 10}
+        ]
+
+        resultat = rechercher_dossiers("Proj")
+
+        requete, params = mock_cur.execute.call_args[0]
+        self.assertIn("folder_trigrams", requete)
+        self.assertEqual(params, ("pro", "roj", 2, "Proj", "Proj", "Proj", 30))
+        self.assertEqual(resultat[0]["path"], "D:\\Projets")
+
+    @patch("intranet.queries.get_connexion")
+    def test_rechercher_dossiers_trigrammes_sans_accents(self, mock_get_conn):
+        """Les trigrammes égaux sans accents (collation de MariaDB) ne comptent qu'une fois."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.return_value = []
+
+        rechercher_dossiers("Ééée")
+
+        params = mock_cur.execute.call_args[0][1]
+        self.assertEqual(params, ("eee", 1, "Ééée", "Ééée", "Ééée", 30))
+
+    @patch("intranet.queries.get_connexion")
+    def test_rechercher_dossiers_a_cheval_sur_un_separateur(self, mock_get_conn):
+        """Projets\\2024 : le dernier segment passe par l'index, le texte entier est vérifié sur le chemin."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.return_value = [
+            {"id_folder": 7, "path": "D:\\Projets\\2024", "is_new": 0, "size_kb": 10}
+        ]
+
+        resultat = rechercher_dossiers("Projets\\2024\\")
+
+        requete, params = mock_cur.execute.call_args[0]
+        self.assertIn("folder_trigrams", requete)
+        self.assertIn("LOCATE(%s, f.path) > 0", requete)
+        self.assertEqual(params, ("202", "024", 2, "2024", "Projets\\2024", "Projets\\2024", 30))
+        self.assertEqual(resultat[0]["id_folder"], 7)
+
+    @patch("intranet.queries.get_connexion")
+    def test_rechercher_dossiers_segment_court_utilise_like(self, mock_get_conn):
+        """Un dernier segment de moins de 3 caractères passe par un LIKE sur le nom."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.return_value = []
+
+        rechercher_dossiers("Data\\Pr")
+
+        requete, params = mock_cur.execute.call_args[0]
+        self.assertNotIn("folder_trigrams", requete)
+        self.assertIn("f.name LIKE %s AND f.path LIKE %s", requete)
+        self.assertEqual(params, ("%Pr%", "%Data\\\\Pr%", 30))
+
+    @patch("intranet.queries.get_connexion")
+    def test_get_historique_dossier_page_suivante_par_curseur(self, mock_get_conn):
+        """Une page suivante est lue en SQL après le curseur, sans recalculer la courbe."""
+        from datetime import datetime
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchone.return_value = {"id_folder": 1, "path": "D:\\Data", "is_new": 0}
+        mock_cur.fetchall.return_value = [
+            {"id_scan": 9, "date_": datetime(2026, 4, 9), "size_kb": 300},
+            {"id_scan": 8, "date_": datetime(2026, 4, 8), "size_kb": 200},
+            {"id_scan": 5, "date_": datetime(2026, 4, 5), "size_kb": 150},
+        ]
+
+        resultat = get_historique_dossier(1, "30", avant=10, per_page=2)
+
+        requete, params = mock_cur.execute.call_args[0]
+        self.assertIn("sz.id_scan < %s", requete)
+        self.assertEqual(params, (1, 10, 10, 3))
+        self.assertEqual([r["delta_kb"] for r in resultat["history_table"]], [100, 50])
+        self.assertEqual(resultat["pagination"]["suivant"], 8)
+        self.assertNotIn("labels", resultat)
+
+    def test_lttb_conserve_extremites_et_nombre_de_points(self):
+        """LTTB garde le premier et le dernier point et réduit au nombre demandé."""
+        points = [(float(i), float((i * 7) % 13)) for i in range(100)]
+        indices = _lttb(points, 10)
+        self.assertEqual(len(indices), 10)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 99)
+        self.assertEqual(indices, sorted(indices))
+        self.assertEqual(_lttb(points[:5], 10), [0, 1, 2, 3, 4])
+
+    def test_enrichir_avec_taille_une_seule_requete(self):
+        """has_children est calculé pour tout le lot en une requête."""
+        mock_cur = MagicMock()
+        mock_cur.fetchall.return_value = [{"parent_id": 2}]
+        rows = [
+            {"id_folder": i, "path": f"D:\\Data\\{i}", "is_new": 0, "size_kb": 10}
+            for i in (1, 2, 3)
+        ]
+
+        resultat = _enrichir_avec_taille(mock_cur, rows, None)
+
+        mock_cur.execute.assert_called_once()
+        self.assertEqual(mock_cur.execute.call_args[0][1], [1, 2, 3])
+        self.assertEqual([r["has_children"] for r in resultat], [False, True, False])
+
+
+class TestCacheParScan(unittest.TestCase):
+    """Tests pour le cache des réponses de l'Intranet."""
+
+    def setUp(self):
+        invalider_cache()
+        self.addCleanup(invalider_cache)
+        self.appels = []
+
+        @_cache_par_scan
+        def requete(x):
+            self.appels.append(x)
+            return {"x": x, "donnees": "a" * 100}
+
+        self.requete = requete
+
+    @patch("intranet.queries._version_scan_courante", return_value=(1, 1))
+    def test_deuxieme_appel_servi_par_le_cache(self, _):
+        """Le même appel pour le même scan ne ré-interroge pas la base."""
+        stats_avant = get_stats_cache()
+        self.requete(1)
+        self.requete(1)
+        self.assertEqual(self.appels, [1])
+        stats = get_stats_cache()
+        self.assertEqual(stats["hits"] - stats_avant["hits"], 1)
+        self.assertEqual(stats["misses"] - stats_avant["misses"], 1)
+
+    @patch("intranet.queries._version_scan_courante")
+    def test_nouveau_scan_change_la_cle(self, mock_version):
+        """Un nouveau scan complété rend les entrées précédentes inutilisables."""
+        mock_version.return_value = (1, 1)
+        self.requete(1)
+        mock_version.return_value = (2, 2)
+        self.requete(1)
+        self.assertEqual(self.appels, [1, 1])
+
+    @patch("intranet.queries.CACHE_TTL_VERSION", 0)
+    @patch("intranet.queries.get_connexion")
+    def test_echec_du_scan_en_cours_vide_le_cache(self, mock_get_conn):
+        """Une réponse mise en cache pendant un scan n'est plus servie une fois ce scan échoué."""
+        mock_cur = mock_get_conn.return_value.cursor.return_value
+        mock_cur.fetchone.return_value = (1, 2, "in_progress")
+        self.requete(1)
+        self.requete(1)
+        self.assertEqual(self.appels, [1])
+
+        mock_cur.fetchone.return_value = (1, 2, "failed")
+        self.requete(1)
+        self.assertEqual(self.appels, [1, 1])
+
+    @patch("intranet.queries._version_scan_courante", return_value=None)
+    def test_sans_version_pas_de_cache(self, _):
+        """Si la version est inconnue (base injoignable), le cache est contourné."""
+        self.requete(1)
+        self.requete(1)
+        self.assertEqual(self.appels, [1, 1])
+
+    @patch.dict(os.environ, {"INTRA_CACHE_MO": "0"})
+    @patch("intranet.queries._version_scan_courante", return_value=(1, 1))
+    def test_cache_desactive(self, mock_version):
+        """INTRA_CACHE_MO=0 désactive le cache."""
+        self.requete(1)
+        self.requete(1)
+        self.assertEqual(self.appels, [1, 1])
+        mock_version.assert_not_called()
+
+    @patch("intranet.queries._cache_max_octets", return_value=300)
+    @patch("intranet.queries._version_scan_courante", return_value=(1, 1))
+    def test_eviction_lru_au_dela_du_plafond(self, *_):
+        """Au-delà du plafond mémoire, l'entrée la moins récemment utilisée est évincée."""
+        self.requete(1)
+        self.requete(2)
+        self.requete(1)  # 1 redevient la plus récente
+        self.requete(3)  # évince 2
+        self.requete(1)
+        self.requete(2)
+        self.assertEqual(self.appels, [1, 2, 3, 2])
+        self.assertLessEqual(get_stats_cache()["octets"], 300)
+
 
 if __name__ == "__main__":
     unittest.main()
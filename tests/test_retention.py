@@ -0,0 +1,144 @@
+"""
+Tests pour la rétention par paliers de l'historique des tailles.
+Vérifie parser_paliers_retention, periode_du_scan et compacter_historique_tailles.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from db import scans_approximatifs
+from retention import (
+    compacter_historique_tailles,
+    parser_paliers_retention,
+    periode_du_scan,
+)
+
+
+class TestParserPaliersRetention(unittest.TestCase):
+    """Tests pour la fonction parser_paliers_retention."""
+
+    @patch.dict(os.environ, {"RETENTION_PALIERS": ""})
+    def test_vide_desactive_la_retention(self):
+        """Une variable vide doit désactiver la rétention."""
+        self.assertEqual(parser_paliers_retention(), [])
+
+    @patch.dict(os.environ, {"RETENTION_PALIERS": "365=mois,30=semaine"})
+    def test_paliers_tries_par_age(self):
+        """Les paliers doivent être triés par âge croissant."""
+        self.assertEqual(
+            parser_paliers_retention(), [(30, "semaine"), (365, "mois")]
+        )
+
+    @patch.dict(os.environ, {"RETENTION_PALIERS": "abc=mois,30=jour,90=Semaine,sans"})
+    def test_entrees_invalides_ignorees(self):
+        """Âge non numérique, granularité inconnue ou entrée malformée sont ignorés."""
+        self.assertEqual(parser_paliers_retention(), [(90, "semaine")])
+
+
+class TestPeriodeDuScan(unittest.TestCase):
+    """Tests pour la fonction periode_du_scan."""
+
+    def test_semaine_commence_le_lundi(self):
+        """La période hebdomadaire doit aller du lundi au lundi suivant."""
+        debut, fin = periode_du_scan(datetime(2026, 3, 19, 17, 30), "semaine")
+        self.assertEqual(debut, datetime(2026, 3, 16))
+        self.assertEqual(fin, datetime(2026, 3, 23))
+
+    def test_mois_de_decembre(self):
+        """La période de décembre doit se terminer au 1er janvier suivant."""
+        debut, fin = periode_du_scan(datetime(2025, 12, 31, 8, 0), "mois")
+        self.assertEqual(debut, datetime(2025, 12, 1))
+        self.assertEqual(fin, datetime(2026, 1, 1))
+
+
+class TestCompacterHistoriqueTailles(unittest.TestCase):
+    """Tests pour la fonction compacter_historique_tailles."""
+
+    @patch.dict(os.environ, {"RETENTION_PALIERS": ""})
+    def test_sans_palier_aucune_requete(self):
+        """Sans palier configuré, la base ne doit pas être interrogée."""
+        mock_conn = MagicMock()
+        self.assertEqual(compacter_historique_tailles(mock_conn), 0)
+        mock_conn.cursor.assert_not_called()
+
+    @patch.dict(os.environ, {"RETENTION_PALIERS": "30=semaine"})
+    def test_garde_la_derniere_ligne_de_la_periode(self):
+        """Seules les lignes remplacées plus tard dans la même semaine sont supprimées."""
+        lundi = datetime.now() - timedelta(days=60)
+        lundi = lundi - timedelta(days=lundi.weekday())
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.side_effect = [
+            # Scans complétés de plus de 30 jours (même semaine)
+            [(1, lundi, None), (2, lundi + timedelta(days=1), None), (3, lundi + timedelta(days=2), None)],
+            # Dossiers du scan 1 remplacés par les scans 2 ou 3
+            [(10,), (11,)],
+            # Dossiers du scan 2 remplacés par le scan 3
+            [(11,)],
+        ]
+
+        supprimees = compacter_historique_tailles(mock_conn)
+
+        self.assertEqual(supprimees, 3)
+        deletes = [
+            c[0][1]
+            for c in mock_cur.execute.call_args_list
+            if c[0][0].startswith("DELETE FROM sizes")
+        ]
+        self.assertEqual(deletes, [(1, 10, 11), (2, 11)])
+        journal = [
+            c[0][1]
+            for c in mock_cur.execute.call_args_list
+            if c[0][0].startswith("INSERT INTO size_compactions")
+        ]
+        self.assertEqual(journal[0][0], "semaine")
+        self.assertEqual(journal[0][-1], 3)
+
+    @patch.dict(os.environ, {"RETENTION_PALIERS": "30=semaine"})
+    def test_diff_sur_la_periode_compactee_signale(self):
+        """Après compaction, seul le dernier scan de la période reste exact pour un diff."""
+        lundi = datetime.now() - timedelta(days=60)
+        lundi = lundi - timedelta(days=lundi.weekday())
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.side_effect = [
+            [(1, lundi, None), (2, lundi + timedelta(days=1), None), (3, lundi + timedelta(days=2), None)],
+            [(10,)],
+            [(10,)],
+        ]
+        compacter_historique_tailles(mock_conn)
+        journal = next(
+            c[0][1]
+            for c in mock_cur.execute.call_args_list
+            if c[0][0].startswith("INSERT INTO size_compactions")
+        )
+        premier, dernier = journal[2], journal[3]
+
+        # Le diff lit la période journalisée dans size_compactions
+        mock_cur.fetchall.side_effect = [[(premier, dernier)]] * 3
+        self.assertEqual(scans_approximatifs(mock_conn, [1, 5]), [1])
+        self.assertEqual(scans_approximatifs(mock_conn, [2, 3]), [2])
+        self.assertEqual(scans_approximatifs(mock_conn, [3, 5]), [])
+
+    @patch.dict(os.environ, {"RETENTION_PALIERS": "30=semaine"})
+    def test_scan_deja_compacte_ignore(self):
+        """Un scan déjà marqué à cette granularité ne doit plus être relu."""
+        ancien = datetime.now() - timedelta(days=90)
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value = mock_cur
+        mock_cur.fetchall.side_effect = [[(1, ancien, "semaine"), (2, ancien, "mois")]]
+
+        self.assertEqual(compacter_historique_tailles(mock_conn), 0)
+        self.assertEqual(mock_cur.execute.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
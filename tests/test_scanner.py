@@ -245,6 +245,124 @@ class TestScanner(unittest.TestCase):
         self.assertIn("200 Mo", message)
         self.assertIn("-", message)
 
+    @patch.dict(os.environ, {"CHEMINS_RACINES": "C:\\test", "CHEMINS_EXCLUS": ""})
+    @patch("scanner.executer_hooks_fin_de_scan")
+    @patch("scanner.hooks_fin_de_scan")
+    @patch("scanner.deconnecter_base_de_donnees")
+    @patch("scanner.envoyer_notif_teams")
+    @patch("scanner.terminer_scan")
+    @patch("scanner.traiter_dossiers_en_lot")
+    @patch("scanner.scanner_arborescence")
+    @patch("scanner.creer_scan")
+    @patch("scanner.connecter_base_de_donnees")
+    def test_hooks_recoivent_l_arborescence_en_lecture_seule(
+        self,
+        mock_connect,
+        mock_creer,
+        mock_scanner_arbo,
+        mock_traiter,
+        mock_terminer,
+        mock_notif,
+        mock_deconnect,
+        mock_hooks,
+        mock_executer_hooks,
+    ):
+        """on_scan_complete reçoit, après le commit final, des vues sur les données du scan."""
+        mock_connect.return_value = MagicMock()
+        mock_creer.return_value = 1
+        arbre = {"C:\\test": 2048, "C:\\test\\a": 1024}
+        mock_scanner_arbo.return_value = arbre
+        nouveau = {"type": "nouveau", "chemin": "C:\\test\\a", "taille": 1}
+        mock_traiter.return_value = ([nouveau], [], 1, 1)
+        mock_hooks.return_value = [("mon_plugin", MagicMock())]
+        mock_executer_hooks.side_effect = lambda *_: self.assertTrue(mock_terminer.called)
+
+        scanner()
+
+        contexte, hooks = mock_executer_hooks.call_args[0]
+        self.assertEqual(hooks, mock_hooks.return_value)
+        self.assertEqual(contexte["id_scan"], 1)
+        self.assertEqual(dict(contexte["arbres"]["C:\\test"]), arbre)
+        self.assertEqual(contexte["nouveaux"][0]["chemin"], "C:\\test\\a")
+        # Vues sans copie : le dictionnaire du scanner est lu directement...
+        arbre["C:\\test\\b"] = 0
+        self.assertIn("C:\\test\\b", contexte["arbres"]["C:\\test"])
+        # ... mais ne peut pas être modifié par le plugin
+        with self.assertRaises(TypeError):
+            contexte["arbres"]["C:\\test"]["C:\\test"] = 0
+        with self.assertRaises(TypeError):
+            contexte["nouveaux"][0]["taille"] = 0
+
+    @patch.dict(os.environ, {"CHEMINS_RACINES": "C:\\test", "CHEMINS_EXCLUS": ""})
+    @patch("scanner.executer_hooks_fin_de_scan")
+    @patch("scanner.hooks_fin_de_scan", return_value=[])
+    @patch("scanner.deconnecter_base_de_donnees")
+    @patch("scanner.envoyer_notif_teams")
+    @patch("scanner.terminer_scan")
+    @patch("scanner.traiter_dossiers_en_lot")
+    @patch("scanner.scanner_arborescence")
+    @patch("scanner.creer_scan")
+    @patch("scanner.connecter_base_de_donnees")
+    def test_sans_hook_rien_n_est_conserve(
+        self,
+        mock_connect,
+        mock_creer,
+        mock_scanner_arbo,
+        mock_traiter,
+        mock_terminer,
+        mock_notif,
+        mock_deconnect,
+        mock_hooks,
+        mock_executer_hooks,
+    ):
+        """Sans plugin on_scan_complete, aucun contexte n'est construit."""
+        mock_connect.return_value = MagicMock()
+        mock_creer.return_value = 1
+        mock_scanner_arbo.return_value = {"C:\\test": 0}
+        mock_traiter.return_value = ([], [], 0, 0)
+
+        scanner()
+
+        mock_executer_hooks.assert_not_called()
+
+    @patch.dict(os.environ, {"CHEMINS_RACINES": "C:\\test", "CHEMINS_EXCLUS": ""})
+    @patch("scanner.calculer_previsions")
+    @patch("scanner.compacter_historique_tailles", side_effect=RuntimeError("boom"))
+    @patch("scanner.deconnecter_base_de_donnees")
+    @patch("scanner.envoyer_notif_teams")
+    @patch("scanner.terminer_scan")
+    @patch("scanner.traiter_dossiers_en_lot")
+    @patch("scanner.scanner_arborescence")
+    @patch("scanner.creer_scan")
+    @patch("scanner.connecter_base_de_donnees")
+    def test_erreur_de_maintenance_ne_fait_pas_echouer_le_scan(
+        self,
+        mock_connect,
+        mock_creer,
+        mock_scanner_arbo,
+        mock_traiter,
+        mock_terminer,
+        mock_notif,
+        mock_deconnect,
+        mock_compacter,
+        mock_previsions,
+    ):
+        """Une erreur de rétention est signalée, le scan reste 'completed' et les prévisions tournent."""
+        mock_connect.return_value = MagicMock()
+        mock_creer.return_value = 1
+        mock_scanner_arbo.return_value = {"C:\\test": 0}
+        mock_traiter.return_value = ([], [], 0, 0)
+
+        with patch("scanner.logger"):
+            scanner()
+
+        mock_terminer.assert_called_once()
+        self.assertEqual(mock_terminer.call_args[0][2], "completed")
+        mock_previsions.assert_called_once()
+        messages = [appel[0][0] for appel in mock_notif.call_args_list]
+        self.assertFalse(any("Erreur critique" in m for m in messages))
+        self.assertTrue(any("rétention" in m and "boom" in m for m in messages))
+
 
 if __name__ == "__main__":
     unittest.main()
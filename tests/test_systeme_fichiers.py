@@ -284,6 +284,16 @@ class TestScannerArborescence(unittest.TestCase):
         resultat = scanner_arborescence(self.dossier_temp)
         self.assertIsInstance(resultat, dict)
 
+    def test_parents_avant_enfants(self):
+        """Chaque dossier doit apparaître après son parent dans le dictionnaire."""
+        self._creer_fichier("a/b/c/fichier.txt", "abc")
+        self._creer_fichier("d/fichier.txt", "d")
+        chemins = list(scanner_arborescence(self.dossier_temp))
+        for chemin in chemins[1:]:
+            self.assertLess(
+                chemins.index(os.path.dirname(chemin)), chemins.index(chemin)
+            )
+
 
 class TestFiltrerDossiersRedondants(unittest.TestCase):
     """Tests pour la fonction filtrer_dossiers_redondants."""